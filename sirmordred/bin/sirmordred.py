@@ -37,7 +37,6 @@ warnings.filterwarnings("ignore", message="numpy.dtype size changed")
 warnings.filterwarnings("ignore", message="numpy.ufunc size changed")
 
 from sirmordred.config import Config
-from sirmordred.sirmordred import SirMordred
 
 
 SLEEPFOR_ERROR = """Error: You may be Arthur, King of the Britons. But you still """ + \
@@ -68,13 +67,20 @@ def main():
         print("Error while consuming configuration: {}".format(error))
         return 1
 
+    if args.compile_config:
+        compiled_file = config.compile()
+        logger.info("Compiled config file created in {}".format(compiled_file))
+        return 0
+
     if args.phases:
         logger.info("Executing sirmordred for phases: {}".format(args.phases))
-        # HACK: the internal dict of Config is modified directly
         # In manual phases execute sirmordred as an script
-        config_dict['general']['update'] = False
+        config.set_param('general', 'update', False)
         for phase in config_dict['phases']:
-            config_dict['phases'][phase] = True if phase in args.phases else False
+            config.set_param('phases', phase, phase in args.phases)
+
+    # Imported here so the config options (i.e. -t) don't load the tasks
+    from sirmordred.sirmordred import SirMordred
 
     SirMordred(config).start()
 
@@ -132,6 +138,8 @@ def parse_args():
                         dest='config_template_file')
     parser.add_argument('-p', '--phases', nargs='*',
                         help='List of phases to execute (update is set to false)')
+    parser.add_argument('--compile-config', action='store_true', dest='compile_config',
+                        help='Write the validated config next to the first configuration file and exit')
 
     args = parser.parse_args()
     return args
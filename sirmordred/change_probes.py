@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import abc
+import hashlib
+import logging
+import os
+import subprocess
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeProbe(abc.ABC):
+    """Cheap check of the upstream state of a repository.
+
+    A probe returns a fingerprint of the repository that changes
+    when there is new data to collect. `None` is returned when the
+    state can't be known, so the repository is always collected.
+
+    A probe is only valid for the backends listed in `BACKENDS`,
+    whose repository URL reflects the data collected from it.
+
+    :param timeout: seconds to wait for the upstream server
+    """
+
+    BACKENDS = ()
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+
+    @classmethod
+    def supports(cls, backend):
+        return backend in cls.BACKENDS
+
+    @abc.abstractmethod
+    def fingerprint(self, url):
+        """Get the fingerprint of the repository in `url`"""
+
+
+class GitChangeProbe(ChangeProbe):
+    """Fingerprint of the references of a git repository (`git ls-remote`)"""
+
+    BACKENDS = ('git',)
+
+    def fingerprint(self, url):
+        env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+
+        try:
+            result = subprocess.run(['git', 'ls-remote', url], capture_output=True,
+                                    timeout=self.timeout, env=env, check=False)
+        except (OSError, subprocess.TimeoutExpired) as ex:
+            logger.debug("Can't run git ls-remote: %s", ex)
+            return None
+
+        if result.returncode != 0:
+            return None
+
+        refs = sorted(result.stdout.decode('utf-8', 'replace').splitlines())
+        return hashlib.sha1('\n'.join(refs).encode('utf-8')).hexdigest()
+
+
+class HTTPChangeProbe(ChangeProbe):
+    """Fingerprint of a HTTP resource using its `ETag` or `Last-Modified` headers.
+
+    The URL of the repositories of API backends (i.e. GitHub) is a web
+    page which doesn't change when new data is available, so only the
+    backends reading the URL as a file or a feed are supported.
+    """
+
+    BACKENDS = ('rss', 'pipermail')
+
+    def fingerprint(self, url):
+        try:
+            res = requests.head(url, allow_redirects=True, timeout=self.timeout)
+        except requests.exceptions.RequestException as ex:
+            logger.debug("Can't get the headers of the resource: %s", ex)
+            return None
+
+        if not res.ok:
+            return None
+
+        etag = res.headers.get('ETag', None)
+        last_modified = res.headers.get('Last-Modified', None)
+        if not etag and not last_modified:
+            return None
+
+        return "%s|%s" % (etag, last_modified)
+
+
+CHANGE_PROBES = {
+    'git': GitChangeProbe,
+    'http': HTTPChangeProbe
+}
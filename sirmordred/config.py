@@ -24,11 +24,17 @@
 #
 
 import configparser
+import hashlib
+import json
 import logging
-from typing import Any, Dict, TypeVar, Union
+import os
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, TypeVar, Union
 
+from sirmordred._version import __version__
+from sirmordred.registry import ConnectorsRegistry, get_grimoire_elk_version, get_registry, set_registry
 from sirmordred.task import Task
-from grimoire_elk.utils import get_connectors
 
 logger = logging.getLogger(__name__)
 
@@ -36,14 +42,105 @@ logger = logging.getLogger(__name__)
 MENU_YAML = 'menu.yaml'
 ALIASES_JSON = 'aliases.json'
 PROJECTS_JSON = 'projects.json'
+COMPILED_CONFIG_SUFFIX = '.compiled'
 GLOBAL_DATA_SOURCES = ['bugzilla', 'bugzillarest', 'confluence',
                        'discourse', 'gerrit', 'jenkins', 'jira']
 
 
+class _ConfigSection(dict):
+    """Section of the configuration which notifies its changes"""
+
+    def __init__(self, name, params, on_change):
+        super().__init__(params)
+        self.name = name
+        self.on_change = on_change
+
+    def __reduce__(self):
+        return self.__class__, (self.name, dict(self), self.on_change)
+
+    def __changed(self):
+        if self.on_change:
+            self.on_change(self.name)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.__changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.__changed()
+
+    def clear(self):
+        super().clear()
+        self.__changed()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self.__changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self.__changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self.__changed()
+        return value
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.__changed()
+
+
+class _ConfigSections(dict):
+    """Sections of the configuration which notify their changes"""
+
+    def __init__(self, sections, on_change):
+        super().__init__({name: _ConfigSection(name, params, on_change) for name, params in sections.items()})
+        self.on_change = on_change
+
+    def __reduce__(self):
+        return self.__class__, (dict(self), self.on_change)
+
+    def __changed(self, name):
+        if self.on_change:
+            self.on_change(name)
+
+    def __setitem__(self, name, params):
+        super().__setitem__(name, _ConfigSection(name, params, self.on_change))
+        self.__changed(name)
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self.__changed(name)
+
+    def pop(self, name, *args):
+        value = super().pop(name, *args)
+        self.__changed(name)
+        return value
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default if default is not None else {}
+        return super().__getitem__(name)
+
+    def update(self, *args, **kwargs):
+        for name, params in dict(*args, **kwargs).items():
+            self[name] = params
+
+
 class Config():
-    """Class aimed to manage sirmordred configuration"""
+    """Class aimed to manage sirmordred configuration
+
+    The composition of each section (see :func:`get_backend_section`) is
+    compiled once into a read-only mapping, which is returned every time
+    the section is accessed. The compiled sections are discarded when
+    any of the sections they are built from changes.
+    """
 
-    def __init__(self, conf_file, conf_list=[]):
+    def __init__(self, conf_file, conf_list=[], compiled_file=None):
         """Initialize object.
 
         The object can be initialized with a configuration file,
@@ -54,15 +151,191 @@ class Config():
         in files read earlier. Values not set by any file will
         be set to the default values, when possible.
 
+        When a compiled config (see :func:`compile`) of the same
+        files exists, it is loaded instead of parsing the files.
+
         :param conf_file; configuration file name
         :param conf_list: list of other configuration files (default: empty)
+        :param compiled_file: compiled config file; by default, the
+            configuration file name followed by `.compiled`
         """
 
         self.conf_list = [conf_file] + conf_list
+        self.compiled_file = compiled_file if compiled_file else conf_file + COMPILED_CONFIG_SUFFIX
         self.raw_conf = None
+        self.__views = {}
+        self.__mtimes = {}
+        self.__overrides = {}
+        self.__reload_lock = threading.Lock()
         # Build self.conf
         self.__read_conf_files()
 
+    @property
+    def conf(self):
+        return self.__conf
+
+    @conf.setter
+    def conf(self, conf):
+        self.__views = {}
+        self.__conf = _ConfigSections(conf, self._invalidate_views)
+
+    def _invalidate_views(self, section):
+        """Discard the compiled sections built from `section`"""
+
+        base = section.split(':')[0]
+        for backend_string in list(self.__views):
+            if backend_string.split(':')[0] == base:
+                self.__views.pop(backend_string, None)
+
+    def __compile_views(self):
+        """Compile the composition of all the sections in the config"""
+
+        for section in self.conf:
+            try:
+                self[section]
+            except RuntimeError:
+                # The error is raised when the section is accessed
+                pass
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Read-only mappings can't be pickled; they are compiled again
+        state['_Config__views'] = {}
+        del state['_Config__reload_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__reload_lock = threading.Lock()
+
+    def files_changed(self):
+        """Check whether any of the config files changed since they were read"""
+
+        return self.__get_mtimes() != self.__mtimes
+
+    def reload(self):
+        """Read the config files again and apply the changes at once.
+
+        The new sections replace the current ones in a single step, so
+        the readers get either the old or the new values, never a mix
+        of both. The params changed with :func:`set_param` keep their
+        values. If the new config is wrong, a `RuntimeError` is raised
+        and the current config is kept.
+
+        :returns: sorted list of the sections added, removed or changed
+        """
+        with self.__reload_lock:
+            mtimes = self.__get_mtimes()
+            conf = self.__parse_conf_files()
+            for (section, param), value in self.__overrides.items():
+                if section in conf and param in conf[section]:
+                    conf[section][param] = value
+
+            current = self.conf
+            changed = sorted(section for section in set(conf) | set(current)
+                             if conf.get(section, None) != current.get(section, None))
+            if changed:
+                self.conf = conf
+                self.__compile_views()
+            self.__mtimes = mtimes
+
+        return changed
+
+    def reload_if_changed(self):
+        """Reload the config only when its files changed; see :func:`reload`"""
+
+        if not self.files_changed():
+            return []
+
+        return self.reload()
+
+    def get_compiled_key(self):
+        """Key of the compiled config.
+
+        The key is made of the hash of the contents of the config
+        files and the versions of SirMordred and GrimoireELK, so the
+        compiled config is not used when any of them changes.
+        """
+        digest = hashlib.sha1()
+        for conf_file in self.conf_list:
+            digest.update(conf_file.encode('utf-8') + b'\0')
+            try:
+                with open(conf_file, 'rb') as f:
+                    digest.update(f.read())
+            except OSError:
+                # configparser ignores the files that can't be read
+                digest.update(b'\0')
+            digest.update(b'\0')
+
+        return {
+            'files': digest.hexdigest(),
+            'sirmordred': __version__,
+            'grimoire_elk': get_grimoire_elk_version()
+        }
+
+    def compile(self):
+        """Write the typed and validated config to `compiled_file`.
+
+        The config files are parsed and checked again, so the params
+        changed with :func:`set_param` are not compiled. The backends
+        and studies of GrimoireELK are written too, so the connectors
+        are not imported when the compiled config is loaded.
+
+        :returns: path of the compiled config
+        """
+        conf = self.__parse_conf_files()
+        registry = get_registry()
+
+        compiled = {
+            'key': self.get_compiled_key(),
+            'backends': list(registry.backends),
+            'studies': list(registry.studies),
+            'conf': conf
+        }
+
+        tmp_file = self.compiled_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(compiled, f, indent=1)
+        os.replace(tmp_file, self.compiled_file)
+
+        logger.debug("Config compiled to %s", self.compiled_file)
+
+        return self.compiled_file
+
+    def __load_compiled(self):
+        """Read the compiled config; `None` when it doesn't exist or it is stale"""
+
+        if not os.path.exists(self.compiled_file):
+            return None
+
+        try:
+            with open(self.compiled_file, 'r') as f:
+                compiled = json.load(f)
+            key = compiled['key']
+            conf = compiled['conf']
+            registry = ConnectorsRegistry(tuple(compiled['backends']), tuple(compiled['studies']))
+        except (OSError, ValueError, KeyError, TypeError) as ex:
+            logger.warning("Can't read the compiled config %s: %s", self.compiled_file, ex)
+            return None
+
+        if key != self.get_compiled_key():
+            logger.debug("Compiled config %s is stale", self.compiled_file)
+            return None
+
+        set_registry(registry)
+        logger.debug("Compiled config loaded from %s", self.compiled_file)
+
+        return conf
+
+    def __get_mtimes(self):
+        mtimes = {}
+        for conf_file in self.conf_list:
+            try:
+                mtimes[conf_file] = os.stat(conf_file).st_mtime_ns
+            except OSError:
+                mtimes[conf_file] = None
+        return mtimes
+
     @classmethod
     def backend_section_params(self):
         # Params that must exists in all backends
@@ -163,6 +436,138 @@ class Config():
                     "default": None,
                     "type": int,
                     "description": "The maximum number of minutes wrt the current date to retain the data"
+                },
+                "collection_workers": {
+                    "optional": True,
+                    "default": 1,
+                    "type": int,
+                    "description": "Number of repositories collected in parallel in each backend section"
+                },
+                "max_collection_workers": {
+                    "optional": True,
+                    "default": None,
+                    "type": int,
+                    "description": "Maximum number of repositories collected in parallel across all the backend sections"
+                },
+                "enrich_batch_size": {
+                    "optional": True,
+                    "default": None,
+                    "type": int,
+                    "description": "Number of repositories of a backend section enriched with a single scroll of the raw index"
+                },
+                "enrich_fanout": {
+                    "optional": True,
+                    "default": False,
+                    "type": bool,
+                    "description": "Enrich the backend sections reading the same raw index with a single scroll of it"
+                },
+                "enrich_workers": {
+                    "optional": True,
+                    "default": 1,
+                    "type": int,
+                    "description": "Number of repositories enriched in parallel in each backend section"
+                },
+                "studies_skip_unchanged": {
+                    "optional": True,
+                    "default": False,
+                    "type": bool,
+                    "description": "Skip the studies when the raw and enriched indexes didn't change since their last execution"
+                },
+                "studies_workers": {
+                    "optional": True,
+                    "default": 1,
+                    "type": int,
+                    "description": "Number of studies writing their own index executed in parallel in each backend section"
+                },
+                "scheduler": {
+                    "optional": True,
+                    "default": False,
+                    "type": bool,
+                    "description": "Execute the tasks with a pool of workers instead of a thread per backend section"
+                },
+                "scheduler_workers": {
+                    "optional": True,
+                    "default": None,
+                    "type": int,
+                    "description": "Number of workers used by the scheduler (default: number of CPUs)"
+                },
+                "executor": {
+                    "optional": True,
+                    "default": "thread",
+                    "type": str,
+                    "description": "Execute the tasks of each backend section in a thread or in a process (thread, process)"
+                },
+                "pipeline": {
+                    "optional": True,
+                    "default": False,
+                    "type": bool,
+                    "description": "Enrich each repository as soon as its data is collected"
+                },
+                "pipeline_depth": {
+                    "optional": True,
+                    "default": 10,
+                    "type": int,
+                    "description": "Maximum number of repositories collected and waiting to be enriched"
+                },
+                "es_max_scrolls": {
+                    "optional": True,
+                    "default": None,
+                    "type": int,
+                    "description": "Maximum number of scrolls open at the same time in each Elasticsearch cluster by each process"
+                },
+                "es_max_bulks": {
+                    "optional": True,
+                    "default": None,
+                    "type": int,
+                    "description": "Maximum number of bulk requests in flight in each Elasticsearch cluster by each process"
+                },
+                "es_max_bulk_bytes": {
+                    "optional": True,
+                    "default": None,
+                    "type": int,
+                    "description": "Maximum size in bytes of bulk requests in flight in each Elasticsearch cluster per process"
+                },
+                "fingerprints_file": {
+                    "optional": True,
+                    "default": None,
+                    "type": str,
+                    "description": "File with the fingerprints of the repositories checked by the change probes"
+                },
+                "checkpoints_file": {
+                    "optional": True,
+                    "default": None,
+                    "type": str,
+                    "description": "File with the repositories processed, to resume the tasks after being interrupted"
+                },
+                "shared_workers": {
+                    "optional": True,
+                    "default": None,
+                    "type": int,
+                    "description": "Number of workers shared by all the backend sections to collect and enrich repositories"
+                },
+                "catch_up": {
+                    "optional": True,
+                    "default": False,
+                    "type": bool,
+                    "description": "Collect and enrich the repositories added to the projects as soon as they are found"
+                },
+                "catch_up_cleanup": {
+                    "optional": True,
+                    "default": False,
+                    "type": bool,
+                    "description": "Delete the data of the repositories removed from the projects when `catch_up` is enabled"
+                },
+                "watch_config": {
+                    "optional": True,
+                    "default": False,
+                    "type": bool,
+                    "description": "Reload the config when its files change"
+                },
+                "preflight_timeout": {
+                    "optional": True,
+                    "default": 1800,
+                    "type": int,
+                    "description": "Seconds to wait for each check (Elasticsearch, bestiary, SortingHat) done at startup"
                 }
             }
         }
@@ -254,6 +659,12 @@ class Config():
 
         params_panels = {
             "panels": {
+                "background": {
+                    "optional": True,
+                    "default": False,
+                    "type": bool,
+                    "description": "Upload the panels in the background while the first collection starts"
+                },
                 "strict": {
                     "optional": True,
                     "default": True,
@@ -558,12 +969,14 @@ class Config():
             logger.error('Config section %s and param %s not exists', section, param)
         else:
             self.conf[section][param] = value
+            # Keep the value when the config is reloaded
+            self.__overrides[(section, param)] = value
 
     @classmethod
     def get_backend_sections(cls):
         # a backend name could include and extra ":<param>"
         # to have several backend entries with different configs
-        gelk_backends = list(get_connectors().keys())
+        gelk_backends = list(get_registry().backends)
         extra_backends = ["apache"]
 
         return gelk_backends + extra_backends
@@ -572,15 +985,7 @@ class Config():
     def get_study_sections(cls):
         # a study name could include and extra ":<param>"
         # to have several backend entries with different configs
-        studies = []
-
-        connectors = get_connectors()
-        for _, backends in connectors.items():
-            enrich_backend = backends[2]()
-            for study in enrich_backend.studies:
-                studies.append(study.__name__)
-
-        return tuple(set(studies))
+        return get_registry().studies
 
     def get_active_data_sources(self):
         data_sources = []
@@ -661,7 +1066,7 @@ class Config():
         self,
         base_backend_section: str,
         *parameters: str
-    ) -> Dict[str, Any]:
+    ) -> Mapping[str, Any]:
         """
         A smart config object that supports subscripting
 
@@ -697,7 +1102,15 @@ class Config():
 
         This functionality can also be accessed by subscripting a :class:`Config` object.
         For more information, see :func:`__get_item__`
+
+        The composed section is a read-only mapping, compiled only once; use
+        :func:`set_param` to change the configuration.
         """
+        backend_string = ':'.join((base_backend_section,) + parameters)
+        view = self.__views.get(backend_string, None)
+        if view is not None:
+            return view
+
         base_section: Dict[str, Any] = self.conf.get(base_backend_section, dict())
 
         # Start the output with just the base backend section
@@ -746,9 +1159,12 @@ class Config():
                     f'required parameter(s) are missing: {missing_parameters_str}.'
                 )
 
-        return output
+        view = MappingProxyType(output)
+        self.__views[backend_string] = view
 
-    def __getitem__(self, backend_string: str) -> Dict[str, Any]:
+        return view
+
+    def __getitem__(self, backend_string: str) -> Mapping[str, Any]:
         """
         Access the backend sections using backend strings
 
@@ -761,6 +1177,10 @@ class Config():
 
         The passed string must not be empty
         """
+        view = self.__views.get(backend_string, None)
+        if view is not None:
+            return view
+
         assert len(backend_string) > 0, "__get_item__ called on a Config object with a zero-length string"
 
         args = backend_string.split(':')
@@ -768,7 +1188,7 @@ class Config():
 
     T = TypeVar('T')
 
-    def get(self, backend_string: str, default: T = None) -> Union[Dict[str, Any], T]:
+    def get(self, backend_string: str, default: T = None) -> Union[Mapping[str, Any], T]:
         """
         Wraps :func:`__getitem__` to allow specifying a default value
 
@@ -829,30 +1249,40 @@ class Config():
                         typed_conf[s][option] = val
         return typed_conf
 
-    def _add_to_conf(self, new_conf):
+    def _add_to_conf(self, new_conf, conf=None):
         """Add new configuration to self.conf.
 
         Adds configuration parameters in new_con to self.conf.
         If they already existed in conf, overwrite them.
 
         :param new_conf: new configuration, to add
+        :param conf: configuration to add to; self.conf by default
         """
+        conf = self.conf if conf is None else conf
 
         for section in new_conf:
-            if section not in self.conf:
-                self.conf[section] = new_conf[section]
+            if section not in conf:
+                conf[section] = new_conf[section]
             else:
                 for param in new_conf[section]:
-                    self.conf[section][param] = new_conf[section][param]
+                    conf[section][param] = new_conf[section][param]
 
-    def __read_conf_files(self):
-        logger.debug("Reading conf files")
-        self.conf = {}
+    def __parse_conf_files(self):
+        conf = {}
         for conf_file in self.conf_list:
             logger.debug("Reading conf files: %s", conf_file)
             parser = configparser.ConfigParser()
             parser.read(conf_file)
             raw_conf = {s: dict(parser.items(s)) for s in parser.sections()}
-            conf = self.__add_types(raw_conf)
-            self._add_to_conf(conf)
-        self.check_config(self.conf)
+            self._add_to_conf(self.__add_types(raw_conf), conf)
+        self.check_config(conf)
+        return conf
+
+    def __read_conf_files(self):
+        logger.debug("Reading conf files")
+        self.__mtimes = self.__get_mtimes()
+        conf = self.__load_compiled()
+        if conf is None:
+            conf = self.__parse_conf_files()
+        self.conf = conf
+        self.__compile_views()
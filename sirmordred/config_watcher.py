@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import configparser
+import logging
+import threading
+
+from sirmordred.es_admission import configure_es_admission
+
+logger = logging.getLogger(__name__)
+
+CONFIG_WATCH_INTERVAL = 10  # seconds between checks of the config files
+
+
+def reload_config(config):
+    """Reload the config, keeping the current one if the new one is wrong.
+
+    :param config: config object to reload
+
+    :returns: list of sections changed
+    """
+    try:
+        changed = config.reload()
+    except (RuntimeError, configparser.Error) as ex:
+        logger.error("Config not reloaded, the current one is kept: %s", ex)
+        return []
+
+    if 'general' in changed:
+        configure_es_admission(config['general'])
+
+    if changed:
+        logger.info("Config reloaded, sections changed: %s", ', '.join(changed))
+    else:
+        logger.debug("Config reloaded without changes")
+
+    return changed
+
+
+class ConfigWatcher(threading.Thread):
+    """Reload the config when a reload is requested or its files change.
+
+    The reload is done in this thread, so it can be requested from a
+    signal handler (i.e. SIGHUP) without blocking the thread that
+    receives the signal. After each reload with changes, `on_reload`
+    is called with the list of sections changed. A wrong config is
+    logged and the previous one is kept.
+
+    :param config: config object to reload
+    :param on_reload: function called after the config changed
+    :param watch_files: if True, the config files are checked for changes
+    :param interval: seconds between checks of the config files
+    """
+
+    def __init__(self, config, on_reload=None, watch_files=True, interval=CONFIG_WATCH_INTERVAL):
+        super().__init__(name='config-watcher', daemon=True)
+        self.config = config
+        self.on_reload = on_reload
+        self.watch_files = watch_files
+        self.interval = interval
+        self._requested = threading.Event()
+        self._stopped = threading.Event()
+
+    def request_reload(self):
+        """Reload the config as soon as possible"""
+
+        self._requested.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._requested.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            requested = self._requested.wait(self.interval)
+            self._requested.clear()
+
+            if self._stopped.is_set():
+                break
+            if requested or (self.watch_files and self.config.files_changed()):
+                self.reload()
+
+    def reload(self):
+        """Reload the config and notify the changes.
+
+        :returns: list of sections changed
+        """
+        changed = reload_config(self.config)
+
+        if changed and self.on_reload:
+            try:
+                self.on_reload(changed)
+            except Exception as ex:
+                logger.error("Error applying the changes of the config: %s", ex, exc_info=True)
+
+        return changed
@@ -41,6 +41,13 @@ class DataEnrichmentError(Exception):
         self.expression = expression
 
 
+class TaskCancelled(Exception):
+    """Exception raised when a task is cancelled before finishing
+    """
+    def __init__(self, expression):
+        self.expression = expression
+
+
 class ConfigError(Exception):
     """Exception raised for errors in the configuration file.
 
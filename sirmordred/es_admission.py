@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import functools
+import logging
+import threading
+import time
+
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class ScrollSlot:
+    """Scroll admitted in a cluster.
+
+    The slot is released with the controller that admitted it, from
+    any thread, so a scroll abandoned by a thread can be closed by
+    another one (i.e. when its generator is garbage collected).
+
+    :param cluster: cluster of the scroll
+    :param held: scrolls held by the thread which opened the scroll
+    :param waited: seconds waited to open the scroll
+    """
+
+    def __init__(self, cluster, held, waited):
+        self.cluster = cluster
+        self.held = held
+        self.waited = waited
+        self.released = False
+
+
+class AdmissionController:
+    """Limit the load sent at the same time to each Elasticsearch cluster.
+
+    The requests are grouped by cluster (scheme, host and port of the
+    URL), so the limits are shared by all the backend sections using
+    the same cluster, either for collection or for enrichment. A limit
+    set to `None` is not applied. The state is kept in memory, so the
+    limits apply to the threads of a process; each process of the
+    `process` executor has its own ones.
+
+    A thread that already has a scroll open in a cluster can open new
+    ones in the same cluster without waiting, to avoid deadlocks when
+    the items of a scroll are processed reading other indexes. A bulk
+    bigger than `max_bulk_bytes` is sent when there are no other bulks
+    in flight.
+
+    :param max_scrolls: maximum number of scrolls open in a cluster
+    :param max_bulks: maximum number of bulk requests in a cluster
+    :param max_bulk_bytes: maximum size of the bulk requests in flight
+    """
+
+    def __init__(self, max_scrolls=None, max_bulks=None, max_bulk_bytes=None):
+        self._cond = threading.Condition()
+        self._clusters = {}
+        self._local = threading.local()
+        self.set_limits(max_scrolls, max_bulks, max_bulk_bytes)
+
+    def set_limits(self, max_scrolls=None, max_bulks=None, max_bulk_bytes=None):
+        with self._cond:
+            self.max_scrolls = max_scrolls
+            self.max_bulks = max_bulks
+            self.max_bulk_bytes = max_bulk_bytes
+            self._cond.notify_all()
+
+    @property
+    def enabled(self):
+        return any(limit is not None for limit in (self.max_scrolls, self.max_bulks, self.max_bulk_bytes))
+
+    @staticmethod
+    def get_cluster(url):
+        """Get the cluster of a URL, without credentials nor path"""
+
+        parsed = urlparse(url)
+        port = parsed.port if parsed.port else (443 if parsed.scheme == 'https' else 9200)
+
+        return "%s://%s:%s" % (parsed.scheme, parsed.hostname, port)
+
+    def acquire_scroll(self, url):
+        """Wait until a scroll can be opened in the cluster of `url`.
+
+        :returns: the `ScrollSlot` to release once the scroll is closed
+        """
+        cluster = self.get_cluster(url)
+        held = self.__held_scrolls()
+
+        start = time.monotonic()
+        with self._cond:
+            if held.get(cluster, 0) == 0:
+                state = self.__get_state(cluster)
+                while self.max_scrolls is not None and state['scrolls'] >= self.max_scrolls:
+                    self._cond.wait()
+                state['scrolls'] += 1
+            held[cluster] = held.get(cluster, 0) + 1
+
+        return ScrollSlot(cluster, held, time.monotonic() - start)
+
+    def release_scroll(self, slot):
+        """Release the slot of a scroll; it can be done from any thread"""
+
+        with self._cond:
+            if slot.released:
+                raise RuntimeError("Scroll released twice")
+            slot.released = True
+
+            slot.held[slot.cluster] -= 1
+            if slot.held[slot.cluster] > 0:
+                return
+
+            self.__get_state(slot.cluster)['scrolls'] -= 1
+            self._cond.notify_all()
+
+    def acquire_bulk(self, url, size):
+        """Wait until a bulk of `size` bytes can be sent to the cluster of `url`.
+
+        :returns: seconds waited
+        """
+        cluster = self.get_cluster(url)
+
+        start = time.monotonic()
+        with self._cond:
+            state = self.__get_state(cluster)
+            while not self.__bulk_admitted(state, size):
+                self._cond.wait()
+            state['bulks'] += 1
+            state['bytes'] += size
+
+        return time.monotonic() - start
+
+    def release_bulk(self, url, size):
+        cluster = self.get_cluster(url)
+
+        with self._cond:
+            state = self.__get_state(cluster)
+            if state['bulks'] == 0:
+                raise RuntimeError("Bulk released without being acquired")
+            state['bulks'] -= 1
+            state['bytes'] -= size
+            self._cond.notify_all()
+
+    @contextmanager
+    def scroll(self, url):
+        slot = self.acquire_scroll(url)
+        try:
+            yield slot
+        finally:
+            self.release_scroll(slot)
+
+    @contextmanager
+    def bulk(self, url, size):
+        self.acquire_bulk(url, size)
+        try:
+            yield
+        finally:
+            self.release_bulk(url, size)
+
+    def get_stats(self):
+        """Get the scrolls, bulks and bytes in flight per cluster"""
+
+        with self._cond:
+            return {cluster: dict(state) for cluster, state in self._clusters.items()}
+
+    def __bulk_admitted(self, state, size):
+        if self.max_bulks is not None and state['bulks'] >= self.max_bulks:
+            return False
+        if self.max_bulk_bytes is not None and state['bulks'] > 0 and \
+                state['bytes'] + size > self.max_bulk_bytes:
+            return False
+        return True
+
+    def __get_state(self, cluster):
+        if cluster not in self._clusters:
+            self._clusters[cluster] = {'scrolls': 0, 'bulks': 0, 'bytes': 0}
+        return self._clusters[cluster]
+
+    def __held_scrolls(self):
+        # The counter is updated holding the condition, because the
+        # scrolls can be released by other threads
+        if not hasattr(self._local, 'scrolls'):
+            self._local.scrolls = {}
+        return self._local.scrolls
+
+
+ES_ADMISSION = AdmissionController()
+
+# methods of GrimoireELK replaced while the admission controller is installed
+_originals = None
+_install_lock = threading.Lock()
+
+
+def configure_es_admission(general_conf):
+    """Set the limits of the Elasticsearch clusters from the `general` section.
+
+    When a limit is set, the scrolls and the bulk requests of GrimoireELK
+    are wrapped to go through `ES_ADMISSION`; when none is set, the
+    original methods are restored. The limits apply to the threads of
+    the current process. It is called when the process starts and every
+    time the config is reloaded.
+
+    :param general_conf: `general` section of the configuration
+    """
+    ES_ADMISSION.set_limits(general_conf.get('es_max_scrolls', None),
+                            general_conf.get('es_max_bulks', None),
+                            general_conf.get('es_max_bulk_bytes', None))
+
+    if ES_ADMISSION.enabled:
+        install_es_admission()
+    else:
+        uninstall_es_admission()
+
+
+@contextmanager
+def es_admission(general_conf):
+    """Apply the limits of the `general` section until the block ends"""
+
+    configure_es_admission(general_conf)
+    try:
+        yield ES_ADMISSION
+    finally:
+        ES_ADMISSION.set_limits()
+        uninstall_es_admission()
+
+
+def install_es_admission():
+    """Wrap the scrolls and the bulk requests of GrimoireELK"""
+
+    from grimoire_elk.elastic import ElasticSearch
+    from grimoire_elk.elastic_items import ElasticItems
+
+    global _originals
+
+    with _install_lock:
+        if _originals is not None:
+            return
+
+        _originals = (ElasticItems.fetch, ElasticSearch.safe_put_bulk)
+        ElasticItems.fetch = _admitted_fetch(ElasticItems.fetch)
+        ElasticSearch.safe_put_bulk = _admitted_safe_put_bulk(ElasticSearch.safe_put_bulk)
+
+    logger.debug("Elasticsearch admission controller installed")
+
+
+def uninstall_es_admission():
+    """Restore the scrolls and the bulk requests of GrimoireELK.
+
+    The scrolls and bulks already admitted are released as usual.
+    """
+    global _originals
+
+    with _install_lock:
+        if _originals is None:
+            return
+
+        from grimoire_elk.elastic import ElasticSearch
+        from grimoire_elk.elastic_items import ElasticItems
+
+        ElasticItems.fetch, ElasticSearch.safe_put_bulk = _originals
+        _originals = None
+
+    logger.debug("Elasticsearch admission controller uninstalled")
+
+
+def _admitted_fetch(fetch):
+
+    @functools.wraps(fetch)
+    def wrapper(self, *args, **kwargs):
+        # The slot is kept by the generator, which can be closed
+        # by a thread different from the one that started it
+        slot = ES_ADMISSION.acquire_scroll(self.elastic.url)
+        if slot.waited >= 1:
+            logger.debug("Scroll waited %.2f seconds for the admission controller", slot.waited)
+        try:
+            yield from fetch(self, *args, **kwargs)
+        finally:
+            ES_ADMISSION.release_scroll(slot)
+
+    return wrapper
+
+
+def _admitted_safe_put_bulk(safe_put_bulk):
+
+    @functools.wraps(safe_put_bulk)
+    def wrapper(self, url, bulk_json):
+        # The limit is in bytes, not in characters
+        size = len(bulk_json.encode('utf-8') if isinstance(bulk_json, str) else bulk_json)
+        waited = ES_ADMISSION.acquire_bulk(url, size)
+        if waited >= 1:
+            logger.debug("Bulk waited %.2f seconds for the admission controller", waited)
+        try:
+            return safe_put_bulk(self, url, bulk_json)
+        finally:
+            ES_ADMISSION.release_bulk(url, size)
+
+    return wrapper
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class LocalStore:
+    """Key-value store saved in a local JSON file.
+
+    The file is updated holding an exclusive `flock` of a `.lock` file
+    next to it, and it is read again before every update, so several
+    stores (i.e. one per process) pointing to the same file don't lose
+    the updates of the others.
+
+    The items added to a list with `append` are written to a `.journal`
+    file next to it instead of rewriting the whole file; they are merged
+    into the file with the next update.
+
+    :param path: path of the JSON file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.lock_path = path + '.lock'
+        self._lock = threading.Lock()
+        self._data = {}
+        self._stat = None
+
+        with self._lock:
+            self.__refresh()
+
+    def get(self, key):
+        with self._lock:
+            self.__refresh()
+            return self._data.get(key, None)
+
+    def set(self, key, value):
+        self.update(key, lambda _: value)
+
+    def delete(self, key):
+        self.update(key, lambda _: None)
+
+    def update(self, key, func):
+        """Replace the value of `key` by `func(value)`; `None` removes the key"""
+
+        with self._lock, self.__file_lock(fcntl.LOCK_EX):
+            self._data = self.__read()
+            value = func(self._data.get(key, None))
+            if value is None:
+                if key not in self._data:
+                    return
+                self._data.pop(key)
+            else:
+                self._data[key] = value
+            self.__write()
+
+    def append(self, key, item):
+        """Add `item` to the list of `key` without rewriting the file"""
+
+        with self._lock, self.__file_lock(fcntl.LOCK_EX):
+            with open(self.journal_path, 'a') as f:
+                f.write(json.dumps([key, item]) + '\n')
+
+    def __refresh(self):
+        """Read the file again when it was changed by other store"""
+
+        stat = self.__get_stat()
+        if stat == self._stat:
+            return
+
+        if stat == (None, None):
+            self._data = {}
+        else:
+            with self.__file_lock(fcntl.LOCK_SH):
+                stat = self.__get_stat()
+                self._data = self.__read()
+        self._stat = stat
+
+    def __get_stat(self):
+        def _stat(path):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                return None
+            return st.st_ino, st.st_mtime_ns, st.st_size
+
+        return _stat(self.path), _stat(self.journal_path)
+
+    @contextlib.contextmanager
+    def __file_lock(self, operation):
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __read(self):
+        data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as ex:
+                logger.warning("Can't read the local store %s: %s", self.path, ex)
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        key, item = json.loads(line)
+                    except ValueError:
+                        # i.e. the process was killed while writing it
+                        logger.warning("Invalid entry in the journal of the local store %s", self.path)
+                        continue
+                    data.setdefault(key, []).append(item)
+
+        return data
+
+    def __write(self):
+        tmp_path = "%s.%s.tmp" % (self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(self._data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+        # The items of the journal are already in the file
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._stat = self.__get_stat()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_local_store(path):
+    """Get the store of a file, shared by all the threads of the process"""
+
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = LocalStore(path)
+
+        return _stores[path]
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import logging
+import threading
+import time
+
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+PreflightResult = namedtuple('PreflightResult', ['name', 'ok', 'error', 'elapsed'])
+
+
+class PreflightCheck:
+    """Independent check executed before starting the tasks.
+
+    The probe is a callable that returns `True` when the check
+    passes. Returning `False` or raising an exception makes the
+    check fail.
+
+    :param name: name of the check
+    :param probe: callable that executes the check
+    :param timeout: seconds to wait for the probe; if None, there is no deadline
+    """
+
+    def __init__(self, name, probe, timeout=None):
+        self.name = name
+        self.probe = probe
+        self.timeout = timeout
+        self._result = None
+        self._thread = None
+        self._started = None
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self.__run, name='preflight-' + self.name, daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        """Wait for the probe until its deadline and return its result"""
+
+        if self.timeout is None:
+            self._thread.join()
+        else:
+            self._thread.join(max(self._started + self.timeout - time.monotonic(), 0))
+
+        if self._thread.is_alive():
+            # The probe can't be stopped; as it runs in a daemon
+            # thread, it won't keep the process alive
+            return PreflightResult(self.name, False, "timed out after %s seconds" % self.timeout,
+                                   time.monotonic() - self._started)
+
+        return self._result
+
+    def __run(self):
+        try:
+            ok = bool(self.probe())
+            error = None if ok else "check failed"
+        except Exception as ex:
+            ok = False
+            error = str(ex) or ex.__class__.__name__
+
+        self._result = PreflightResult(self.name, ok, error, time.monotonic() - self._started)
+
+
+def run_preflight(checks):
+    """Run the checks concurrently and wait for all of them.
+
+    Each check is waited until its own deadline, so the total time
+    is the one of the slowest check instead of the sum of all of them.
+
+    :param checks: list of `PreflightCheck`
+
+    :returns: list of `PreflightResult`, in the same order of the checks
+    """
+    for check in checks:
+        check.start()
+
+    results = [check.wait() for check in checks]
+
+    for result in results:
+        if result.ok:
+            logger.info("[preflight] %s passed in %.2f seconds", result.name, result.elapsed)
+        else:
+            logger.error("[preflight] %s failed after %.2f seconds: %s", result.name, result.elapsed, result.error)
+
+    return results
+
+
+def format_preflight(results):
+    """Consolidated report of the failed checks"""
+
+    failed = ["%s (%s)" % (result.name, result.error) for result in results if not result.ok]
+    if not failed:
+        return "All the preflight checks passed"
+
+    return "Preflight checks failed: %s" % ', '.join(failed)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import json
+import logging
+import os
+import threading
+
+from collections import namedtuple
+from importlib.metadata import PackageNotFoundError, version
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_CACHE_ENV = 'SIRMORDRED_REGISTRY_CACHE'
+
+ConnectorsRegistry = namedtuple('ConnectorsRegistry', ['backends', 'studies'])
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_grimoire_elk_version():
+    """Get the installed version of GrimoireELK without importing it"""
+
+    try:
+        return version('grimoire-elk')
+    except PackageNotFoundError:
+        return None
+
+
+def build_registry():
+    """Get the names of the backends and the studies of GrimoireELK.
+
+    All the connectors of GrimoireELK are imported and their enrich
+    backends are created to read their studies.
+    """
+    from grimoire_elk.utils import get_connectors
+
+    connectors = get_connectors()
+
+    studies = set()
+    for _, backends in connectors.items():
+        enrich_backend = backends[2]()
+        for study in enrich_backend.studies:
+            studies.add(study.__name__)
+
+    return ConnectorsRegistry(tuple(connectors.keys()), tuple(sorted(studies)))
+
+
+def get_registry(cache_file=None):
+    """Get the registry of backends and studies shared by the process.
+
+    The registry is built the first time it is requested. When a cache
+    file is given, or set in the `SIRMORDRED_REGISTRY_CACHE` environment
+    variable, the registry is read from it, as long as it was written
+    for the installed version of GrimoireELK; otherwise, it is built
+    and written to the file.
+
+    :param cache_file: path of the file to persist the registry
+    """
+    global _registry
+
+    with _registry_lock:
+        if _registry is not None:
+            return _registry
+
+        cache_file = cache_file if cache_file else os.environ.get(REGISTRY_CACHE_ENV, None)
+        elk_version = get_grimoire_elk_version()
+
+        registry = None
+        if cache_file and elk_version:
+            registry = _read_cache(cache_file, elk_version)
+        if registry is None:
+            registry = build_registry()
+            if cache_file and elk_version:
+                _write_cache(cache_file, elk_version, registry)
+
+        _registry = registry
+
+    return _registry
+
+
+def set_registry(registry):
+    """Use a registry read elsewhere (i.e. a compiled config), unless one is already loaded
+
+    :param registry: `ConnectorsRegistry` to use
+    """
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            _registry = registry
+
+
+def reset_registry():
+    """Forget the registry, so it is built again when it is requested"""
+
+    global _registry
+
+    with _registry_lock:
+        _registry = None
+
+
+def _read_cache(cache_file, elk_version):
+    try:
+        with open(cache_file, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(cache, dict) or cache.get('grimoire_elk', None) != elk_version:
+        logger.debug("Registry cache %s not valid for GrimoireELK %s", cache_file, elk_version)
+        return None
+
+    try:
+        return ConnectorsRegistry(tuple(cache['backends']), tuple(cache['studies']))
+    except (KeyError, TypeError):
+        return None
+
+
+def _write_cache(cache_file, elk_version, registry):
+    cache = {
+        'grimoire_elk': elk_version,
+        'backends': list(registry.backends),
+        'studies': list(registry.studies)
+    }
+
+    tmp_file = cache_file + '.tmp'
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as ex:
+        logger.warning("Can't write the registry cache %s: %s", cache_file, ex)
@@ -22,9 +22,13 @@
 #     Quan Zhou <quan@bitergia.com>
 #
 
+import functools
 import json
 import logging
+import multiprocessing
+import os
 import queue
+import signal
 import sys
 import threading
 import time
@@ -41,19 +45,25 @@ warnings.filterwarnings("ignore", message="numpy.ufunc size changed")
 from grimoire_elk.enriched.utils import grimoire_con
 
 from sirmordred.config import Config
+from sirmordred.config_watcher import ConfigWatcher
 from sirmordred.error import DataCollectionError
 from sirmordred.error import DataEnrichmentError
-from sirmordred.task_autorefresh import TaskAutorefresh
-from sirmordred.task_collection import TaskRawDataCollection
-from sirmordred.task_enrich import TaskEnrich
-from sirmordred.task_identities import TaskIdentitiesMerge
-from sirmordred.task_manager import TasksManager
-from sirmordred.task_panels import TaskPanels, TaskPanelsMenu
+from sirmordred.error import ElasticSearchError
+from sirmordred.es_admission import configure_es_admission, uninstall_es_admission
+from sirmordred.preflight import PreflightCheck, format_preflight, run_preflight
+from sirmordred.task_manager import (GLOBAL_TASKS,
+                                     ReadersWriterLock,
+                                     TasksManager,
+                                     run_tasks_process)
 from sirmordred.task_projects import TaskProjects
-from sortinghat.cli.client import SortingHatClient
+from sirmordred.task_scheduler import TasksScheduler
 
 logger = logging.getLogger(__name__)
 
+THREAD_EXECUTOR = 'thread'
+PROCESS_EXECUTOR = 'process'
+EXECUTORS = [THREAD_EXECUTOR, PROCESS_EXECUTOR]
+
 
 class SirMordred:
 
@@ -62,6 +72,15 @@ class SirMordred:
         self.config = config
         self.conf = config.get_conf()
         self.grimoire_con = grimoire_con(conn_retries=12)  # 30m retry
+        self.mp_context = None
+        self.scheduler = None
+        self.config_watcher = None
+        # backend tasks running without end, which are updated when
+        # the config is reloaded
+        self.__backend_batch = None
+        self.__batch_lock = threading.Lock()
+        # panels uploaded while the first collection starts
+        self.__panels_manager = None
 
     def check_bestiary_access(self):
 
@@ -69,64 +88,125 @@ class SirMordred:
 
         bestiary_url = self.conf['projects']['projects_url']
         try:
-            res = requests.get(bestiary_url)
-            res.raise_for_status()
-            res.json()
+            # The projects are cached, so they aren't downloaded again
+            # when they are loaded
+            TaskProjects.fetch_projects_url(bestiary_url, self.conf['projects']['projects_file'])
             bestiary_access = True
         except requests.exceptions.ConnectionError as ex:
             logging.error("Can not connect to bestiary %s", bestiary_url)
         except requests.exceptions.HTTPError as ex:
             logging.error("Can not get projects for %s", bestiary_url)
-        except json.decoder.JSONDecodeError:
-            res_line = res.text.split('\n', 1)[0]
-            logging.error("Can not parse JSON projects for %s: %s", bestiary_url, res_line)
+        except json.decoder.JSONDecodeError as ex:
+            logging.error("Can not parse JSON projects for %s: %s", bestiary_url, ex)
 
         return bestiary_access
 
-    def check_es_access(self):
-
-        # So far there is no way to distinguish between read and write permission
-
-        es_access = True
-        es_error = None
+    @staticmethod
+    def _ofuscate_server_uri(uri):
+        if uri.rfind('@') > 0:
+            pre, post = uri.split('@')
+            char_from = pre.rfind(':')
+            result = uri[0:char_from + 1] + '****@' + post
+            return result
+        else:
+            return uri
 
-        def _ofuscate_server_uri(uri):
-            if uri.rfind('@') > 0:
-                pre, post = uri.split('@')
-                char_from = pre.rfind(':')
-                result = uri[0:char_from + 1] + '****@' + post
-                return result
-            else:
-                return uri
+    def check_es_url(self, es):
+        """Check the access to an Elasticsearch/OpenSearch service.
 
-        es = self.conf['es_collection']['url']
+        :raises ElasticSearchError: when the service can't be accessed
+        """
         try:
             res = self.grimoire_con.get(es)
             res.raise_for_status()
         except Exception:
-            es_access = False
-            es_error = _ofuscate_server_uri(es)
+            raise ElasticSearchError('Cannot connect to Elasticsearch: %s' % self._ofuscate_server_uri(es))
+
+        return True
+
+    def check_es_access(self):
+
+        # So far there is no way to distinguish between read and write permission
 
+        es_access = True
+        es_error = None
+
+        es_urls = [self.conf['es_collection']['url']]
         if self.conf['phases']['enrichment']:
-            es = self.conf['es_enrichment']['url']
+            es_urls.append(self.conf['es_enrichment']['url'])
+
+        for es in es_urls:
             try:
-                res = self.grimoire_con.get(es)
-                res.raise_for_status()
-            except Exception:
+                self.check_es_url(es)
+            except ElasticSearchError:
                 es_access = False
-                es_error = _ofuscate_server_uri(es)
+                es_error = self._ofuscate_server_uri(es)
 
         if not es_access:
             logger.error('Cannot connect to Elasticsearch: %s', es_error)
 
         return es_access
 
+    def preflight(self):
+        """Check the services needed before starting the tasks.
+
+        Elasticsearch, the bestiary and SortingHat are checked at the
+        same time, each one waited at most `preflight_timeout` seconds.
+        The SortingHat client is created once the checks pass.
+
+        :returns: list of `PreflightResult`
+        """
+        timeout = self.conf['general']['preflight_timeout']
+        checks = []
+
+        es_urls = {'es_collection': self.conf['es_collection']['url']}
+        if self.conf['phases']['enrichment']:
+            es_urls['es_enrichment'] = self.conf['es_enrichment']['url']
+
+        checked = set()
+        for name, es in es_urls.items():
+            if es in checked:
+                continue
+            checked.add(es)
+            checks.append(PreflightCheck(name, functools.partial(self.check_es_url, es), timeout))
+
+        if self.conf['projects']['projects_url']:
+            checks.append(PreflightCheck('bestiary', self.check_bestiary_access, timeout))
+
+        if self.conf.get('sortinghat', None) and not hasattr(self, 'client'):
+            checks.append(PreflightCheck('sortinghat',
+                                         functools.partial(self.check_sortinghat_url, timeout), timeout))
+
+        return run_preflight(checks)
+
+    def check_sortinghat_url(self, timeout=None):
+        """Check the access to the SortingHat server.
+
+        The request is sent with `timeout`, so when the check times out
+        its thread ends on its own, without creating a client nor leaving
+        a connection open after the preflight is reported.
+
+        :raises requests.exceptions.RequestException: when the server can't be reached
+        """
+        sortinghat = self.conf['sortinghat']
+        scheme = 'https' if sortinghat.get('ssl', False) else 'http'
+        port = sortinghat.get('port', None)
+        netloc = '%s:%s' % (sortinghat['host'], port) if port else sortinghat['host']
+        path = (sortinghat.get('path', None) or '').strip('/')
+        path = '/%s/' % path if path else '/'
+
+        # Any reply is fine; the credentials are checked by the client
+        requests.get('%s://%s%s' % (scheme, netloc, path), timeout=timeout,
+                     verify=sortinghat.get('verify_ssl', True))
+
+        return True
+
     def _get_repos_by_backend(self):
         #
         # return dict with backend and list of repositories
         #
         output = {}
-        projects = TaskProjects.get_projects()
+        projects = TaskProjects.get_projects_snapshot().projects
 
         for pro in projects:
             # remove duplicates in backends_section with list(set(..))
@@ -138,7 +218,7 @@ class SirMordred:
             backend_sections.sort()
             for backend_section in backend_sections:
                 if backend_section not in output:
-                    output[backend_section] = projects[pro][backend_section]
+                    output[backend_section] = list(projects[pro][backend_section])
                 else:
                     output[backend_section] += projects[pro][backend_section]
 
@@ -157,9 +237,9 @@ class SirMordred:
             Just a wrapper to the execute_batch_tasks method
         """
         sleep_for = self.conf['sortinghat']['sleep_for'] if self.conf.get('sortinghat', None) else 1
-        self.execute_batch_tasks(tasks_cls,
-                                 sleep_for,
-                                 self.conf['general']['min_update_delay'], False)
+        # The delay of the backend tasks is read from the config before
+        # each execution, so it changes when the config is reloaded
+        self.execute_batch_tasks(tasks_cls, sleep_for, None, False)
 
     def execute_batch_tasks(self, tasks_cls, big_delay=0, small_delay=0, wait_for_threads=True):
         """
@@ -167,7 +247,8 @@ class SirMordred:
 
         :param tasks_cls: list of tasks classes to be executed
         :param big_delay: seconds before global tasks are executed, should be days usually
-        :param small_delay: seconds before backend tasks are executed, should be minutes
+        :param small_delay: seconds before backend tasks are executed, should be minutes;
+            if None, `min_update_delay` is read from the config
         :param wait_for_threads: boolean to set when threads are infinite or
                                 should be synchronized in a meeting point
         """
@@ -189,25 +270,50 @@ class SirMordred:
         logger.debug('backend_tasks = %s' % (backend_tasks))
         logger.debug('global_tasks = %s' % (global_tasks))
 
+        if self.conf['general']['scheduler']:
+            self.__execute_scheduled_tasks(backend_tasks, global_tasks,
+                                           big_delay, small_delay, wait_for_threads)
+            return
+
+        executor = self.conf['general']['executor']
+        if executor not in EXECUTORS:
+            raise RuntimeError("Wrong executor %s, valid values are: %s" % (executor, ', '.join(EXECUTORS)))
+
         threads = []
 
         # stopper won't be set unless wait_for_threads is True
-        stopper = threading.Event()
+        if executor == PROCESS_EXECUTOR:
+            self.__setup_process_executor()
+            stopper = self.mp_context.Event()
+        else:
+            stopper = threading.Event()
 
-        # launching threads for tasks by backend
+        # launching threads (or processes) for tasks by backend
+        managers = {}
         if len(backend_tasks) > 0:
             repos_backend = self._get_repos_by_backend()
             for backend in repos_backend:
                 # Start new Threads and add them to the threads list to complete
-                t = TasksManager(backend_tasks, backend, stopper, self.config, self.client, small_delay)
+                t = self.__start_backend_tasks(backend_tasks, backend, stopper, small_delay, executor)
+                managers[backend] = t
                 threads.append(t)
-                t.start()
+
+        if not wait_for_threads and backend_tasks:
+            with self.__batch_lock:
+                self.__backend_batch = {
+                    'tasks': backend_tasks,
+                    'delay': small_delay,
+                    'stopper': stopper,
+                    'executor': executor,
+                    'managers': managers,
+                    'threads': threads
+                }
 
         # launch thread for global tasks
         if len(global_tasks) > 0:
             # FIXME timer is applied to all global_tasks, does it make sense?
             # All tasks are executed in the same thread sequentially
-            gt = TasksManager(global_tasks, "Global tasks", stopper, self.config, self.client, big_delay)
+            gt = TasksManager(global_tasks, GLOBAL_TASKS, stopper, self.config, self.client, big_delay)
             threads.append(gt)
             gt.start()
             if big_delay > 0:
@@ -220,15 +326,95 @@ class SirMordred:
             time.sleep(1)  # Give enough time create and run all threads
             stopper.set()  # All threads must stop in the next iteration
 
-        # Wait for all threads to complete
-        for t in threads:
+        # Wait for all threads to complete, including the ones
+        # started when the config is reloaded
+        joined = 0
+        while True:
+            with self.__batch_lock:
+                if joined == len(threads):
+                    self.__backend_batch = None
+                    break
+                t = threads[joined]
             t.join()
+            joined += 1
 
         # Checking for exceptions in threads to log them
         self.__check_queue_for_errors()
 
         logger.debug("[thread:main] All threads (and their tasks) are finished")
 
+    def __start_backend_tasks(self, backend_tasks, backend, stopper, small_delay, executor):
+        """Start a thread (or a process) to execute the tasks of a backend section"""
+
+        if executor == PROCESS_EXECUTOR:
+            t = self.mp_context.Process(target=run_tasks_process, name=backend,
+                                        args=(backend_tasks, backend, stopper, self.config, small_delay,
+                                              TasksManager.COMM_QUEUE, TasksManager.IDENTITIES_ENRICH_LOCK,
+                                              create_sortinghat_client, TasksManager.CANCEL_EVENT))
+        else:
+            t = TasksManager(backend_tasks, backend, stopper, self.config, self.client, small_delay)
+        t.start()
+
+        return t
+
+    def __execute_scheduled_tasks(self, backend_tasks, global_tasks, big_delay, small_delay, run_once):
+        """
+        Execute the tasks with a pool of workers fed by a single queue
+        sorted by due time, instead of a thread per backend section.
+
+        :param backend_tasks: list of tasks classes executed by backend
+        :param global_tasks: list of tasks classes executed with no specific backend
+        :param big_delay: seconds between global tasks executions
+        :param small_delay: seconds between backend tasks executions
+        :param run_once: if True, the tasks are executed just one time
+        """
+        scheduler = TasksScheduler(self.config, self.client,
+                                   workers=self.conf['general']['scheduler_workers'])
+        self.scheduler = scheduler
+        if TasksManager.CANCEL_EVENT.is_set():
+            scheduler.stop()
+
+        managers = {}
+        if len(backend_tasks) > 0:
+            repos_backend = self._get_repos_by_backend()
+            for backend in repos_backend:
+                managers[backend] = scheduler.add_tasks(backend_tasks, backend, small_delay)
+
+        if len(global_tasks) > 0:
+            scheduler.add_tasks(global_tasks, GLOBAL_TASKS, big_delay)
+
+        if not run_once and backend_tasks:
+            with self.__batch_lock:
+                self.__backend_batch = {
+                    'tasks': backend_tasks,
+                    'delay': small_delay,
+                    'managers': managers
+                }
+
+        scheduler.run(repeat=not run_once)
+        with self.__batch_lock:
+            self.__backend_batch = None
+        self.scheduler = None
+
+        # Checking for exceptions in tasks to log them
+        self.__check_queue_for_errors()
+
+    def __setup_process_executor(self):
+        """
+        Share the queue of exceptions and the identities/enrichment lock
+        with the processes that will execute the backend tasks.
+        """
+        if self.mp_context:
+            return
+
+        self.mp_context = multiprocessing.get_context()
+        TasksManager.COMM_QUEUE = self.mp_context.Queue()
+        TasksManager.IDENTITIES_ENRICH_LOCK = ReadersWriterLock(self.mp_context)
+        cancelled = TasksManager.CANCEL_EVENT.is_set()
+        TasksManager.CANCEL_EVENT = self.mp_context.Event()
+        if cancelled:
+            TasksManager.CANCEL_EVENT.set()
+
     def __check_queue_for_errors(self):
         try:
             exc = TasksManager.COMM_QUEUE.get(block=False)
@@ -247,22 +433,133 @@ class SirMordred:
         stopper = threading.Event()
 
         if self.conf['phases']['panels']:
+            from sirmordred.task_panels import TaskPanels, TaskPanelsMenu
+
+            background = self.conf['panels'].get('background', False)
+            if background and not self.conf['general']['scheduler'] \
+                    and self.conf['general']['executor'] == PROCESS_EXECUTOR:
+                # The cancel event is replaced when the processes are set up
+                self.__setup_process_executor()
+
             tasks = [TaskPanels, TaskPanelsMenu]
             stopper.set()
-            tm = TasksManager(tasks, "Global tasks", stopper, self.config, self.client)
+            tm = TasksManager(tasks, GLOBAL_TASKS, stopper, self.config, self.client)
             tm.start()
-            tm.join()
+            if background:
+                # The panels are uploaded while the first collection starts
+                logger.info("Uploading panels in the background")
+                self.__panels_manager = tm
+            else:
+                tm.join()
 
         logger.info("Loading projects")
         tasks = [TaskProjects]
         stopper.set()
-        tm = TasksManager(tasks, "Global tasks", stopper, self.config, self.client)
+        tm = TasksManager(tasks, GLOBAL_TASKS, stopper, self.config, self.client)
         tm.start()
         tm.join()
         logger.info("Projects loaded")
 
         return
 
+    def __catch_up_projects(self, delta):
+        """Collect and enrich the repositories added to the projects right away"""
+
+        from sirmordred.task_catch_up import create_catch_up_tasks
+
+        cleanup = self.conf['general']['catch_up_cleanup']
+
+        if not self.scheduler and self.conf['general']['executor'] == PROCESS_EXECUTOR:
+            # The tasks of the sections run in other processes, which
+            # read the new projects in their next execution
+            logger.info("Catch-up tasks not available with the %s executor", PROCESS_EXECUTOR)
+            return
+
+        for backend_section in delta.backend_sections:
+            if backend_section not in self.conf:
+                continue
+
+            tasks = create_catch_up_tasks(self.config, self.client, backend_section, delta, cleanup)
+            if not tasks:
+                continue
+
+            logger.info("[%s] catch-up tasks queued: %s", backend_section, tasks)
+            if self.scheduler:
+                self.scheduler.add_tasks_once(tasks, backend_section)
+                continue
+
+            stopper = threading.Event()
+            stopper.set()
+            tm = TasksManager([], backend_section, stopper, self.config, self.client)
+            for task in tasks:
+                task.cancel_event = TasksManager.CANCEL_EVENT
+                tm.add_task(task)
+            tm.start()
+
+    def __apply_config_changes(self, changed):
+        """Start the tasks of the backend sections added to the config.
+
+        The tasks of the sections removed from the config stop by
+        themselves before their next execution, and the running ones
+        read the new values of the params in their next execution.
+        The processes executing the tasks are asked to reload their
+        copy of the config.
+
+        :param changed: sections changed in the config
+        """
+        with self.__batch_lock:
+            batch = self.__backend_batch
+            if not batch:
+                return
+
+            managers = batch['managers']
+            scheduler = self.scheduler
+            executor = batch.get('executor', None)
+
+            if executor == PROCESS_EXECUTOR:
+                for t in managers.values():
+                    if t.is_alive():
+                        os.kill(t.pid, signal.SIGHUP)
+
+            for backend in self._get_repos_by_backend():
+                running = managers.get(backend, None)
+                if running and (running.active if scheduler else running.is_alive()):
+                    continue
+
+                logger.info("[%s] Section added to the config, starting its tasks", backend)
+                if scheduler:
+                    managers[backend] = scheduler.add_tasks(batch['tasks'], backend, batch['delay'])
+                else:
+                    t = self.__start_backend_tasks(batch['tasks'], backend, batch['stopper'],
+                                                   batch['delay'], executor)
+                    managers[backend] = t
+                    batch['threads'].append(t)
+
+    def reload_config(self):
+        """Read the config files again and apply their changes"""
+
+        if self.config_watcher:
+            self.config_watcher.request_reload()
+
+    def __handle_reload_signal(self, signum, frame):
+        logger.info("Signal %s received, reloading the config ...", signum)
+        self.reload_config()
+
+    def cancel(self):
+        """Cancel the running tasks.
+
+        The tasks stop at the next repository they process. When
+        `checkpoints_file` is set, the next execution resumes from
+        the repositories not processed yet.
+        """
+        TasksManager.CANCEL_EVENT.set()
+        if self.scheduler:
+            self.scheduler.stop()
+
+    def __handle_signal(self, signum, frame):
+        logger.info("Signal %s received, cancelling the tasks ...", signum)
+        self.cancel()
+
     def start(self):
         """
         This method defines the workflow of SirMordred. So it calls to:
@@ -279,31 +576,49 @@ class SirMordred:
         logger.info("Starting SirMordred engine ...")
         logger.info("----------------------------")
 
-        # check we have access to the needed ES
-        if not self.check_es_access():
-            print('Can not access ElasticSearch/OpenSearch service. Exiting sirmordred ...')
+        # check we have access to ES, bestiary and SortingHat at once
+        results = self.preflight()
+        if not all(result.ok for result in results):
+            print('{}. Exiting sirmordred ...'.format(format_preflight(results)))
             sys.exit(1)
 
-        # If bestiary is configured check that it is working
-        if self.conf['projects']['projects_url']:
-            if not self.check_bestiary_access():
-                print('Can not access bestiary service. Exiting sirmordred ...')
-                sys.exit(1)
-
-        # Create SortingHat Client
+        # Create SortingHat Client, if it wasn't created by the preflight
         self.__create_sh_client(self.config)
 
+        # Limit the load sent to the Elasticsearch clusters
+        configure_es_admission(self.conf['general'])
+
+        # Apply the changes of the config without restarting
+        self.config_watcher = ConfigWatcher(self.config, self.__apply_config_changes,
+                                            watch_files=self.conf['general']['watch_config'])
+        self.config_watcher.start()
+
+        # Stop the tasks cooperatively on SIGTERM and reload the config on SIGHUP
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.__handle_signal)
+            if hasattr(signal, 'SIGHUP'):
+                signal.signal(signal.SIGHUP, self.__handle_reload_signal)
+
         # Initial round: panels and projects loading
         self.__execute_initial_load()
 
-        # Tasks to be executed during updating process
+        if self.conf['general']['catch_up']:
+            TaskProjects.add_delta_listener(self.__catch_up_projects)
+
+        # Tasks to be executed during updating process; the modules
+        # of each phase (and GrimoireELK connectors) are imported only
+        # when the phase is enabled
         all_tasks_cls = []
         all_tasks_cls.append(TaskProjects)  # projects update is always needed
         if self.conf['phases']['collection']:
+            from sirmordred.task_collection import TaskRawDataCollection
             all_tasks_cls.append(TaskRawDataCollection)
         if self.conf['phases']['identities']:
+            from sirmordred.task_identities import TaskIdentitiesMerge
             all_tasks_cls.append(TaskIdentitiesMerge)
         if self.conf['phases']['enrichment']:
+            from sirmordred.task_autorefresh import TaskAutorefresh
+            from sirmordred.task_enrich import TaskEnrich
             all_tasks_cls.append(TaskEnrich)
             all_tasks_cls.append(TaskAutorefresh)
 
@@ -326,6 +641,10 @@ class SirMordred:
                 else:
                     self.execute_nonstop_tasks(all_tasks_cls)
 
+                if TasksManager.CANCEL_EVENT.is_set():
+                    logger.info("Tasks cancelled")
+                    break
+
                 # FIXME this point is never reached so despite the exception is
                 # handled and the error is shown, the traceback is not printed
 
@@ -339,6 +658,15 @@ class SirMordred:
                 var = traceback.format_exc()
                 logger.error(var)
 
+        if self.__panels_manager:
+            self.__panels_manager.join()
+            self.__panels_manager = None
+
+        self.config_watcher.stop()
+        self.config_watcher = None
+
+        uninstall_es_admission()
+
         logger.info("Finished SirMordred engine ...")
 
     def __create_sh_client(self, config):
@@ -357,11 +685,25 @@ class SirMordred:
         self.db_tenant = sortinghat.get('tenant', True) if sortinghat else None
         self.db_unaffiliate_group = sortinghat['unaffiliated_group'] if sortinghat else None
         if sortinghat and not hasattr(self, 'client'):
-            self.client = SortingHatClient(host=self.db_host, port=self.db_port,
-                                           path=self.db_path, ssl=self.db_ssl,
-                                           user=self.db_user, password=self.db_password,
-                                           verify_ssl=self.db_verify_ssl,
-                                           tenant=self.db_tenant)
-            self.client.connect()
+            self.client = create_sortinghat_client(config)
         elif not sortinghat:
             self.client = None
+
+
+def create_sortinghat_client(config):
+    """Create and connect a SortingHat client, or return `None` when it is not configured"""
+
+    sortinghat = config.get_conf().get('sortinghat', None)
+    if not sortinghat:
+        return None
+
+    from sortinghat.cli.client import SortingHatClient
+
+    client = SortingHatClient(host=sortinghat['host'], port=sortinghat.get('port', None),
+                              path=sortinghat.get('path', None), ssl=sortinghat.get('ssl', False),
+                              user=sortinghat['user'], password=sortinghat['password'],
+                              verify_ssl=sortinghat.get('verify_ssl', True),
+                              tenant=sortinghat.get('tenant', True))
+    client.connect()
+
+    return client
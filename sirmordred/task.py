@@ -26,10 +26,12 @@ import json
 import logging
 import re
 
-from grimoire_elk.elk import get_ocean_backend
-from grimoire_elk.utils import get_connector_from_name, get_elastic
 from grimoire_elk.enriched.utils import grimoire_con
 
+from sirmordred.error import TaskCancelled
+from sirmordred.local_store import get_local_store
+from sirmordred.work_pool import get_shared_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,7 +40,9 @@ class Task():
 
     NO_BACKEND_FIELDS = ['enriched_index', 'raw_index', 'es_collection_url',
                          'collect', 'pair-programming', 'fetch-archive',
-                         'studies', 'node_regex', 'anonymize']
+                         'studies', 'node_regex', 'anonymize', 'collection_workers',
+                         'enrich_workers', 'min_update_delay', 'update_hour', 'change_probe',
+                         'enrich_batch_size', 'studies_workers']
     PARAMS_WITH_SPACES = ['blacklist-jobs']
 
     def __init__(self, config, sortinghat_client=None):
@@ -46,6 +50,8 @@ class Task():
         self.config = config
         self.conf = config.get_conf()
         self.client = sortinghat_client
+        # event set to cancel the task as soon as possible
+        self.cancel_event = None
 
         sortinghat = self.conf.get('sortinghat', None)
         self.db_sh = sortinghat['database'] if sortinghat else None
@@ -78,6 +84,86 @@ class Task():
 
         return aliases
 
+    def is_cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Raise `TaskCancelled` if the task was cancelled"""
+
+        if self.is_cancelled():
+            raise TaskCancelled('%s cancelled for %s' % (self.__class__.__name__, self.backend_section))
+
+    def _get_shared_pool(self, cfg):
+        """Get the pool of workers shared by all the backend sections, if any"""
+
+        return get_shared_pool(cfg['general'].get('shared_workers', None))
+
+    def _resume_checkpoint(self, phase, repos, state=None):
+        """Start a checkpoint of `phase` or resume an interrupted one.
+
+        The checkpoints are enabled with `checkpoints_file` in the
+        `general` section. When the previous execution of `phase` was
+        interrupted, the repositories it processed are removed from
+        `repos` and the state saved with it is returned instead of
+        `state`.
+
+        :param phase: name of the phase (i.e. collection, enrichment)
+        :param repos: repositories to process
+        :param state: JSON serializable data needed to resume the phase
+
+        :returns: a tuple with the pending repositories and the state
+        """
+        store = self.__get_checkpoints_store()
+        if not store:
+            return repos, state
+
+        key = self.__get_checkpoint_key(phase)
+        checkpoint = store.get(key)
+        if not checkpoint:
+            # The repositories of a checkpoint not cleared completely are discarded
+            store.delete(key + ' repos')
+            store.set(key, {'state': state})
+            return repos, state
+
+        done = set(store.get(key + ' repos') or [])
+        pending = [repo for repo in repos if self.anonymize_url(repo) not in done]
+        logger.info('[%s] %s resumed, %s repositories already processed',
+                    self.backend_section, phase, len(repos) - len(pending))
+
+        return pending, checkpoint['state']
+
+    def _add_checkpoint(self, phase, repo):
+        """Record that `repo` was processed in the current execution of `phase`.
+
+        The repositories are appended to the store, so the checkpoint
+        (i.e. the state) is not written again for each of them.
+        """
+        store = self.__get_checkpoints_store()
+        if not store:
+            return
+
+        store.append(self.__get_checkpoint_key(phase) + ' repos', self.anonymize_url(repo))
+
+    def _clear_checkpoint(self, phase):
+        """Remove the checkpoint once all the repositories of `phase` are processed"""
+
+        store = self.__get_checkpoints_store()
+        if store:
+            key = self.__get_checkpoint_key(phase)
+            store.delete(key)
+            store.delete(key + ' repos')
+
+    def __get_checkpoints_store(self):
+        # Executions for a subset of the repositories don't have checkpoints
+        if getattr(self, 'allowed_repos', None) is not None:
+            return None
+
+        path = self.conf['general'].get('checkpoints_file', None)
+        return get_local_store(path) if path else None
+
+    def __get_checkpoint_key(self, phase):
+        return '%s %s' % (self.backend_section, phase)
+
     def is_backend_task(self):
         """
         Returns True if the Task is executed per backend.
@@ -107,6 +193,8 @@ class Task():
         :param backend_section: name of the backend section
         :param repo: repo url in projects.json
         """
+        from grimoire_elk.utils import get_connector_from_name
+
         backend = self.get_backend(backend_section)
         connector = get_connector_from_name(backend)
         ocean = connector[1]
@@ -115,6 +203,8 @@ class Task():
         return processed_repo, tags_lst
 
     def _compose_p2o_params(self, backend_section, repo):
+        from grimoire_elk.utils import get_connector_from_name
+
         # get p2o params included in the projects list
         params = {}
 
@@ -128,6 +218,8 @@ class Task():
         return params
 
     def _compose_perceval_params(self, backend_section, repo):
+        from grimoire_elk.utils import get_connector_from_name
+
         backend = self.get_backend(backend_section)
         connector = get_connector_from_name(backend)
         ocean = connector[1]
@@ -171,6 +263,8 @@ class Task():
         return es_col_url
 
     def _get_enrich_backend(self):
+        from grimoire_elk.utils import get_connector_from_name, get_elastic
+
         json_projects_map = None
         clean = False
         connector = get_connector_from_name(self.get_backend(self.backend_section))
@@ -195,6 +289,9 @@ class Task():
         return enrich_backend
 
     def _get_ocean_backend(self, enrich_backend):
+        from grimoire_elk.elk import get_ocean_backend
+        from grimoire_elk.utils import get_elastic
+
         backend_cmd = None
 
         no_incremental = False
@@ -241,5 +338,7 @@ class Task():
 
     @staticmethod
     def retain_data(retention_time, es_url, index):
+        from grimoire_elk.utils import get_elastic
+
         elastic = get_elastic(es_url, index)
         elastic.delete_items(retention_time)
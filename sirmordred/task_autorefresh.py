@@ -55,7 +55,7 @@ class TaskAutorefresh(Task):
         """Get all the backends' sections enabled"""
 
         backends = []
-        projects = TaskProjects.get_projects()
+        projects = TaskProjects.get_projects_snapshot().projects
 
         for pro in projects:
             for sect in projects[pro].keys():
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import json
+import logging
+
+from grimoire_elk.elastic import HEADER_JSON
+from grimoire_elk.utils import get_elastic
+
+from sirmordred.task import Task
+from sirmordred.task_collection import TaskRawDataCollection
+from sirmordred.task_enrich import TaskEnrich
+from sirmordred.task_projects import TaskProjects
+
+logger = logging.getLogger(__name__)
+
+
+class TaskReposCleanup(Task):
+    """Delete the data of the repositories removed from the projects.
+
+    The items are deleted by `origin` from the raw and the enriched
+    indexes. Repositories using `--filter-raw` are skipped, because
+    their origin is shared with other repositories, and so are the
+    ones whose origin is still used by another repository of any
+    backend section writing to the same index.
+
+    :param removed_raw: repositories removed from the collection
+    :param removed_enrich: repositories removed from the enrichment
+    """
+
+    def __init__(self, config, sortinghat_client=None, backend_section=None,
+                 removed_raw=None, removed_enrich=None):
+        super().__init__(config, sortinghat_client)
+        self.backend_section = backend_section
+        self.removed_raw = removed_raw or []
+        self.removed_enrich = removed_enrich or []
+
+    def execute(self):
+        cfg = self.config.get_conf()
+
+        if self.removed_raw:
+            self.__delete_repos(self.removed_raw, True,
+                                self._get_collection_url(), 'raw_index')
+        if self.removed_enrich:
+            self.__delete_repos(self.removed_enrich, False,
+                                cfg['es_enrichment']['url'], 'enriched_index')
+
+    def _get_origins_in_use(self, index_param, raw):
+        """Get the origins used by the sections writing to the same index as this one.
+
+        :param index_param: param with the name of the index (`raw_index` or `enriched_index`)
+        :param raw: if True, the repositories collected are considered; otherwise, the enriched ones
+        """
+        cfg = self.config.get_conf()
+        index = cfg[self.backend_section][index_param]
+
+        in_use = set()
+        for section in cfg.conf:
+            if section.split(':')[0] not in cfg.get_backend_sections():
+                continue
+            if cfg[section].get(index_param, None) != index:
+                continue
+            for repo in TaskProjects.get_repos_by_backend_section(section, raw=raw):
+                in_use.add(self.__get_origin(repo, section)[0])
+
+        return in_use
+
+    def __delete_repos(self, repos, raw, es_url, index_param):
+        index = self.config.get_conf()[self.backend_section][index_param]
+        in_use = self._get_origins_in_use(index_param, raw)
+
+        elastic = get_elastic(es_url, index)
+        for repo in repos:
+            origin, filter_raw = self.__get_origin(repo)
+            if filter_raw or origin in in_use:
+                logger.info('[%s] data of %s not deleted, its origin is shared with other repositories',
+                            self.backend_section, self.anonymize_url(repo))
+                continue
+
+            query = {"query": {"term": {"origin": origin}}}
+            res = elastic.requests.post(elastic.index_url + "/_delete_by_query?refresh",
+                                        data=json.dumps(query), headers=HEADER_JSON)
+            res.raise_for_status()
+            logger.info('[%s] %s items of %s deleted from %s', self.backend_section,
+                        res.json()['deleted'], self.anonymize_url(origin), index)
+
+    def __get_origin(self, repo, backend_section=None):
+        backend_section = backend_section or self.backend_section
+        repo, _ = self._extract_repo_tags(backend_section, repo)
+        p2o_args = self._compose_p2o_params(backend_section, repo)
+
+        return p2o_args['url'], p2o_args.get('filter-raw', None)
+
+
+def create_catch_up_tasks(config, sortinghat_client, backend_section, delta, cleanup=False):
+    """Create the tasks to process the changes of the projects in a backend section.
+
+    The repositories added are collected and enriched right away,
+    instead of waiting for the next execution of the tasks of the
+    backend section. The tasks wait until the task of the section
+    being executed, if any, finishes. When `cleanup` is set, the
+    data of the repositories removed is deleted.
+
+    :param config: config object
+    :param sortinghat_client: SortingHat client
+    :param backend_section: backend section name
+    :param delta: `ProjectsDelta` with the changes of the projects
+    :param cleanup: delete the data of the removed repositories
+
+    :returns: list of tasks to execute in order
+    """
+    conf = config.get_conf()
+    raw_delta = delta.get(backend_section)
+    enrich_delta = delta.get(backend_section, raw=False)
+    tasks = []
+
+    if raw_delta.added and conf['phases']['collection']:
+        tasks.append(TaskRawDataCollection(config, sortinghat_client, backend_section,
+                                           allowed_repos=raw_delta.added))
+
+    if enrich_delta.added and conf['phases']['enrichment']:
+        tasks.append(TaskEnrich(config, sortinghat_client, backend_section,
+                                allowed_repos=enrich_delta.added))
+
+    if cleanup and (raw_delta.removed or enrich_delta.removed):
+        tasks.append(TaskReposCleanup(config, sortinghat_client, backend_section,
+                                      removed_raw=raw_delta.removed,
+                                      removed_enrich=enrich_delta.removed))
+
+    return tasks
@@ -22,15 +22,21 @@
 #
 
 import logging
+import os
+import queue
+import threading
 import traceback
 
-from grimoire_elk.elk import feed_backend
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 from grimoire_elk.elastic_items import ElasticItems
 from grimoire_elk.elastic import ElasticSearch
 
 from grimoirelab_toolkit.datetime import datetime_utcnow
 
+from sirmordred.change_probes import CHANGE_PROBES
 from sirmordred.error import DataCollectionError
+from sirmordred.local_store import get_local_store
 from sirmordred.task import Task
 from sirmordred.task_projects import TaskProjects
 
@@ -41,6 +47,12 @@ logger = logging.getLogger(__name__)
 class TaskRawDataCollection(Task):
     """ Basic class shared by all collection tasks """
 
+    # limit the number of repositories collected at the same time
+    # across all the backend sections
+    _collection_slots = None
+    _collection_slots_size = None
+    _collection_slots_lock = threading.Lock()
+
     def __init__(self, config, sortinghat_client=None, backend_section=None, allowed_repos=None):
         super().__init__(config, sortinghat_client)
 
@@ -48,6 +60,8 @@ class TaskRawDataCollection(Task):
         self.allowed_repos = set(allowed_repos) if allowed_repos else None
         # This will be options in next iteration
         self.clean = False
+        # function called with each repository once its data is collected
+        self.on_repo_collected = None
 
     def select_aliases(self, cfg, backend_section):
 
@@ -60,6 +74,185 @@ class TaskRawDataCollection(Task):
 
         return found
 
+    @classmethod
+    def _get_collection_slots(cls, max_workers):
+        """Get the semaphore shared by all the collection tasks.
+
+        The semaphore limits the number of repositories collected at the
+        same time across all the backend sections. When `max_workers` is
+        not set, no global limit is applied and `None` is returned.
+
+        :param max_workers: maximum number of repositories collected in parallel
+        """
+        if not max_workers:
+            return None
+
+        with cls._collection_slots_lock:
+            if cls._collection_slots is None or cls._collection_slots_size != max_workers:
+                cls._collection_slots = threading.BoundedSemaphore(max_workers)
+                cls._collection_slots_size = max_workers
+
+        return cls._collection_slots
+
+    def _get_collection_workers(self, cfg):
+        """Number of repositories of the backend section collected in parallel"""
+
+        workers = cfg[self.backend_section].get('collection_workers', None)
+        if not workers:
+            workers = cfg['general'].get('collection_workers', 1)
+
+        return max(workers, 1)
+
+    @staticmethod
+    def _get_fingerprints_store(cfg):
+        """Get the store of fingerprints shared by all the collection tasks"""
+
+        path = cfg['general'].get('fingerprints_file', None)
+        if not path:
+            path = os.path.join(cfg['general']['logs_dir'], 'fingerprints.json')
+
+        return get_local_store(path)
+
+    def _get_change_probe(self, cfg):
+        """Probe used to check if the repositories changed before collecting them"""
+
+        name = cfg[self.backend_section].get('change_probe', None)
+        if not name:
+            return None
+
+        if name not in CHANGE_PROBES:
+            raise DataCollectionError("Unknown change probe %s in %s; valid probes: %s"
+                                      % (name, self.backend_section, ', '.join(sorted(CHANGE_PROBES))))
+
+        probe_cls = CHANGE_PROBES[name]
+        backend = self.get_backend(self.backend_section)
+        if not probe_cls.supports(backend):
+            # The repositories are always collected
+            logger.warning("[%s] change probe %s doesn't support %s repositories, ignoring it",
+                           self.backend_section, name, backend)
+            return None
+
+        return probe_cls()
+
+    def __collect_repo(self, cfg, repo, fetch_archive, anonymize, slots, probe=None, fingerprints=None,
+                       notify=None):
+        # grimoire_elk.elk imports all the connectors, only needed when collecting
+        from grimoire_elk.elk import feed_backend
+
+        self.check_cancelled()
+
+        notify = notify if notify else self.on_repo_collected
+
+        project_repo = repo
+        repo, repo_labels = self._extract_repo_tags(self.backend_section, repo)
+        p2o_args = self._compose_p2o_params(self.backend_section, repo)
+        filter_raw = p2o_args.get('filter-raw', None)
+        no_collection = p2o_args.get('filter-no-collection', None)
+
+        if no_collection:
+            # If no-collection is set to true, the repository data is not collected.
+            logging.warning("Not collecting archive repository: %s", repo)
+            return None
+        if filter_raw:
+            # If filter-raw exists it means that there is an equivalent URL
+            # in the `unknown` section of the projects.json. Thus the URL with
+            # filter-raw is ignored in the collection phase, while the URL
+            # in `unknown` is considered in this phase.
+            logging.warning("Not collecting filter raw repository: %s", repo)
+            return None
+
+        url = p2o_args['url']
+        backend_args = self._compose_perceval_params(self.backend_section, repo)
+        logger.debug(backend_args)
+        es_col_url = self._get_collection_url()
+        ds = self.backend_section
+        backend = self.get_backend(self.backend_section)
+        project = None  # just used for github in cauldron
+        clean = False
+
+        es_aliases = self.select_aliases(cfg, self.backend_section)
+
+        fingerprint = None
+        if probe:
+            fingerprint_key = "%s %s" % (self.backend_section, self.anonymize_url(url))
+            fingerprint = probe.fingerprint(url)
+            if fingerprint and fingerprint == fingerprints.get(fingerprint_key):
+                logger.info('[%s] collection skipped for %s, no changes found',
+                            self.backend_section, self.anonymize_url(repo))
+                self._add_checkpoint('collection', project_repo)
+                if notify:
+                    notify(repo)
+                return None
+
+        if slots:
+            slots.acquire()
+        try:
+            repo_start = datetime_utcnow()
+            logger.info('[%s] collection starts for %s', self.backend_section, self.anonymize_url(repo))
+            error_msg = feed_backend(es_col_url, clean, fetch_archive, backend, backend_args,
+                                     cfg[ds]['raw_index'], cfg[ds]['enriched_index'], project,
+                                     es_aliases=es_aliases, projects_json_repo=repo,
+                                     repo_labels=repo_labels, anonymize=anonymize)
+            error = {
+                'backend': backend,
+                'repo': repo,
+                'error': error_msg
+            }
+        except Exception:
+            logger.error("Something went wrong collecting data from this %s repo: %s . "
+                         "Using the backend_args: %s " % (ds, url, str(backend_args)))
+            traceback.print_exc()
+            raise DataCollectionError('Failed to collect data from %s' % url)
+        finally:
+            if slots:
+                slots.release()
+
+        spent_time = str(datetime_utcnow() - repo_start).split('.')[0]
+        logger.info('[%s] collection finished for %s in %s',
+                    self.backend_section, self.anonymize_url(repo), spent_time)
+
+        # The fingerprint was taken before collecting, so the changes
+        # done meanwhile will be collected in the next execution
+        if fingerprint and not error_msg:
+            fingerprints.set(fingerprint_key, fingerprint)
+        if not error_msg:
+            self._add_checkpoint('collection', project_repo)
+
+        if notify:
+            notify(repo)
+
+        return error
+
+    def __collect_shared(self, pool, cfg, repos, collect_args):
+        """Collect the repositories using the pool shared by all the sections.
+
+        The repositories collected are notified from this thread instead
+        of the workers, so a slow consumer never blocks the shared workers.
+        """
+        collected = queue.Queue()
+
+        def _notify_collected():
+            while not collected.empty():
+                self.on_repo_collected(collected.get())
+
+        futures = [pool.submit(self.backend_section, self.__collect_repo, cfg, repo, *collect_args,
+                               notify=collected.put if self.on_repo_collected else None)
+                   for repo in repos]
+        try:
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _notify_collected()
+                for future in done:
+                    future.result()
+        except Exception:
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            raise
+
+        return [future.result() for future in futures]
+
     def execute(self):
 
         errors = []
@@ -78,7 +271,6 @@ class TaskRawDataCollection(Task):
         time_start = datetime_utcnow()
         logger.info('[%s] collection phase starts', self.backend_section)
         print("Collection for {}: starting...".format(self.backend_section))
-        clean = False
 
         fetch_archive = False
         if 'fetch-archive' in cfg[self.backend_section] and cfg[self.backend_section]['fetch-archive']:
@@ -95,53 +287,40 @@ class TaskRawDataCollection(Task):
             # Filter repos to only those specified
             repos = sorted(list(set(repos) & self.allowed_repos))
 
-        for repo in repos:
-            repo, repo_labels = self._extract_repo_tags(self.backend_section, repo)
-            p2o_args = self._compose_p2o_params(self.backend_section, repo)
-            filter_raw = p2o_args.get('filter-raw', None)
-            no_collection = p2o_args.get('filter-no-collection', None)
-
-            if no_collection:
-                # If no-collection is set to true, the repository data is not collected.
-                logging.warning("Not collecting archive repository: %s", repo)
-                continue
-            if filter_raw:
-                # If filter-raw exists it means that there is an equivalent URL
-                # in the `unknown` section of the projects.json. Thus the URL with
-                # filter-raw is ignored in the collection phase, while the URL
-                # in `unknown` is considered in this phase.
-                logging.warning("Not collecting filter raw repository: %s", repo)
-                continue
-
-            url = p2o_args['url']
-            backend_args = self._compose_perceval_params(self.backend_section, repo)
-            logger.debug(backend_args)
-            logger.info('[%s] collection starts for %s', self.backend_section, self.anonymize_url(repo))
-            es_col_url = self._get_collection_url()
-            ds = self.backend_section
-            backend = self.get_backend(self.backend_section)
-            project = None  # just used for github in cauldron
+        repos, _ = self._resume_checkpoint('collection', repos)
+
+        slots = self._get_collection_slots(cfg['general'].get('max_collection_workers', None))
+        workers = self._get_collection_workers(cfg)
+        probe = self._get_change_probe(cfg)
+        fingerprints = self._get_fingerprints_store(cfg) if probe else None
+        collect_args = (fetch_archive, anonymize, slots, probe, fingerprints)
 
-            es_aliases = self.select_aliases(cfg, self.backend_section)
+        pool = self._get_shared_pool(cfg)
 
+        if pool:
+            logger.info('[%s] collecting %s repositories using the shared pool',
+                        self.backend_section, len(repos))
+            results = self.__collect_shared(pool, cfg, repos, collect_args)
+        elif workers == 1 or len(repos) <= 1:
+            results = [self.__collect_repo(cfg, repo, *collect_args) for repo in repos]
+        else:
+            logger.info('[%s] collecting %s repositories using %s workers',
+                        self.backend_section, len(repos), workers)
+            executor = ThreadPoolExecutor(max_workers=workers,
+                                          thread_name_prefix=self.backend_section)
             try:
-                error_msg = feed_backend(es_col_url, clean, fetch_archive, backend, backend_args,
-                                         cfg[ds]['raw_index'], cfg[ds]['enriched_index'], project,
-                                         es_aliases=es_aliases, projects_json_repo=repo,
-                                         repo_labels=repo_labels, anonymize=anonymize)
-                error = {
-                    'backend': backend,
-                    'repo': repo,
-                    'error': error_msg
-                }
-
-                errors.append(error)
+                futures = [executor.submit(self.__collect_repo, cfg, repo, *collect_args)
+                           for repo in repos]
+                # The results are retrieved in order so the errors list keeps
+                # the same order of the repositories
+                results = [future.result() for future in futures]
             except Exception:
-                logger.error("Something went wrong collecting data from this %s repo: %s . "
-                             "Using the backend_args: %s " % (ds, url, str(backend_args)))
-                traceback.print_exc()
-                raise DataCollectionError('Failed to collect data from %s' % url)
-            logger.info('[%s] collection finished for %s', self.backend_section, self.anonymize_url(repo))
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+            executor.shutdown(wait=True)
+
+        errors = [error for error in results if error is not None]
+        self._clear_checkpoint('collection')
 
         spent_time = str(datetime_utcnow() - time_start).split('.')[0]
         logger.info('[%s] collection phase finished in %s',
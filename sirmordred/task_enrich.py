@@ -22,23 +22,37 @@
 #     Quan Zhou <quan@bitergia.com>
 #
 
+import copy
+import functools
+import inspect
+import json
 import logging
-import time
+import queue
+import threading
 
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
 
+import requests
+
 from opensearchpy import OpenSearch, RequestsHttpConnection
 
 from grimoire_elk.elk import (do_studies,
                               enrich_backend,
+                              enrich_items,
+                              init_backend,
+                              load_identities,
                               refresh_projects,
                               refresh_identities,
                               retain_identities,
                               populate_identities_index)
 from grimoire_elk.elastic_items import ElasticItems
-from grimoire_elk.elastic import ElasticSearch
+from grimoire_elk.elastic import HEADER_JSON, ElasticSearch
+from grimoire_elk.enriched.enrich import Enrich
 from grimoire_elk.enriched.git import GitEnrich
-from grimoire_elk.utils import get_elastic
+from grimoire_elk.enriched.utils import get_repository_filter
+from grimoire_elk.utils import get_connector_from_name, get_elastic
 from grimoire_elk.enriched.sortinghat_gelk import SortingHat
 
 from sirmordred.error import DataEnrichmentError
@@ -49,6 +63,230 @@ from sirmordred.task_projects import TaskProjects
 
 logger = logging.getLogger(__name__)
 
+# origins read in each page of the watermarks aggregation
+WATERMARKS_PAGE_SIZE = 1000
+
+# raw items waiting to be enriched by each section of a fan-out
+FANOUT_QUEUE_SIZE = 1000
+
+# end of the raw items of a fan-out
+FANOUT_END = object()
+
+# Repository enriched in a batch
+BatchRepo = namedtuple('BatchRepo', ['project_repo', 'repo', 'origin', 'labels',
+                                     'backend_args', 'perceval_backend', 'last_enrich_date'])
+
+
+class BatchItems:
+    """Raw items of a batch of repositories read with a single scroll.
+
+    Before an item is returned, the enrich backend is set with the
+    params of the repository of the item (projects.json repo, labels
+    and perceval backend), so the item is enriched as if its repository
+    was enriched alone.
+
+    :param ocean_backend: ocean backend reading the items of all the repositories
+    :param enrich_backend: enrich backend of the batch
+    :param batch: list of `BatchRepo`
+    """
+
+    def __init__(self, ocean_backend, enrich_backend, batch):
+        self.ocean_backend = ocean_backend
+        self.enrich_backend = enrich_backend
+        self.repos = {repo.origin: repo for repo in batch}
+
+    def __getattr__(self, name):
+        return getattr(self.ocean_backend, name)
+
+    def fetch(self, _filter=None, ignore_incremental=False):
+        items = self.ocean_backend.fetch(_filter=_filter, ignore_incremental=ignore_incremental)
+        for item in items or []:
+            repo = self.repos.get(item.get('origin', None), None)
+            if not repo:
+                continue
+            self.enrich_backend.set_projects_json_repo(repo.repo)
+            self.enrich_backend.set_repo_labels(repo.labels)
+            self.enrich_backend.backend_params = repo.backend_args
+            self.enrich_backend.perceval_backend = repo.perceval_backend
+            yield item
+
+
+class FanoutItems:
+    """Raw items read by another thread and shared with other enrichers.
+
+    The items are put in a bounded queue by `fanout_items`, which reads
+    them once for all the enrichers, and they are returned by `fetch`
+    until `FANOUT_END` is found.
+
+    :param ocean_backend: ocean backend reading the items
+    """
+
+    def __init__(self, ocean_backend):
+        self.ocean_backend = ocean_backend
+        self.queue = queue.Queue(maxsize=FANOUT_QUEUE_SIZE)
+
+    def __getattr__(self, name):
+        return getattr(self.ocean_backend, name)
+
+    def fetch(self, _filter=None, ignore_incremental=False):
+        while True:
+            item = self.queue.get()
+            if item is FANOUT_END:
+                return
+            yield item
+
+
+def fanout_items(ocean_backend, consumers):
+    """Read the raw items once and pass them to several consumers.
+
+    Each consumer is a function called in its own thread with a
+    `FanoutItems` object, which returns the items read by a single
+    call to `fetch` of `ocean_backend`. Each consumer gets its own
+    copy of the items, so they can be modified while enriching them.
+    A consumer failing doesn't stop the rest; the first exception
+    raised is raised once all of them are finished.
+
+    :param ocean_backend: ocean backend reading the raw items
+    :param consumers: functions consuming the items
+    """
+    errors = []
+
+    def _consume(consumer, feed):
+        try:
+            consumer(feed)
+        except Exception as ex:
+            errors.append(ex)
+
+    def _put(feed, thread, item):
+        # The items of a consumer which is gone are discarded
+        while thread.is_alive():
+            try:
+                feed.queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    feeds = []
+    for consumer in consumers:
+        feed = FanoutItems(ocean_backend)
+        thread = threading.Thread(target=_consume, args=(consumer, feed), daemon=True)
+        thread.start()
+        feeds.append((feed, thread))
+
+    live = list(feeds)
+    try:
+        for item in ocean_backend.fetch() or []:
+            items = [item] + [copy.deepcopy(item) for _ in live[1:]]
+            live = [(feed, thread) for (feed, thread), item in zip(live, items)
+                    if _put(feed, thread, item)]
+            if not live:
+                break
+    finally:
+        for feed, thread in live:
+            _put(feed, thread, FANOUT_END)
+        for _, thread in feeds:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+class BackendsCache:
+    """Backends of a section reused between the executions of a task.
+
+    Creating an enrich backend connects to SortingHat and checks the
+    mappings of its index, so the backends are created the first time
+    they are requested and kept until the config of the section, the
+    Elasticsearch clusters or the projects change, or until the cache
+    is cleared. Each backend is stored with a name, so the ones used
+    at the same time by several threads (i.e. studies) aren't shared.
+
+    The lookups cached by the backends (i.e. SortingHat identities)
+    are kept in `lru_cache`s of their class, shared by all the
+    instances of the process. The backends of the cache get caches of
+    their own instead, so clearing them doesn't discard the lookups
+    of the backends used by other tasks.
+
+    :param task: task whose backends are stored
+    """
+
+    # config sections the backends are built from, besides the backend section
+    SECTIONS = ['projects', 'es_collection', 'es_enrichment']
+
+    def __init__(self, task):
+        self.task = task
+        self._lock = threading.Lock()
+        self._state = None
+        self._backends = {}
+
+    def get(self, name, factory):
+        """Get the backend stored with `name`, creating it with `factory` if it isn't found"""
+
+        with self._lock:
+            state = self.__get_state()
+            if not self.__same_state(state):
+                if self._backends:
+                    logger.debug("[%s] config or projects changed, creating the backends again",
+                                 self.task.backend_section)
+                self._backends = {}
+                self._state = state
+            backend = self._backends.get(name, None)
+
+        if backend is None:
+            # Backends with different names can be created in parallel
+            backend = factory()
+            self.__own_caches(backend)
+            with self._lock:
+                if self._state is state:
+                    backend = self._backends.setdefault(name, backend)
+
+        return backend
+
+    def clear(self):
+        """Remove all the backends"""
+
+        with self._lock:
+            for backend in self._backends.values():
+                self.clear_caches(backend)
+            self._backends = {}
+            self._state = None
+
+    @staticmethod
+    def clear_caches(backend):
+        """Discard the lookups cached by a backend of the cache"""
+
+        for cache in getattr(backend, '__dict__', {}).values():
+            if BackendsCache.__is_cache(cache):
+                cache.cache_clear()
+
+    @staticmethod
+    def __own_caches(backend):
+        """Replace the `lru_cache`s of the class of the backend by caches of the instance"""
+
+        for name, method in inspect.getmembers(type(backend)):
+            if not BackendsCache.__is_cache(method) or isinstance(inspect.getattr_static(type(backend), name), staticmethod):
+                continue
+            maxsize = method.cache_info().maxsize
+            setattr(backend, name, functools.lru_cache(maxsize)(method.__wrapped__.__get__(backend)))
+
+    @staticmethod
+    def __is_cache(method):
+        return hasattr(method, 'cache_clear') and hasattr(method, '__wrapped__')
+
+    def __get_state(self):
+        conf = self.task.conf
+        sections = [self.task.backend_section] + self.SECTIONS
+
+        # The sections are read-only views replaced when they change
+        return tuple(conf[section] for section in sections) + (TaskProjects.get_projects_snapshot(),)
+
+    def __same_state(self, state):
+        if self._state is None:
+            return False
+
+        return all(current is new for current, new in zip(self._state, state))
+
 
 class TaskEnrich(Task):
     """ Basic class shared by all enriching tasks """
@@ -70,6 +308,14 @@ class TaskEnrich(Task):
         self.last_autorefresh = self.__update_last_autorefresh(days=autorefresh_interval)
         self.last_autorefresh_studies = self.last_autorefresh
         self.last_sortinghat_import = None
+        # state of the indexes read by each study in its last execution
+        self.__studies_inputs = {}
+        # backends reused by the retention, autorefresh and studies phases
+        self.__backends = BackendsCache(self)
+        # sections enriched with a single scroll in the last execution and
+        # the tasks executing the after-enrichment steps of the followers
+        self.__fanout_sections = []
+        self.__fanout_tasks = {}
 
     def select_aliases(self, cfg, backend_section):
 
@@ -103,7 +349,8 @@ class TaskEnrich(Task):
                 logger.error(msg)
                 raise DataEnrichmentError(msg)
 
-            study_params = self.conf[study]
+            # The params are copied, so the alias can be added
+            study_params = dict(self.conf[study])
             studies_args.append({"name": study,
                                  "type": study.split(":")[0],
                                  "params": study_params})
@@ -117,6 +364,15 @@ class TaskEnrich(Task):
         logger.info('[%s] enrichment phase starts', self.backend_section)
 
         cfg = self.config.get_conf()
+        repos, enrich_args = self.__prepare_enrichment(cfg)
+        self.__enrich_repos(cfg, repos, enrich_args)
+        self._clear_checkpoint('enrichment')
+
+        spent_time = str(datetime.now() - time_start).split('.')[0]
+        logger.info('[%s] enrichment phase finished in %s', self.backend_section, spent_time)
+
+    def __prepare_enrichment(self, cfg):
+        """Get the repositories to enrich and the arguments shared by all of them"""
 
         if 'scroll_size' in cfg['general']:
             ElasticItems.scroll_size = cfg['general']['scroll_size']
@@ -146,83 +402,536 @@ class TaskEnrich(Task):
             # Filter repos to only those specified
             repos = sorted(list(set(repos) & self.allowed_repos))
 
-        # Get the metadata__timestamp value of the last item inserted in the enriched index before
-        # looping over the repos which data is stored in the same index. This is needed to make sure
-        # that the incremental enrichment works for data sources that are collected globally but only
-        # partially enriched.
-        elastic_enrich = get_elastic(cfg['es_enrichment']['url'], cfg[self.backend_section]['enriched_index'])
-        last_enrich_date = elastic_enrich.get_last_item_field("metadata__timestamp")
+        fanout = {}
+        fanout_sections = self._get_fanout_sections(cfg)
+        self.__fanout_sections = fanout_sections
+
+        # The dates by origin are only needed to enrich the repositories in batches
+        by_origin = bool(fanout_sections) or self._get_enrich_batch_size(cfg) is not None
+        watermarks, last_enrich_date = self.__get_enrich_dates(cfg, self.backend_section, by_origin)
+
+        if fanout_sections and fanout_sections[0] != self.backend_section:
+            # The repositories read with a single scroll are enriched by the leader
+            _, repos = self.__split_batch_repos(self.backend_section, repos, watermarks)
+            logger.info('[%s] the repositories read with the raw index of %s are enriched by it',
+                        self.backend_section, fanout_sections[0])
+        else:
+            for section in fanout_sections[1:]:
+                section_repos = TaskProjects.get_repos_by_backend_section(section, raw=False)
+                section_watermarks, _ = self.__get_enrich_dates(cfg, section)
+                batch_repos, _ = self.__split_batch_repos(section, section_repos, section_watermarks)
+                fanout[section] = {repo.origin: repo for repo in batch_repos}
+
+        # The dates are saved with the checkpoint, so a resumed enrichment
+        # doesn't skip items of the repositories not enriched yet
+        state = {
+            'last_enrich_date': last_enrich_date.isoformat() if last_enrich_date else None,
+            'watermarks': None
+        }
+        if watermarks is not None:
+            state['watermarks'] = {origin: date.isoformat() for origin, date in watermarks.items()}
+        repos, state = self._resume_checkpoint('enrichment', repos, state)
+        last_enrich_date = state['last_enrich_date']
         if last_enrich_date:
-            last_enrich_date = last_enrich_date.replace(tzinfo=None)
+            last_enrich_date = datetime.fromisoformat(last_enrich_date)
+        watermarks = state.get('watermarks', None)
+        if watermarks is not None:
+            watermarks = {origin: datetime.fromisoformat(date) for origin, date in watermarks.items()}
+
+        studies_args = None
+        if 'studies' in self.conf[self.backend_section] and \
+                self.conf[self.backend_section]['studies']:
+            studies_args = self.__load_studies()
+
+        enrich_args = {
+            'no_incremental': no_incremental,
+            'github_token': github_token,
+            'pair_programming': pair_programming,
+            'node_regex': node_regex,
+            'only_studies': only_studies,
+            'only_identities': only_identities,
+            'studies_args': studies_args,
+            'last_enrich_date': last_enrich_date,
+            'watermarks': watermarks,
+            'fanout': fanout
+        }
+
+        return repos, enrich_args
+
+    def __get_enrich_dates(self, cfg, backend_section, by_origin=True):
+        """Get the dates of the last items enriched of a backend section.
+
+        Get the metadata__timestamp value of the last item inserted in the enriched index for
+        each origin before looping over the repos which data is stored in the same index, so each
+        repo is enriched from its own last date. The repos whose origin is not found are enriched
+        from the beginning. This is needed to make sure that the incremental enrichment works for
+        data sources that are collected globally but only partially enriched.
+
+        The dates by origin are only used by the repositories enriched in batches; GrimoireELK
+        reads the last date of the rest of repositories by itself.
+
+        :param by_origin: if False, only the last date of the index is read
+
+        :returns: a tuple with the dates by origin, or `None` when they are not read,
+            and the last date of the index
+        """
+        elastic_enrich = get_elastic(cfg['es_enrichment']['url'], cfg[backend_section]['enriched_index'])
+        watermarks = self._get_enrich_watermarks(elastic_enrich) if by_origin else None
+        if watermarks is None:
+            last_enrich_date = elastic_enrich.get_last_item_field("metadata__timestamp")
+            if last_enrich_date:
+                last_enrich_date = last_enrich_date.replace(tzinfo=None)
+        else:
+            last_enrich_date = max(watermarks.values(), default=None)
 
-        for repo in repos:
-            repo, repo_labels = self._extract_repo_tags(self.backend_section, repo)
-            _, repo_spaces = self._extract_repo_tags(self.backend_section, repo, "spaces")
-            p2o_args = self._compose_p2o_params(self.backend_section, repo)
-            filter_raw = p2o_args['filter-raw'] if 'filter-raw' in p2o_args else None
-            jenkins_rename_file = p2o_args['jenkins-rename-file'] if 'jenkins-rename-file' in p2o_args else None
-            url = p2o_args['url']
-            # Second process perceval params from repo
-            backend_args = self._compose_perceval_params(self.backend_section, url)
-            studies_args = None
-
-            backend = self.get_backend(self.backend_section)
-            if 'studies' in self.conf[self.backend_section] and \
-                    self.conf[self.backend_section]['studies']:
-                studies_args = self.__load_studies()
-
-            logger.info('[%s] enrichment starts for %s', self.backend_section, self.anonymize_url(repo))
-            es_enrich_aliases = self.select_aliases(cfg, self.backend_section)
+        return watermarks, last_enrich_date
 
+    @staticmethod
+    def _get_enrich_watermarks(elastic):
+        """Get the date of the last item enriched of each origin.
+
+        The dates are read with a single composite aggregation, paginated
+        by origin, instead of a query per repository. `None` is returned
+        when the aggregation can't be done (i.e. old Elasticsearch versions),
+        and an empty dict when the index doesn't exist.
+
+        :param elastic: `ElasticSearch` object of the enriched index
+
+        :returns: dict with the `metadata__timestamp` of the last item
+            of each origin, as dates without timezone
+        """
+        query = {
+            "size": 0,
+            "aggs": {
+                "origins": {
+                    "composite": {
+                        "size": WATERMARKS_PAGE_SIZE,
+                        "sources": [{"origin": {"terms": {"field": "origin"}}}]
+                    },
+                    "aggs": {
+                        "last_date": {"max": {"field": "metadata__timestamp"}}
+                    }
+                }
+            }
+        }
+
+        watermarks = {}
+        while True:
+            res = elastic.requests.post(elastic.index_url + "/_search",
+                                        data=json.dumps(query), headers=HEADER_JSON)
+            if res.status_code == 404:
+                return watermarks
             try:
-                es_col_url = self._get_collection_url()
-                enrich_backend(es_col_url, self.clean, backend, backend_args,
-                               self.backend_section,
-                               cfg[self.backend_section]['raw_index'],
-                               cfg[self.backend_section]['enriched_index'],
-                               cfg['projects']['projects_file'],
-                               self.db_sh,
-                               no_incremental, only_identities,
-                               github_token,
-                               False,  # studies are executed in its own Task
-                               only_studies,
-                               cfg['es_enrichment']['url'],
-                               None,  # args.events_enrich
-                               self.db_user,
-                               self.db_password,
-                               self.db_host,
-                               self.db_port,
-                               self.db_path,
-                               self.db_ssl,
-                               self.db_verify_ssl,
-                               self.db_tenant,
-                               None,  # args.refresh_projects,
-                               None,  # args.refresh_identities,
-                               author_id=None,
-                               author_uuid=None,
-                               filter_raw=filter_raw,
-                               jenkins_rename_file=jenkins_rename_file,
-                               unaffiliated_group=self.db_unaffiliate_group,
-                               pair_programming=pair_programming,
-                               node_regex=node_regex,
-                               studies_args=studies_args,
-                               es_enrich_aliases=es_enrich_aliases,
-                               last_enrich_date=last_enrich_date,
-                               projects_json_repo=repo,
-                               repo_labels=repo_labels,
-                               repo_spaces=repo_spaces)
-            except Exception as ex:
-                logger.error("Something went wrong producing enriched data for %s . "
-                             "Using the backend_args: %s ", self.backend_section, str(backend_args))
-                logger.error("Exception: %s", ex)
-                raise DataEnrichmentError('Failed to produce enriched data for ' + self.backend_section)
-
-            logger.info('[%s] enrichment finished for %s', self.backend_section, self.anonymize_url(repo))
+                res.raise_for_status()
+            except requests.exceptions.HTTPError as ex:
+                logger.warning("Can't get the last enrichment dates by origin: %s", ex)
+                return None
 
-        spent_time = str(datetime.now() - time_start).split('.')[0]
-        logger.info('[%s] enrichment phase finished in %s', self.backend_section, spent_time)
+            origins = res.json()['aggregations']['origins']
+            for bucket in origins['buckets']:
+                last_date = bucket['last_date']['value']
+                if last_date is not None:
+                    watermarks[bucket['key']['origin']] = datetime.utcfromtimestamp(last_date / 1000)
+
+            if not origins['buckets'] or 'after_key' not in origins:
+                break
+            query['aggs']['origins']['composite']['after'] = origins['after_key']
+
+        return watermarks
+
+    def __enrich_repos(self, cfg, repos, enrich_args, last=True):
+        """Enrich the repositories of the section.
+
+        :param last: when False, more repositories will be enriched in
+            the current execution (i.e. pipelined enrichment), so the
+            pending repositories of the fan-out sections are kept
+        """
+        workers = self._get_enrich_workers(cfg)
+        pool = self._get_shared_pool(cfg)
+        failed = []
+
+        batches = []
+        batch_size = self._get_enrich_batch_size(cfg)
+        if enrich_args['fanout'] or (batch_size and len(repos) > 1):
+            batches, repos = self.__get_batches(repos, enrich_args, batch_size or 1)
+
+        # Each unit enriches a repository or a batch of them, together
+        # with the same repositories of the fan-out sections
+        units = []
+        for batch in batches:
+            targets = {self.backend_section: batch}
+            for section, section_repos in enrich_args['fanout'].items():
+                section_batch = [section_repos.pop(repo.origin) for repo in batch if repo.origin in section_repos]
+                if section_batch:
+                    targets[section] = section_batch
+            units.append((self.__enrich_batch, targets, [repo.project_repo for repo in batch]))
+        if last:
+            # Repositories of the fan-out sections not found in this one
+            for section, section_repos in enrich_args['fanout'].items():
+                for batch in self.__make_batches(section_repos.values(), batch_size or 1):
+                    units.append((self.__enrich_batch, {section: batch}, [repo.project_repo for repo in batch]))
+                section_repos.clear()
+        units += [(self.__enrich_repo, repo, [repo]) for repo in repos]
+        total = sum(len(unit_repos) for _, _, unit_repos in units)
+
+        if not pool and (workers == 1 or len(units) <= 1):
+            for enrich, target, _ in units:
+                enrich(cfg, target, enrich_args)
+        elif pool:
+            logger.info('[%s] enriching %s repositories using the shared pool',
+                        self.backend_section, total)
+            futures = {pool.submit(self.backend_section, enrich, cfg, target, enrich_args): unit_repos
+                       for enrich, target, unit_repos in units}
+            failed = self.__wait_enriched(futures)
+        else:
+            logger.info('[%s] enriching %s repositories using %s workers',
+                        self.backend_section, total, workers)
+            with ThreadPoolExecutor(max_workers=workers,
+                                    thread_name_prefix=self.backend_section) as executor:
+                futures = {executor.submit(enrich, cfg, target, enrich_args): unit_repos
+                           for enrich, target, unit_repos in units}
+                failed = self.__wait_enriched(futures)
+
+        if failed:
+            failed.sort()
+            raise DataEnrichmentError('Failed to produce enriched data for %s repositories: %s'
+                                      % (self.backend_section,
+                                         ', '.join([self.anonymize_url(repo) for repo in failed])))
+
+    def __wait_enriched(self, futures):
+        """Wait for the repositories enriched in parallel and return the failed ones"""
+
+        failed = []
+        try:
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except DataEnrichmentError:
+                    failed.extend(futures[future])
+        except Exception:
+            # i.e. the task was cancelled
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            raise
+
+        return failed
+
+    def _get_enrich_workers(self, cfg):
+        """Number of repositories of the backend section enriched in parallel"""
+
+        workers = cfg[self.backend_section].get('enrich_workers', None)
+        if not workers:
+            workers = cfg['general'].get('enrich_workers', 1)
+
+        return max(workers, 1)
+
+    def _get_enrich_batch_size(self, cfg):
+        """Number of repositories of the backend section enriched with a single scroll"""
+
+        batch_size = cfg[self.backend_section].get('enrich_batch_size', None)
+        if not batch_size:
+            batch_size = cfg['general'].get('enrich_batch_size', None)
+
+        return batch_size if batch_size and batch_size > 1 else None
+
+    @staticmethod
+    def _is_batch_connector(connector):
+        """Check whether the repositories of a connector can be enriched in batches.
+
+        The enrichment must be done item by item, with the default
+        `enrich_items` and `update_items` of GrimoireELK, and the data
+        must be retrieved from Perceval.
+        """
+        enrich_cls = connector[2]
+
+        return connector[3] is not None \
+            and enrich_cls.enrich_items is Enrich.enrich_items \
+            and enrich_cls.update_items is Enrich.update_items
+
+    def _get_fanout_sections(self, cfg):
+        """Get the backend sections enriched reading the raw index only once.
+
+        When `enrich_fanout` is set, the sections of the same backend
+        with the same raw index are enriched together by the first of
+        them (the leader), reading their raw items with a single scroll.
+        Only the sections with repositories and the enrichment enabled
+        are included.
+
+        :returns: list of sections, starting with the leader; empty when
+            the section is enriched alone
+        """
+        if not cfg['general'].get('enrich_fanout', False) or self.allowed_repos is not None:
+            return []
+
+        backend = self.get_backend(self.backend_section)
+        if not self._is_batch_connector(get_connector_from_name(backend)):
+            return []
+
+        raw_index = cfg[self.backend_section]['raw_index']
+        sections = []
+        for section in sorted(cfg.conf):
+            if self.get_backend(section) != backend:
+                continue
+            params = cfg[section]
+            if params.get('raw_index', None) != raw_index or not params.get('enrich', True):
+                continue
+            if TaskProjects.get_repos_by_backend_section(section, raw=False):
+                sections.append(section)
+
+        if len(sections) <= 1 or self.backend_section not in sections:
+            return []
+
+        return sections
+
+    def __get_batch_repo(self, backend_section, repo, watermarks):
+        """Get the params to enrich a repository in a batch, or `None` if it can't be"""
+
+        project_repo = repo
+        repo, repo_labels = self._extract_repo_tags(backend_section, repo)
+        _, repo_spaces = self._extract_repo_tags(backend_section, repo, "spaces")
+        p2o_args = self._compose_p2o_params(backend_section, repo)
+        if repo_spaces or 'filter-raw' in p2o_args or 'jenkins-rename-file' in p2o_args:
+            return None
+
+        url = p2o_args['url']
+        backend = self.get_backend(backend_section)
+        backend_args = self._compose_perceval_params(backend_section, url)
+        perceval_backend = init_backend(get_connector_from_name(backend)[3](*backend_args)).backend
+
+        # The items must be found by origin and retrieved incrementally by date
+        filter_ = get_repository_filter(perceval_backend, backend)
+        if filter_.get('name', None) != 'origin' or \
+                'from_date' not in inspect.signature(perceval_backend.fetch).parameters:
+            return None
+
+        # The repositories not found in the index are enriched from the beginning
+        last_enrich_date = watermarks.get(filter_['value'], None)
+
+        return BatchRepo(project_repo, repo, filter_['value'], repo_labels,
+                         backend_args, perceval_backend, last_enrich_date)
+
+    def __split_batch_repos(self, backend_section, repos, watermarks):
+        """Split the repositories that can be enriched in batches from the rest.
+
+        A batch can't include the same origin twice, so the repositories
+        with an origin already found are enriched alone. No repository is
+        enriched in batches when the dates by origin are not available.
+
+        :param watermarks: dates of the last items enriched by origin
+
+        :returns: a tuple with the list of `BatchRepo` and the rest of repositories
+        """
+        backend = self.get_backend(backend_section)
+        if watermarks is None or not self._is_batch_connector(get_connector_from_name(backend)):
+            return [], repos
+
+        batch_repos = {}
+        rest = []
+        for repo in repos:
+            batch_repo = self.__get_batch_repo(backend_section, repo, watermarks)
+            if batch_repo and batch_repo.origin not in batch_repos:
+                batch_repos[batch_repo.origin] = batch_repo
+            else:
+                rest.append(repo)
+
+        return list(batch_repos.values()), rest
+
+    def __get_batches(self, repos, enrich_args, batch_size):
+        """Group the repositories that can be enriched with a single scroll.
+
+        The repositories are sorted by their last enrichment date, so the
+        repositories of a batch start from similar dates.
+
+        :returns: a tuple with the batches and the rest of repositories
+        """
+        batch_repos, rest = self.__split_batch_repos(self.backend_section, repos, enrich_args['watermarks'])
+
+        return self.__make_batches(batch_repos, batch_size), rest
+
+    @staticmethod
+    def __make_batches(batch_repos, batch_size):
+        """Split the repositories in batches sorted by their last enrichment date"""
+
+        # Repositories never enriched are enriched from the beginning
+        batch_repos = sorted(batch_repos, key=lambda repo: (repo.last_enrich_date is not None,
+                                                            repo.last_enrich_date or datetime.min))
+
+        return [batch_repos[i:i + batch_size] for i in range(0, len(batch_repos), batch_size)]
+
+    def __new_enrich_backend(self, cfg, backend_section, batch, from_date, enrich_args):
+        """Create the enrich backend of a batch of repositories of a section"""
+
+        connector = get_connector_from_name(self.get_backend(backend_section))
+        enrich = connector[2](db_sortinghat=self.db_sh,
+                              json_projects_map=cfg['projects']['projects_file'],
+                              db_user=self.db_user,
+                              db_password=self.db_password,
+                              db_host=self.db_host,
+                              db_port=self.db_port,
+                              db_path=self.db_path,
+                              db_ssl=self.db_ssl,
+                              db_verify_ssl=self.db_verify_ssl,
+                              db_tenant=self.db_tenant)
+        enrich.set_params(batch[0].backend_args)
+        enrich.set_cfg_section_name(backend_section)
+        enrich.set_from_date(from_date)
+        enrich.set_elastic(get_elastic(cfg['es_enrichment']['url'], cfg[backend_section]['enriched_index'],
+                                       False, enrich, self.select_aliases(cfg, backend_section)))
+        enrich.set_repo_spaces([])
+        if self.db_unaffiliate_group:
+            enrich.unaffiliated_group = self.db_unaffiliate_group
+        pair_programming = cfg[backend_section].get('pair-programming', False)
+        if pair_programming:
+            enrich.pair_programming = pair_programming
+        if enrich_args['node_regex']:
+            enrich.node_regex = enrich_args['node_regex']
+
+        return enrich
+
+    def __enrich_batch(self, cfg, targets, enrich_args):
+        """Enrich a batch of repositories reading their raw items with a single scroll.
+
+        The batch is enriched from the oldest last enrichment date of its
+        repositories, so the same enriched items are produced as when
+        they are enriched one by one. When the batch includes repositories
+        of several sections (fan-out), the raw items are read once and
+        enriched by the enrich backends of all of them.
+
+        :param targets: dict with the batch of `BatchRepo` of each section
+        """
+        self.check_cancelled()
+
+        repos = [repo for batch in targets.values() for repo in batch]
+        sections = ', '.join(targets.keys())
+        backend = self.get_backend(self.backend_section)
+        connector = get_connector_from_name(backend)
+        origins = sorted(set(repo.origin for repo in repos))
+        from_date = None
+        if all(repo.last_enrich_date for repo in repos):
+            from_date = min(repo.last_enrich_date for repo in repos)
+
+        batch_start = datetime.now()
+        logger.info('[%s] enrichment starts for a batch of %s repositories of %s',
+                    self.backend_section, len(repos), sections)
+
+        try:
+            enrichers = [(self.__new_enrich_backend(cfg, section, batch, from_date, enrich_args), batch)
+                         for section, batch in targets.items()]
+
+            # The items of all the repositories are read sorted by date, as
+            # when they are read one by one, so an interrupted enrichment
+            # is resumed from the right date of each repository
+            ocean = connector[1](repos[0].perceval_backend, from_date=from_date)
+            origins_filter = {"terms": {"origin": origins}}
+            ocean.get_repository_filter_raw = lambda term=False: origins_filter
+            ocean.set_elastic(get_elastic(self._get_collection_url(), cfg[self.backend_section]['raw_index'],
+                                          False, ocean))
+
+            def _read(consumers):
+                if len(consumers) == 1:
+                    consumers[0](ocean)
+                elif consumers:
+                    fanout_items(ocean, consumers)
+
+            _read([lambda items, enrich=enrich, batch=batch: load_identities(BatchItems(items, enrich, batch), enrich)
+                   for enrich, batch in enrichers if self.db_sh and enrich.has_identities()])
+            _read([lambda items, enrich=enrich, batch=batch: enrich_items(BatchItems(items, enrich, batch), enrich)
+                   for enrich, batch in enrichers])
+        except Exception as ex:
+            logger.error("Something went wrong producing enriched data for %s repositories of %s",
+                         len(repos), sections)
+            logger.error("Exception: %s", ex)
+            raise DataEnrichmentError('Failed to produce enriched data for ' + sections)
+
+        spent_time = str(datetime.now() - batch_start).split('.')[0]
+        logger.info('[%s] enrichment finished for a batch of %s repositories of %s in %s',
+                    self.backend_section, len(repos), sections, spent_time)
+
+        for repo in targets.get(self.backend_section, []):
+            self._add_checkpoint('enrichment', repo.project_repo)
+
+    def __enrich_repo(self, cfg, repo, enrich_args):
+        self.check_cancelled()
+
+        project_repo = repo
+        repo, repo_labels = self._extract_repo_tags(self.backend_section, repo)
+        _, repo_spaces = self._extract_repo_tags(self.backend_section, repo, "spaces")
+        p2o_args = self._compose_p2o_params(self.backend_section, repo)
+        filter_raw = p2o_args['filter-raw'] if 'filter-raw' in p2o_args else None
+        jenkins_rename_file = p2o_args['jenkins-rename-file'] if 'jenkins-rename-file' in p2o_args else None
+        url = p2o_args['url']
+        # Second process perceval params from repo
+        backend_args = self._compose_perceval_params(self.backend_section, url)
+
+        backend = self.get_backend(self.backend_section)
+
+        repo_start = datetime.now()
+        logger.info('[%s] enrichment starts for %s', self.backend_section, self.anonymize_url(repo))
+        es_enrich_aliases = self.select_aliases(cfg, self.backend_section)
+
+        try:
+            es_col_url = self._get_collection_url()
+            enrich_backend(es_col_url, self.clean, backend, backend_args,
+                           self.backend_section,
+                           cfg[self.backend_section]['raw_index'],
+                           cfg[self.backend_section]['enriched_index'],
+                           cfg['projects']['projects_file'],
+                           self.db_sh,
+                           enrich_args['no_incremental'],
+                           enrich_args['only_identities'],
+                           enrich_args['github_token'],
+                           False,  # studies are executed in its own Task
+                           enrich_args['only_studies'],
+                           cfg['es_enrichment']['url'],
+                           None,  # args.events_enrich
+                           self.db_user,
+                           self.db_password,
+                           self.db_host,
+                           self.db_port,
+                           self.db_path,
+                           self.db_ssl,
+                           self.db_verify_ssl,
+                           self.db_tenant,
+                           None,  # args.refresh_projects,
+                           None,  # args.refresh_identities,
+                           author_id=None,
+                           author_uuid=None,
+                           filter_raw=filter_raw,
+                           jenkins_rename_file=jenkins_rename_file,
+                           unaffiliated_group=self.db_unaffiliate_group,
+                           pair_programming=enrich_args['pair_programming'],
+                           node_regex=enrich_args['node_regex'],
+                           studies_args=enrich_args['studies_args'],
+                           es_enrich_aliases=es_enrich_aliases,
+                           last_enrich_date=enrich_args['last_enrich_date'],
+                           projects_json_repo=repo,
+                           repo_labels=repo_labels,
+                           repo_spaces=repo_spaces)
+        except Exception as ex:
+            logger.error("Something went wrong producing enriched data for %s . "
+                         "Using the backend_args: %s ", self.backend_section, str(backend_args))
+            logger.error("Exception: %s", ex)
+            raise DataEnrichmentError('Failed to produce enriched data for ' + self.backend_section)
+
+        spent_time = str(datetime.now() - repo_start).split('.')[0]
+        logger.info('[%s] enrichment finished for %s in %s',
+                    self.backend_section, self.anonymize_url(repo), spent_time)
+
+        self._add_checkpoint('enrichment', project_repo)
+
+    def __get_enrich_backend(self, name='enrich'):
+        return self.__backends.get(name, self._get_enrich_backend)
+
+    def __get_ocean_backend(self, name='enrich'):
+        enrich_backend = self.__get_enrich_backend(name)
+        return self.__backends.get(name + ' ocean', lambda: self._get_ocean_backend(enrich_backend))
 
     def __autorefresh(self, enrich_backend, studies=False):
+        # The backend is reused between executions, so the identities
+        # cached from SortingHat must be read again to get their changes
+        BackendsCache.clear_caches(enrich_backend)
+
         # Refresh projects
         field_id = enrich_backend.get_field_unique_id()
 
@@ -273,6 +982,10 @@ class TaskEnrich(Task):
         spent_time = str(datetime.now() - time_start).split('.')[0]
         logger.info(f'[{self.backend_section}] Refreshed {total} identities in {spent_time}')
 
+        # The studies read the identities of the enriched items
+        if total and not studies:
+            self.__studies_inputs.clear()
+
         # Update corresponding autorefresh date
         if studies:
             self.last_autorefresh_studies = next_autorefresh
@@ -295,10 +1008,11 @@ class TaskEnrich(Task):
 
         logger.debug("Autorefresh for Areas of Code study index: %s", aoc_index)
 
+        verify = self.__get_enrich_backend().elastic.requests.verify
         es = OpenSearch([self.conf['es_enrichment']['url']], timeout=100, retry_on_timeout=True,
-                        verify_certs=self._get_enrich_backend().elastic.requests.verify,
+                        verify_certs=verify,
                         connection_class=RequestsHttpConnection,
-                        ssl_show_warn=self._get_enrich_backend().elastic.requests.verify)
+                        ssl_show_warn=verify)
 
         if not es.indices.exists(index=aoc_index):
             logger.debug("Not doing autorefresh, index doesn't exist for Areas of Code study")
@@ -306,18 +1020,20 @@ class TaskEnrich(Task):
 
         logger.debug("Doing autorefresh for Areas of Code study")
 
-        # Create a GitEnrich backend tweaked to work with AOC index
-        aoc_backend = GitEnrich(db_sortinghat=self.db_sh, json_projects_map=cfg['projects']['projects_file'],
-                                db_user=self.db_user, db_password=self.db_password, db_host=self.db_host,
-                                db_port=self.db_port, db_path=self.db_path, db_ssl=self.db_ssl,
-                                db_verify_ssl=self.db_verify_ssl, db_tenant=self.db_tenant)
-        aoc_backend.mapping = None
-        aoc_backend.roles = ['author']
-        elastic_enrich = get_elastic(self.conf['es_enrichment']['url'],
-                                     aoc_index, clean=False, backend=aoc_backend)
-        aoc_backend.set_elastic(elastic_enrich)
-
-        self.__autorefresh(aoc_backend, studies=True)
+        def _get_aoc_backend():
+            # Create a GitEnrich backend tweaked to work with AOC index
+            aoc_backend = GitEnrich(db_sortinghat=self.db_sh, json_projects_map=cfg['projects']['projects_file'],
+                                    db_user=self.db_user, db_password=self.db_password, db_host=self.db_host,
+                                    db_port=self.db_port, db_path=self.db_path, db_ssl=self.db_ssl,
+                                    db_verify_ssl=self.db_verify_ssl, db_tenant=self.db_tenant)
+            aoc_backend.mapping = None
+            aoc_backend.roles = ['author']
+            elastic_enrich = get_elastic(self.conf['es_enrichment']['url'],
+                                         aoc_index, clean=False, backend=aoc_backend)
+            aoc_backend.set_elastic(elastic_enrich)
+            return aoc_backend
+
+        self.__autorefresh(self.__backends.get('aoc ' + aoc_index, _get_aoc_backend), studies=True)
 
     def __studies(self, retention_time):
         """ Execute the studies configured for the current backend """
@@ -334,12 +1050,10 @@ class TaskEnrich(Task):
             return
 
         logger.info('%s studies phase start', log_prefix)
-        time.sleep(2)  # Wait so enrichment has finished in ES
-        enrich_backend = self._get_enrich_backend()
-        ocean_backend = self._get_ocean_backend(enrich_backend)
+        enrich_backend = self.__get_enrich_backend()
+        # Wait so enrichment has finished in ES
+        self._refresh_index(enrich_backend.elastic)
 
-        active_studies = []
-        all_studies = enrich_backend.studies
         all_studies_names = [study.__name__ for study in enrich_backend.studies]
 
         # Time to check that configured studies are valid
@@ -350,13 +1064,6 @@ class TaskEnrich(Task):
             logger.error('%s Wrong studies names: %s', log_prefix, studies)
             raise RuntimeError('Wrong studies names ', self.backend_section, studies)
 
-        for study in enrich_backend.studies:
-            if study.__name__ in cfg_studies_types:
-                active_studies.append(study)
-
-        enrich_backend.studies = active_studies
-        logger.info("%s Executing studies %s" % (log_prefix, [study for study in studies]))
-
         studies_args = self.__load_studies()
         study_aliases = self.select_aliases(cfg, "studies_aliases")
         for study_arg in studies_args:
@@ -364,12 +1071,139 @@ class TaskEnrich(Task):
             if alias:
                 study_arg['params']['alias'] = alias[0]
 
-        do_studies(ocean_backend, enrich_backend, studies_args, retention_time=retention_time)
-        # Return studies to its original value
-        enrich_backend.studies = all_studies
+        # Studies are executed in the order they are declared in the enrich backend
+        studies_args.sort(key=lambda study_arg: all_studies_names.index(study_arg['type']))
+
+        if cfg['general'].get('studies_skip_unchanged', False):
+            studies_input = self.__get_studies_input(cfg, enrich_backend.elastic)
+            pending = []
+            for study_arg in studies_args:
+                if studies_input is not None and \
+                        self.__studies_inputs.get(study_arg['name']) == (studies_input, study_arg['params']):
+                    logger.info("%s Skipping study %s, no changes since its last execution",
+                                log_prefix, study_arg['name'])
+                else:
+                    pending.append(study_arg)
+            studies_args = pending
+        else:
+            studies_input = None
+
+        logger.info("%s Executing studies %s" % (log_prefix, [study_arg['name'] for study_arg in studies_args]))
+
+        # Studies updating the enriched index are executed one after the other, and
+        # before the ones writing their own index, which can be executed in parallel
+        in_place = [study_arg for study_arg in studies_args if 'out_index' not in study_arg['params']]
+        out_index = [study_arg for study_arg in studies_args if 'out_index' in study_arg['params']]
+
+        for study_arg in in_place:
+            self.__run_study(study_arg, retention_time, studies_input)
+
+        workers = self._get_studies_workers(cfg)
+        if workers == 1 or len(out_index) <= 1:
+            for study_arg in out_index:
+                self.__run_study(study_arg, retention_time, studies_input)
+        else:
+            logger.info('%s executing %s studies using %s workers', log_prefix, len(out_index), workers)
+            with ThreadPoolExecutor(max_workers=workers,
+                                    thread_name_prefix=self.backend_section) as executor:
+                futures = [executor.submit(self.__run_study, study_arg, retention_time, studies_input)
+                           for study_arg in out_index]
+                wait(futures)
+                for future in futures:
+                    future.result()
 
         logger.info('%s studies phase end', log_prefix)
 
+    def __run_study(self, study_arg, retention_time, studies_input=None):
+        """Execute a study with its own enrich and ocean backends, so it can run in parallel.
+
+        The backends of each study are reused in the next executions.
+
+        :param study_arg: name, type and params of the study
+        :param retention_time: maximum number of minutes to retain the data of the study
+        :param studies_input: state of the indexes read by the study; when
+            given, it is recorded once the study is executed
+        """
+        self.check_cancelled()
+
+        name = 'study ' + study_arg['name']
+        enrich_backend = self.__get_enrich_backend(name)
+        ocean_backend = self.__get_ocean_backend(name)
+        enrich_backend.studies = [study for study in enrich_backend.studies
+                                  if study.__name__ == study_arg['type']]
+
+        do_studies(ocean_backend, enrich_backend, [study_arg], retention_time=retention_time)
+
+        if studies_input is not None:
+            self.__studies_inputs[study_arg['name']] = (studies_input, study_arg['params'])
+
+    def _get_studies_workers(self, cfg):
+        """Number of studies of the backend section executed in parallel"""
+
+        workers = cfg[self.backend_section].get('studies_workers', None)
+        if not workers:
+            workers = cfg['general'].get('studies_workers', 1)
+
+        return max(workers, 1)
+
+    def __get_studies_input(self, cfg, elastic_enrich):
+        """Get the state of the raw and enriched indexes read by the studies.
+
+        :returns: a tuple with the state of both indexes, or `None` when
+            it can't be known
+        """
+        elastic_raw = get_elastic(self._get_collection_url(), cfg[self.backend_section]['raw_index'])
+        raw_state = self._get_index_state(elastic_raw, 'metadata__timestamp')
+        enrich_state = self._get_index_state(elastic_enrich, 'metadata__enriched_on')
+
+        if raw_state is None or enrich_state is None:
+            return None
+
+        return raw_state, enrich_state
+
+    @staticmethod
+    def _get_index_state(elastic, field):
+        """Get the number of items of an index and the last value of `field`.
+
+        :param elastic: `ElasticSearch` object of the index
+        :param field: date field updated when the items change
+
+        :returns: a tuple with the number of items and the last date, or
+            `None` when the state of the index can't be known
+        """
+        query = {
+            "size": 0,
+            "track_total_hits": True,
+            "aggs": {
+                "last_date": {"max": {"field": field}}
+            }
+        }
+
+        res = elastic.requests.post(elastic.index_url + "/_search",
+                                    data=json.dumps(query), headers=HEADER_JSON)
+        try:
+            res.raise_for_status()
+        except requests.exceptions.HTTPError as ex:
+            logger.warning("Can't get the state of %s: %s", elastic.index, ex)
+            return None
+
+        result = res.json()
+        total = result['hits']['total']
+        if isinstance(total, dict):
+            total = total['value']
+
+        return total, result['aggregations']['last_date']['value']
+
+    @staticmethod
+    def _refresh_index(elastic):
+        """Make the items written in an index visible to the searches"""
+
+        res = elastic.requests.post(elastic.index_url + "/_refresh")
+        try:
+            res.raise_for_status()
+        except requests.exceptions.HTTPError as ex:
+            logger.warning("Can't refresh %s: %s", elastic.index, ex)
+
     def retain_identities(self, retention_time):
         """Retain the identities in SortingHat based on the `retention_time`
         value declared in the setup.cfg.
@@ -403,66 +1237,160 @@ class TaskEnrich(Task):
         # unique identities (those ones in SortingHat but not in `grimoirelab_identities_cache`)
         retain_identities(retention_time, enrich_es, sortinghat_db, current_data_source, active_data_sources)
 
-    def execute(self):
-        cfg = self.config.get_conf()
-
+    def __is_enabled(self, cfg):
         if 'enrich' in cfg[self.backend_section] and not cfg[self.backend_section]['enrich']:
             logger.info('%s enrich disabled', self.backend_section)
+            return False
+        return True
+
+    def __acquire_identities_lock(self):
+        # Wait until identities tasks are not active
+        waited = TasksManager.IDENTITIES_ENRICH_LOCK.acquire_read()
+        logger.debug("[%s] enrichment waited %.2f seconds for identities tasks",
+                     self.backend_section, waited)
+
+    def __after_enrichment(self, cfg):
+        """Execute retention, autorefresh and studies once the items are enriched"""
+
+        if self.allowed_repos is not None:
+            # They work on the whole section, so they are done by its regular tasks
+            logger.info('[%s] retention, autorefresh and studies skipped, only some repositories were enriched',
+                        self.backend_section)
             return
 
-        # ** START SYNC LOGIC **
-        # Check that identities tasks are not active before executing
-        while True:
-            time.sleep(10)  # check each 10s if the enrichment could start
-            with TasksManager.IDENTITIES_TASKS_ON_LOCK:
-                with TasksManager.NUMBER_ENRICH_TASKS_ON_LOCK:
-                    in_identities = TasksManager.IDENTITIES_TASKS_ON
-                    if not in_identities:
-                        # The enrichment can be started
-                        TasksManager.NUMBER_ENRICH_TASKS_ON += 1
-                        logger.debug("Number of enrichment tasks active: %i",
-                                     TasksManager.NUMBER_ENRICH_TASKS_ON)
-                        break
-                    else:
-                        logger.debug("%s Waiting for enrich until identities is done.",
-                                     self.backend_section)
-        #  ** END SYNC LOGIC **
+        if self.__fanout_sections and self.__fanout_sections[0] != self.backend_section:
+            # The leader executes them once it enriches the repositories of the section
+            logger.info('[%s] retention, autorefresh and studies executed by %s',
+                        self.backend_section, self.__fanout_sections[0])
+            return
+
+        logger.info('[%s] data retention start', self.backend_section)
+        retention_time = cfg['general']['retention_time']
+        # Delete the items updated before a given date
+        self.retain_data(retention_time,
+                         self.conf['es_enrichment']['url'],
+                         self.conf[self.backend_section]['enriched_index'])
+        logger.info('[%s] data retention end', self.backend_section)
+
+        if self.db:
+            self.retain_identities(retention_time)
+            logger.info('[%s] identities retention end', self.backend_section)
+
+        autorefresh = cfg['es_enrichment']['autorefresh']
+
+        if autorefresh and self.db:
+            logger.info('[%s] autorefresh start', self.backend_section)
+            self.__autorefresh(self.__get_enrich_backend())
+            logger.info('[%s] autorefresh end', self.backend_section)
+        else:
+            logger.info('[%s] autorefresh not active', self.backend_section)
+
+        self.__studies(retention_time)
+
+        if autorefresh and self.db:
+            logger.info('[%s] autorefresh for studies start', self.backend_section)
+            self.__autorefresh_studies(cfg)
+            logger.info('[%s] autorefresh for studies end', self.backend_section)
+        else:
+            logger.info('[%s] autorefresh for studies not active', self.backend_section)
+
+        for section in self.__fanout_sections[1:]:
+            logger.info('[%s] after-enrichment steps of %s start', self.backend_section, section)
+            self.__get_fanout_task(section).__after_enrichment(cfg)
+            logger.info('[%s] after-enrichment steps of %s end', self.backend_section, section)
 
+    def __get_fanout_task(self, backend_section):
+        """Get the task executing the after-enrichment steps of a fan-out follower.
+
+        The task is kept between executions, so the state of its
+        autorefresh and studies is preserved.
+        """
+        if backend_section not in self.__fanout_tasks:
+            self.__fanout_tasks[backend_section] = TaskEnrich(self.config, self.client,
+                                                              backend_section=backend_section)
+
+        return self.__fanout_tasks[backend_section]
+
+    def start_pipeline(self):
+        """Prepare the enrichment of the repositories as soon as they are collected.
+
+        In pipelined mode, `enrich_collected_repo` is called every time
+        a repository is collected, and `finish_pipeline` once the
+        collection is over. The identities lock is held only while
+        enriching, so identities tasks can run between repositories.
+
+        :returns: False if the enrichment is disabled for the section
+        """
+        cfg = self.config.get_conf()
+
+        if not self.__is_enabled(cfg):
+            return False
+
+        logger.info('[%s] pipelined enrichment phase starts', self.backend_section)
+        self.__pipeline_start = datetime.now()
+
+        self.__acquire_identities_lock()
         try:
-            self.__enrich_items()
+            repos, self.__pipeline_args = self.__prepare_enrichment(cfg)
+        finally:
+            TasksManager.IDENTITIES_ENRICH_LOCK.release_read()
 
-            logger.info('[%s] data retention start', self.backend_section)
-            retention_time = cfg['general']['retention_time']
-            # Delete the items updated before a given date
-            self.retain_data(retention_time,
-                             self.conf['es_enrichment']['url'],
-                             self.conf[self.backend_section]['enriched_index'])
-            logger.info('[%s] data retention end', self.backend_section)
+        # Group the repositories to enrich by the URL of the data collected
+        self.__pipeline_repos = {}
+        for repo in repos:
+            self.__pipeline_repos.setdefault(self.__get_repo_url(repo), []).append(repo)
 
-            if self.db:
-                self.retain_identities(retention_time)
-                logger.info('[%s] identities retention end', self.backend_section)
+        return True
 
-            autorefresh = cfg['es_enrichment']['autorefresh']
+    def enrich_collected_repo(self, repo):
+        """Enrich the repositories whose data is collected from `repo`"""
 
-            if autorefresh and self.db:
-                logger.info('[%s] autorefresh start', self.backend_section)
-                self.__autorefresh(self._get_enrich_backend())
-                logger.info('[%s] autorefresh end', self.backend_section)
-            else:
-                logger.info('[%s] autorefresh not active', self.backend_section)
+        cfg = self.config.get_conf()
+        repos = self.__pipeline_repos.pop(self.__get_repo_url(repo), [])
+        if not repos:
+            return
 
-            self.__studies(retention_time)
+        self.__acquire_identities_lock()
+        try:
+            self.__enrich_repos(cfg, repos, self.__pipeline_args, last=False)
+        finally:
+            TasksManager.IDENTITIES_ENRICH_LOCK.release_read()
 
-            if autorefresh and self.db:
-                logger.info('[%s] autorefresh for studies start', self.backend_section)
-                self.__autorefresh_studies(cfg)
-                logger.info('[%s] autorefresh for studies end', self.backend_section)
-            else:
-                logger.info('[%s] autorefresh for studies not active', self.backend_section)
+    def finish_pipeline(self):
+        """Enrich the pending repositories and execute the rest of the enrichment phase"""
+
+        cfg = self.config.get_conf()
+        repos = sorted([repo for repos in self.__pipeline_repos.values() for repo in repos])
+        self.__pipeline_repos = {}
+
+        self.__acquire_identities_lock()
+        try:
+            self.__enrich_repos(cfg, repos, self.__pipeline_args)
+            self._clear_checkpoint('enrichment')
 
+            spent_time = str(datetime.now() - self.__pipeline_start).split('.')[0]
+            logger.info('[%s] pipelined enrichment phase finished in %s', self.backend_section, spent_time)
+
+            self.__after_enrichment(cfg)
+        finally:
+            TasksManager.IDENTITIES_ENRICH_LOCK.release_read()
+
+    def __get_repo_url(self, repo):
+        repo, _ = self._extract_repo_tags(self.backend_section, repo)
+        return self._compose_p2o_params(self.backend_section, repo)['url']
+
+    def execute(self):
+        cfg = self.config.get_conf()
+
+        if not self.__is_enabled(cfg):
+            return
+
+        self.__acquire_identities_lock()
+
+        try:
+            self.__enrich_items()
+            self.__after_enrichment(cfg)
         except Exception as e:
             raise e
         finally:
-            with TasksManager.NUMBER_ENRICH_TASKS_ON_LOCK:
-                TasksManager.NUMBER_ENRICH_TASKS_ON -= 1
+            TasksManager.IDENTITIES_ENRICH_LOCK.release_read()
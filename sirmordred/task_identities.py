@@ -23,7 +23,6 @@
 #
 
 import logging
-import time
 
 from datetime import datetime
 
@@ -47,20 +46,16 @@ class TaskIdentitiesMerge(Task):
 
     def execute(self):
 
-        # ** START SYNC LOGIC **
-        # Check that enrichment tasks are not active before loading identities
-        while True:
-            time.sleep(1)  # check each second if the task could start
-            with TasksManager.IDENTITIES_TASKS_ON_LOCK:
-                with TasksManager.NUMBER_ENRICH_TASKS_ON_LOCK:
-                    enrich_tasks = TasksManager.NUMBER_ENRICH_TASKS_ON
-                    logger.debug("[unify] Enrich tasks active: %i", enrich_tasks)
-                    if enrich_tasks == 0:
-                        # The load of identities can be started
-                        TasksManager.IDENTITIES_TASKS_ON = True
-                        break
-        #  ** END SYNC LOGIC **
+        # Wait until enrichment tasks are not active
+        waited = TasksManager.IDENTITIES_ENRICH_LOCK.acquire_write()
+        logger.debug("[sortinghat] identities tasks waited %.2f seconds for enrichment tasks", waited)
 
+        try:
+            self.__execute_identities()
+        finally:
+            TasksManager.IDENTITIES_ENRICH_LOCK.release_write()
+
+    def __execute_identities(self):
         cfg = self.config.get_conf()
 
         for algo in cfg['sortinghat']['matching']:
@@ -87,6 +82,3 @@ class TaskIdentitiesMerge(Task):
         else:
             logger.info("[sortinghat] Executing autogender")
             SortingHat.do_autogender(self.client)
-
-        with TasksManager.IDENTITIES_TASKS_ON_LOCK:
-            TasksManager.IDENTITIES_TASKS_ON = False
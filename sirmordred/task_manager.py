@@ -22,15 +22,191 @@
 #
 
 import logging
+import pickle
 import queue
+import signal
 import threading
 import sys
 import time
 
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
+from sirmordred.config_watcher import reload_config
+from sirmordred.error import TaskCancelled
+from sirmordred.es_admission import configure_es_admission
+
 logger = logging.getLogger(__name__)
 
+GLOBAL_TASKS = "Global tasks"
+
+# maximum number of repositories collected and waiting to be enriched
+PIPELINE_DEPTH = 10
+# signals to finish the pipelined enrichment
+PIPELINE_END = object()
+PIPELINE_ABORT = object()
+# seconds between checks of the cancellation and the config changes
+# while waiting for the next execution
+STOP_CHECK_INTERVAL = 1
+
+# the tasks of a backend section are executed one at a time
+_section_locks = {}
+_section_locks_lock = threading.Lock()
+
+
+class FairLock:
+    """Lock granted to the threads in the order they request it.
+
+    A thread releasing the lock and requesting it again right away
+    waits for the threads that requested it before.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+
+    def acquire(self):
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving:
+                self._cond.wait()
+
+    def release(self):
+        with self._cond:
+            self._serving += 1
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class ReadersWriterLock:
+    """Readers-writer lock with writer preference.
+
+    Several readers can hold the lock at the same time, while a writer
+    holds it alone. Once a writer is waiting, new readers are blocked
+    until the writer releases the lock, so writers cannot be starved.
+    Waiting threads are woken up as soon as the lock is released.
+
+    The time spent waiting for the lock is recorded and can be
+    retrieved with `get_stats`.
+
+    By default, the lock can be shared by threads. When a multiprocessing
+    context is given, its state is kept in shared memory, so it can
+    be shared by the processes started with that context.
+
+    :param mp_context: multiprocessing context used to share the lock
+    """
+
+    READERS = 0
+    WRITER = 1
+    WRITERS_WAITING = 2
+    READ_ACQUIRED = 3
+    READ_WAIT = 4
+    WRITE_ACQUIRED = 5
+    WRITE_WAIT = 6
+
+    def __init__(self, mp_context=None):
+        if mp_context:
+            self._cond = mp_context.Condition(mp_context.Lock())
+            self._state = mp_context.Array('d', 7, lock=False)
+        else:
+            self._cond = threading.Condition(threading.Lock())
+            self._state = [0] * 7
+
+    def acquire_read(self):
+        """Acquire the lock for reading and return the seconds waited"""
+
+        start = time.monotonic()
+        with self._cond:
+            while self._state[self.WRITER] or self._state[self.WRITERS_WAITING]:
+                self._cond.wait()
+            self._state[self.READERS] += 1
+            waited = time.monotonic() - start
+            self._state[self.READ_ACQUIRED] += 1
+            self._state[self.READ_WAIT] += waited
+
+        return waited
+
+    def release_read(self):
+        with self._cond:
+            if self._state[self.READERS] <= 0:
+                raise RuntimeError("Lock released for reading but it was not acquired")
+            self._state[self.READERS] -= 1
+            if self._state[self.READERS] == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        """Acquire the lock for writing and return the seconds waited"""
+
+        start = time.monotonic()
+        with self._cond:
+            self._state[self.WRITERS_WAITING] += 1
+            try:
+                while self._state[self.WRITER] or self._state[self.READERS]:
+                    self._cond.wait()
+            finally:
+                self._state[self.WRITERS_WAITING] -= 1
+            self._state[self.WRITER] = 1
+            waited = time.monotonic() - start
+            self._state[self.WRITE_ACQUIRED] += 1
+            self._state[self.WRITE_WAIT] += waited
+
+        return waited
+
+    def release_write(self):
+        with self._cond:
+            if not self._state[self.WRITER]:
+                raise RuntimeError("Lock released for writing but it was not acquired")
+            self._state[self.WRITER] = 0
+            self._cond.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    @property
+    def readers(self):
+        return int(self._state[self.READERS])
+
+    @property
+    def writer(self):
+        return bool(self._state[self.WRITER])
+
+    def get_stats(self):
+        """Return the number of acquisitions and the time spent waiting for the lock"""
+
+        with self._cond:
+            stats = {
+                'read_acquired': int(self._state[self.READ_ACQUIRED]),
+                'read_wait': float(self._state[self.READ_WAIT]),
+                'write_acquired': int(self._state[self.WRITE_ACQUIRED]),
+                'write_wait': float(self._state[self.WRITE_WAIT]),
+                'readers': int(self._state[self.READERS]),
+                'writer': bool(self._state[self.WRITER]),
+                'writers_waiting': int(self._state[self.WRITERS_WAITING])
+            }
+
+        return stats
+
 
 class TasksManager(threading.Thread):
     """
@@ -43,18 +219,19 @@ class TasksManager(threading.Thread):
 
     # this queue supports the communication from threads to mother process
     COMM_QUEUE = queue.Queue()
-    # to control if enrichment process are active
-    NUMBER_ENRICH_TASKS_ON_LOCK = threading.Lock()
-    NUMBER_ENRICH_TASKS_ON = 0
-    # to control if identities process are active
-    IDENTITIES_TASKS_ON_LOCK = threading.Lock()
-    IDENTITIES_TASKS_ON = False
-
-    def __init__(self, tasks_cls, backend_section, stopper, config, sortinghat_client, timer=0):
+    # enrichment tasks (readers) can run at the same time, but identities
+    # tasks (writer) must run alone
+    IDENTITIES_ENRICH_LOCK = ReadersWriterLock()
+    # Event to cancel the running tasks as soon as possible
+    CANCEL_EVENT = threading.Event()
+
+    def __init__(self, tasks_cls, backend_section, stopper, config, sortinghat_client, timer=0,
+                 reload_projects=False):
         """
         :tasks_cls : tasks classes to be executed using the backend
         :backend_section: perceval backend section name
         :config: config object for the manager
+        :reload_projects: read the projects file before each iteration
         """
         super().__init__(name=backend_section)  # init the Thread
         self.config = config
@@ -65,10 +242,18 @@ class TasksManager(threading.Thread):
         self.timer = timer
         self.thread_id = None
         self.client = sortinghat_client
+        self.reload_projects = reload_projects
+        # event set to read the config files again
+        self.config_reload = None
 
     def add_task(self, task):
         self.tasks.append(task)
 
+    def is_section_removed(self):
+        """Check whether the backend section was removed from the config"""
+
+        return self.backend_section != GLOBAL_TASKS and self.backend_section not in self.config
+
     def run(self):
         def __set_thread_id():
             self.thread_id = threading.get_ident()
@@ -83,6 +268,7 @@ class TasksManager(threading.Thread):
             # create the real Task from the class
             task = tc(self.config, self.client)
             task.set_backend_section(self.backend_section)
+            task.cancel_event = TasksManager.CANCEL_EVENT
             self.tasks.append(task)
 
         if not self.tasks:
@@ -91,38 +277,282 @@ class TasksManager(threading.Thread):
         logger.debug('[%s] Tasks will be executed in this order: %s', self.backend_section, self.tasks)
 
         stop_task = False
+        # Managers of sections not in the config (i.e. catch-up tasks)
+        # are not stopped when the config changes
+        configured = not self.is_section_removed()
 
         while not stop_task:
-            for task in self.tasks:
-                logger.debug('[%s] Tasks started: %s', self.backend_section, task)
-                try:
-                    task.execute()
-                except Exception as ex:
-                    logger.error("[%s] Exception in Task Manager %s", self.backend_section, ex, exc_info=True)
-                    TasksManager.COMM_QUEUE.put(sys.exc_info())
-                    raise
-                logger.debug('[%s] Tasks finished: %s', self.backend_section, task)
+            self.__reload_config()
+            if configured and self.is_section_removed():
+                logger.info("[%s] Section removed from the config, stopping its tasks", self.backend_section)
+                break
+
+            if self.reload_projects:
+                self.__load_projects()
+
+            try:
+                execute_tasks(self.config, self.backend_section, self.tasks)
+            except TaskCancelled as ex:
+                logger.info("[%s] %s", self.backend_section, ex.expression)
+                break
+            except Exception as ex:
+                logger.error("[%s] Exception in Task Manager %s", self.backend_section, ex, exc_info=True)
+                TasksManager.COMM_QUEUE.put(self.__get_exc_info())
+                raise
 
             timer = self.__get_timer(self.backend_section)
             if timer > 0 and self.config.get_conf()['general']['update']:
                 logger.info("[%s] sleeping for %s seconds ", self.backend_section, timer)
-                time.sleep(timer)
+                self.__sleep(timer, configured)
 
-            stop_task = self.stopper.is_set()
+            stop_task = self.stopper.is_set() or TasksManager.CANCEL_EVENT.is_set()
 
         logger.debug('[%s] Task is exiting', self.backend_section)
 
+    def __sleep(self, timer, configured):
+        """Wait for the next execution, unless the tasks are cancelled or the section is removed"""
+
+        deadline = time.monotonic() + timer
+        while not TasksManager.CANCEL_EVENT.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            TasksManager.CANCEL_EVENT.wait(min(remaining, STOP_CHECK_INTERVAL))
+
+            self.__reload_config()
+            if configured and self.is_section_removed():
+                break
+
+    def __reload_config(self):
+        if self.config_reload is None or not self.config_reload.is_set():
+            return
+
+        self.config_reload.clear()
+        reload_config(self.config)
+
     def __get_timer(self, backend):
-        if backend == "Global tasks":
-            return self.timer
-
-        update_hour = self.config.get_conf()['general'].get('update_hour', None)
-        timer = self.timer
-        if update_hour:
-            now = datetime.now()
-            next_date = now
-            if now.hour >= update_hour:
-                next_date = now + timedelta(days=1)
-            update_hour_date = datetime(next_date.year, next_date.month, next_date.day, update_hour)
-            timer = (update_hour_date - now).total_seconds()
+        return get_tasks_timer(self.config, backend, self.timer)
+
+    def __load_projects(self):
+        """Load the projects written to the projects file by the parent process"""
+
+        from sirmordred.task_projects import TaskProjects
+
+        projects_file = self.config.get_conf()['projects']['projects_file']
+        TaskProjects.set_projects(*TaskProjects.load_projects_file(projects_file))
+
+    @staticmethod
+    def __get_exc_info():
+        exc_type, exc_obj, exc_trace = sys.exc_info()
+
+        if isinstance(TasksManager.COMM_QUEUE, queue.Queue):
+            return exc_type, exc_obj, exc_trace
+
+        # The exception is sent to another process, so it must be pickled.
+        # Tracebacks can't be pickled and not all the exceptions can be.
+        try:
+            pickle.dumps(exc_obj)
+        except Exception:
+            exc_type = RuntimeError
+            exc_obj = RuntimeError(str(exc_obj))
+
+        return exc_type, exc_obj, None
+
+
+def run_tasks_process(tasks_cls, backend_section, stopper, config, timer,
+                      comm_queue, identities_enrich_lock, sortinghat_client_factory=None,
+                      cancel_event=None):
+    """Execute the tasks of a backend section in the current process.
+
+    This is the entry point of the processes started when the tasks
+    are executed using processes instead of threads. The queue to
+    report the exceptions and the lock shared by the identities and
+    enrichment tasks are replaced by the ones shared with the parent
+    process, and the projects are read from the projects file in
+    each iteration.
+
+    :param tasks_cls: tasks classes to be executed using the backend
+    :param backend_section: perceval backend section name
+    :param stopper: event to stop the tasks
+    :param config: config object
+    :param timer: seconds between executions
+    :param comm_queue: queue shared with the parent process
+    :param identities_enrich_lock: lock shared with the parent process
+    :param sortinghat_client_factory: function to create a SortingHat
+        client from the config object
+    :param cancel_event: event shared with the parent process to
+        cancel the tasks; it is also set when the process receives
+        a SIGTERM signal
+    """
+    from sirmordred.task_projects import TaskProjects
+
+    TasksManager.COMM_QUEUE = comm_queue
+    TasksManager.IDENTITIES_ENRICH_LOCK = identities_enrich_lock
+    # The changes of the projects are processed by the parent process
+    TaskProjects.clear_delta_listeners()
+    if cancel_event:
+        TasksManager.CANCEL_EVENT = cancel_event
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: TasksManager.CANCEL_EVENT.set())
+
+    # The parent process sends a SIGHUP when its config changed
+    config_reload = threading.Event()
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: config_reload.set())
+
+    configure_es_admission(config['general'])
+
+    client = sortinghat_client_factory(config) if sortinghat_client_factory else None
+
+    tm = TasksManager(tasks_cls, backend_section, stopper, config, client, timer,
+                      reload_projects=True)
+    tm.config_reload = config_reload
+    try:
+        tm.run()
+    except Exception:
+        # The exception was already logged and sent to the parent process
+        sys.exit(1)
+
+
+def execute_tasks(config, backend_section, tasks):
+    """Execute a chain of tasks in order.
+
+    When `pipeline` is enabled in the `general` section, a collection
+    task followed by an enrichment task are executed together: each
+    repository is enriched as soon as its data is collected instead of
+    waiting for the collection of all the repositories of the section.
+
+    Only a task of a backend section is executed at a time in the
+    process, so the tasks executed once for a section (i.e. catch-up
+    tasks) never process its repositories at the same time as the
+    regular ones. The lock of the section is released between the
+    tasks of the chain, so those tasks wait for the task running,
+    not for the whole chain.
+
+    :param config: config object
+    :param backend_section: backend section name
+    :param tasks: list of tasks to execute
+    """
+    general = config.get_conf()['general']
+    pipeline = general.get('pipeline', False)
+
+    i = 0
+    while i < len(tasks):
+        task = tasks[i]
+        next_task = tasks[i + 1] if i + 1 < len(tasks) else None
+
+        task.check_cancelled()
+
+        with get_section_lock(backend_section):
+            if pipeline and hasattr(task, 'on_repo_collected') and hasattr(next_task, 'start_pipeline'):
+                logger.debug('[%s] Tasks started: %s, %s', backend_section, task, next_task)
+                execute_pipeline(task, next_task, general.get('pipeline_depth', PIPELINE_DEPTH))
+                logger.debug('[%s] Tasks finished: %s, %s', backend_section, task, next_task)
+                i += 2
+            else:
+                logger.debug('[%s] Tasks started: %s', backend_section, task)
+                task.execute()
+                logger.debug('[%s] Tasks finished: %s', backend_section, task)
+                i += 1
+
+
+def get_section_lock(backend_section):
+    """Get the lock held while a task of a backend section is executed"""
+
+    with _section_locks_lock:
+        if backend_section not in _section_locks:
+            _section_locks[backend_section] = FairLock()
+        return _section_locks[backend_section]
+
+
+def execute_pipeline(collection_task, enrich_task, depth=PIPELINE_DEPTH):
+    """Enrich the repositories while they are being collected.
+
+    The repositories collected are queued and enriched in another
+    thread. When there are `depth` repositories waiting to be
+    enriched, the collection waits until one of them is done.
+    If the collection fails, the pending repositories are discarded
+    and the rest of the enrichment phase is not executed.
+
+    :param collection_task: task to collect the data of the repositories
+    :param enrich_task: task to enrich the data of the repositories
+    :param depth: maximum number of repositories waiting to be enriched
+    """
+    repos = queue.Queue(maxsize=max(depth, 1))
+    errors = []
+
+    def _enrich():
+        enabled = False
+        try:
+            enabled = enrich_task.start_pipeline()
+        except Exception as ex:
+            errors.append(ex)
+
+        # The queue must be consumed until the end, even when the
+        # enrichment fails, so the collection does not get blocked
+        while True:
+            repo = repos.get()
+            if repo is PIPELINE_END or repo is PIPELINE_ABORT:
+                break
+            if not enabled or errors:
+                continue
+            try:
+                enrich_task.enrich_collected_repo(repo)
+            except Exception as ex:
+                errors.append(ex)
+
+        if repo is PIPELINE_END and enabled and not errors:
+            try:
+                enrich_task.finish_pipeline()
+            except Exception as ex:
+                errors.append(ex)
+
+    enricher = threading.Thread(target=_enrich, name=threading.current_thread().name + ':enrich')
+    enricher.start()
+
+    collection_task.on_repo_collected = repos.put
+    end = PIPELINE_ABORT
+    try:
+        collection_task.execute()
+        end = PIPELINE_END
+    finally:
+        collection_task.on_repo_collected = None
+        repos.put(end)
+        enricher.join()
+
+    if errors:
+        raise errors[0]
+
+
+def get_tasks_timer(config, backend_section, timer):
+    """Get the seconds to wait before executing again the tasks of a section.
+
+    The `min_update_delay` and `update_hour` params can be set in the
+    backend section to overwrite the ones set in the `general` section.
+    When `update_hour` is set, the tasks will be executed the next time
+    that hour is reached.
+
+    :param config: config object
+    :param backend_section: backend section name
+    :param timer: default seconds between executions; if None,
+        `min_update_delay` of the `general` section is used
+    """
+    if backend_section == GLOBAL_TASKS:
         return timer
+
+    conf = config.get_conf()
+    section = conf[backend_section] if backend_section in conf else {}
+
+    if timer is None:
+        timer = conf['general']['min_update_delay']
+
+    timer = section.get('min_update_delay', timer)
+    update_hour = section.get('update_hour', conf['general'].get('update_hour', None))
+    if update_hour:
+        now = datetime.now()
+        next_date = now
+        if now.hour >= update_hour:
+            next_date = now + timedelta(days=1)
+        update_hour_date = datetime(next_date.year, next_date.month, next_date.day, update_hour)
+        timer = (update_hour_date - now).total_seconds()
+    return timer
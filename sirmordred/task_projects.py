@@ -21,129 +21,462 @@
 #     Quan Zhou <quan@bitergia.com>
 #
 
+import hashlib
 import json
 import logging
+import os
+import sys
 
+from collections import namedtuple
 from threading import Lock
+from types import MappingProxyType
 
 import requests
 
-from copy import deepcopy
+from grimoire_elk.elastic_items import ElasticItems
 
 from sirmordred.task import Task
 
 logger = logging.getLogger(__name__)
 
 
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _freeze(data):
+    """Get a read-only version of the JSON `data`"""
+
+    if isinstance(data, dict):
+        return MappingProxyType({key: _freeze(value) for key, value in data.items()})
+    elif isinstance(data, (list, tuple)):
+        return tuple(_freeze(value) for value in data)
+    return data
+
+
+def _thaw(data):
+    """Get a modifiable copy of the read-only JSON `data`"""
+
+    if isinstance(data, (dict, MappingProxyType)):
+        return {key: _thaw(value) for key, value in data.items()}
+    elif isinstance(data, (list, tuple)):
+        return [_thaw(value) for value in data]
+    return data
+
+
+def _compact(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    elif isinstance(value, list):
+        return tuple(_compact(item) for item in value)
+    return value
+
+
+def _compact_object(pairs):
+    """Build the JSON objects interning their strings and using tuples for the arrays.
+
+    The same URLs and backend sections appear many times in big
+    projects files, so they are stored only once in memory.
+    """
+    return {sys.intern(key): _compact(value) for key, value in pairs}
+
+
+def parse_projects(data):
+    """Parse the projects JSON `data` into its compact representation"""
+
+    return json.loads(data, object_pairs_hook=_compact_object)
+
+
+def projects_fingerprint(data):
+    """Fingerprint of the raw bytes of a projects file"""
+
+    return hashlib.sha1(data).hexdigest()
+
+
+def load_projects(fprojects):
+    """Read the projects from a binary file object.
+
+    The file is read in chunks which are hashed as they arrive, so
+    the fingerprint is computed from the original bytes instead of
+    serializing the parsed projects again.
+
+    :param fprojects: file object opened in binary mode
+
+    :returns: a tuple with the compact projects and their fingerprint
+    """
+    sha1 = hashlib.sha1()
+    data = bytearray()
+
+    chunk = fprojects.read(READ_CHUNK_SIZE)
+    while chunk:
+        sha1.update(chunk)
+        data.extend(chunk)
+        chunk = fprojects.read(READ_CHUNK_SIZE)
+
+    projects = parse_projects(data)
+    del data
+
+    return projects, sha1.hexdigest()
+
+
+class ProjectsSnapshot:
+    """Read-only version of the projects data.
+
+    The repositories of each backend section, for both the collection
+    (`raw=True`) and the enrichment (`raw=False`) phases, are computed
+    when the snapshot is created, so they can be retrieved without
+    walking the projects again.
+
+    :param projects: projects data
+    :param version: number of the snapshot, increased on every change
+    """
+
+    GLOBAL_PROJECT = 'unknown'  # project to download and enrich full sites
+
+    def __init__(self, projects, version=0):
+        self.version = version
+        self.projects = _freeze(projects)
+        self.__raw_repos = {}
+        self.__enrich_repos = {}
+        self.__labels = {}
+        self.__build_indexes()
+
+    @property
+    def backend_sections(self):
+        """Backend sections with repositories in any of the phases"""
+
+        return sorted(set(self.__raw_repos) | set(self.__enrich_repos))
+
+    def get_repos(self, backend_section, raw=True):
+        """Get the sorted list of repositories of a backend section"""
+
+        repos = self.__raw_repos if raw else self.__enrich_repos
+        return list(repos.get(backend_section, ()))
+
+    def split_labels(self, repo):
+        """Get the URL and the labels of a repository.
+
+        The labels of each repository are only parsed once per snapshot.
+        """
+        split = self.__labels.get(repo, None)
+        if split is None:
+            url, labels = ElasticItems.extract_repo_tags(repo)
+            split = (sys.intern(url), tuple(labels))
+            self.__labels[repo] = split
+
+        return split
+
+    def __build_indexes(self):
+        projects = self.projects
+        unknown = projects.get(self.GLOBAL_PROJECT, None)
+        others = [projects[pro] for pro in projects if pro != self.GLOBAL_PROJECT]
+        others_sections = {section for prj in others for section in prj.keys()}
+
+        raw_repos = {}
+        enrich_repos = {}
+
+        def _add(index, section, repos):
+            index.setdefault(section, set()).update(repos)
+
+        for pro, sections in projects.items():
+            for section, repos in sections.items():
+                if unknown is None:
+                    # if the projects.json doesn't contain the `unknown` project,
+                    # add the repos in the bck section
+                    _add(raw_repos, section, repos)
+                    _add(enrich_repos, section, repos)
+                elif pro != self.GLOBAL_PROJECT:
+                    # if the backend section is in the `unknown` project, the data
+                    # is collected using the repos under `unknown`, but it is enriched
+                    # using the repos of the project
+                    if section in unknown:
+                        _add(raw_repos, section, unknown[section])
+                    else:
+                        _add(raw_repos, section, repos)
+                    _add(enrich_repos, section, repos)
+                else:
+                    # if the backend section is only in the `unknown` project,
+                    # add the repos in the bck section under `unknown`. For the
+                    # collection, only the first project is checked.
+                    if not others or section not in others[0]:
+                        _add(raw_repos, section, repos)
+                    if section not in others_sections:
+                        _add(enrich_repos, section, repos)
+
+        self.__raw_repos = {section: tuple(sorted(repos)) for section, repos in raw_repos.items()}
+        self.__enrich_repos = {section: tuple(sorted(repos)) for section, repos in enrich_repos.items()}
+
+
+SectionDelta = namedtuple('SectionDelta', ['added', 'removed', 'relabelled'])
+
+
+class ProjectsDelta:
+    """Repositories added, removed and relabelled between two snapshots.
+
+    The repositories are compared without their labels, so a repository
+    whose labels changed is reported as relabelled instead of removed
+    and added again. The changes are computed for the collection
+    (`raw=True`) and the enrichment (`raw=False`) phases.
+
+    :param old: previous projects snapshot
+    :param new: current projects snapshot
+    """
+
+    EMPTY = SectionDelta([], [], [])
+
+    def __init__(self, old, new):
+        self.old_version = old.version
+        self.new_version = new.version
+        self.__raw = {}
+        self.__enrich = {}
+
+        for section in sorted(set(old.backend_sections) | set(new.backend_sections)):
+            for raw, deltas in ((True, self.__raw), (False, self.__enrich)):
+                delta = self.__compare(old, new, section, raw)
+                if any(delta):
+                    deltas[section] = delta
+
+    @property
+    def backend_sections(self):
+        """Backend sections with changes in any of the phases"""
+
+        return sorted(set(self.__raw) | set(self.__enrich))
+
+    def get(self, backend_section, raw=True):
+        """Get the changes of a backend section"""
+
+        deltas = self.__raw if raw else self.__enrich
+        return deltas.get(backend_section, self.EMPTY)
+
+    def __bool__(self):
+        return bool(self.__raw or self.__enrich)
+
+    @staticmethod
+    def __compare(old, new, section, raw):
+        def _by_repo(snapshot):
+            return {snapshot.split_labels(repo)[0]: repo for repo in snapshot.get_repos(section, raw)}
+
+        old_repos = _by_repo(old)
+        new_repos = _by_repo(new)
+
+        added = sorted(new_repos[repo] for repo in new_repos.keys() - old_repos.keys())
+        removed = sorted(old_repos[repo] for repo in old_repos.keys() - new_repos.keys())
+        relabelled = sorted(new_repos[repo] for repo in new_repos.keys() & old_repos.keys()
+                            if new_repos[repo] != old_repos[repo])
+
+        return SectionDelta(added, removed, relabelled)
+
+
 class TaskProjects(Task):
     """ Task to manage the projects config """
 
-    GLOBAL_PROJECT = 'unknown'  # project to download and enrich full sites
-    __projects = {}  # static projects data dict
+    GLOBAL_PROJECT = ProjectsSnapshot.GLOBAL_PROJECT
+    __snapshot = ProjectsSnapshot({})
+    __fingerprint = projects_fingerprint(b'{}')
+    __delta_listeners = []
     projects_lock = Lock()
+    # projects downloaded from URLs and their HTTP validators
+    __url_cache = {}
+    __url_cache_lock = Lock()
 
     def is_backend_task(self):
         return False
 
     @classmethod
     def get_projects(cls):
+        # Return a copy so it is not changed
+        return _thaw(cls.get_projects_snapshot().projects)
+
+    @classmethod
+    def get_projects_snapshot(cls):
+        """Get the read-only snapshot of the current projects"""
+
+        return cls.__snapshot
+
+    @classmethod
+    def add_delta_listener(cls, listener):
+        """Call `listener` with the `ProjectsDelta` every time the projects change.
+
+        The listeners are not called when the projects are loaded
+        for the first time.
+        """
+        with cls.projects_lock:
+            cls.__delta_listeners.append(listener)
+
+    @classmethod
+    def remove_delta_listener(cls, listener):
         with cls.projects_lock:
-            # Return a deepcopy so it is not changed
-            return deepcopy(cls.__projects)
+            cls.__delta_listeners.remove(listener)
 
     @classmethod
-    def set_projects(cls, projects):
+    def clear_delta_listeners(cls):
         with cls.projects_lock:
-            old_projects_hash = hash(json.dumps(cls.__projects, sort_keys=True))
-            new_projects_hash = hash(json.dumps(projects, sort_keys=True))
+            cls.__delta_listeners = []
+
+    @classmethod
+    def set_projects(cls, projects, fingerprint=None):
+        """Replace the projects when they change.
+
+        :param projects: projects data
+        :param fingerprint: fingerprint of the file the projects were
+            read from; when it is not given, it is computed serializing
+            the projects
+        """
+        if fingerprint is None:
+            fingerprint = projects_fingerprint(json.dumps(projects, sort_keys=True).encode('utf-8'))
+
+        with cls.projects_lock:
+            if fingerprint == cls.__fingerprint:
+                return
+
+            logger.debug("Projects file has changed")
+
+            old_snapshot = cls.__snapshot
+            new_snapshot = ProjectsSnapshot(projects, old_snapshot.version + 1)
+            cls.__snapshot = new_snapshot
+            cls.__fingerprint = fingerprint
+            listeners = list(cls.__delta_listeners)
 
-            if old_projects_hash != new_projects_hash:
-                logger.debug("Projects file has changed")
+        if not listeners or old_snapshot.version == 0:
+            return
 
-            cls.__projects = projects
+        delta = ProjectsDelta(old_snapshot, new_snapshot)
+        if not delta:
+            return
+
+        for section in delta.backend_sections:
+            raw_delta = delta.get(section)
+            enrich_delta = delta.get(section, raw=False)
+            logger.info("[%s] projects changed: %s repositories added, %s removed, %s relabelled",
+                        section, len(enrich_delta.added), len(enrich_delta.removed),
+                        len(raw_delta.relabelled) + len(enrich_delta.relabelled))
+
+        for listener in listeners:
+            try:
+                listener(delta)
+            except Exception as ex:
+                logger.error("Error processing the changes of the projects: %s", ex, exc_info=True)
 
     @classmethod
     def get_repos_by_backend_section(cls, backend_section, raw=True):
         """ return list with the repositories for a backend_section """
-        repos = []
-        projects = TaskProjects.get_projects()
-
-        for pro in projects:
-            if backend_section in projects[pro]:
-                # if the projects.json doesn't contain the `unknown` project, add the repos in the bck section
-                if cls.GLOBAL_PROJECT not in projects:
-                    repos += projects[pro][backend_section]
-                else:
-                    # if the projects.json contains the `unknown` project
-                    # in the case of the collection phase
-                    if raw:
-                        # if the current project is not `unknown`
-                        if pro != cls.GLOBAL_PROJECT:
-                            # if the bck section is not in the `unknown` project, add the repos in the bck section
-                            if backend_section not in projects[cls.GLOBAL_PROJECT]:
-                                repos += projects[pro][backend_section]
-                            # if the backend section is in the `unknown` project,
-                            # add the repo in the bck section under `unknown`
-                            elif backend_section in projects[pro] and backend_section in projects[cls.GLOBAL_PROJECT]:
-                                repos += projects[cls.GLOBAL_PROJECT][backend_section]
-                        # if the current project is `unknown`
-                        else:
-                            # if the backend section is only in the `unknown` project,
-                            # add the repo in the bck section under `unknown`
-                            not_in_unknown = [projects[pro] for pro in projects if pro != cls.GLOBAL_PROJECT][0]
-                            if backend_section not in not_in_unknown:
-                                repos += projects[cls.GLOBAL_PROJECT][backend_section]
-                    # in the case of the enrichment phase
-                    else:
-                        # if the current project is not `unknown`
-                        if pro != cls.GLOBAL_PROJECT:
-                            # if the bck section is not in the `unknown` project, add the repos in the bck section
-                            if backend_section not in projects[cls.GLOBAL_PROJECT]:
-                                repos += projects[pro][backend_section]
-                            # if the backend section is in the `unknown` project, add the repos in the bck section
-                            elif backend_section in projects[pro] and backend_section in projects[cls.GLOBAL_PROJECT]:
-                                repos += projects[pro][backend_section]
-                        # if the current project is `unknown`
-                        else:
-                            # if the backend section is only in the `unknown` project,
-                            # add the repo in the bck section under `unknown`
-                            not_in_unknown_prj = [projects[prj] for prj in projects if prj != cls.GLOBAL_PROJECT]
-                            not_in_unknown_sections = list(set([section for prj in not_in_unknown_prj
-                                                                for section in list(prj.keys())]))
-                            if backend_section not in not_in_unknown_sections:
-                                repos += projects[pro][backend_section]
 
+        repos = cls.get_projects_snapshot().get_repos(backend_section, raw)
         logger.debug("List of repos for %s: %s (raw=%s)", backend_section, repos, raw)
 
-        # avoid duplicated repos
-        repos = list(set(repos))
-        repos.sort()
-
         return repos
 
     def execute(self):
         config = self.conf
 
         if config['projects']['projects_url']:
-            projects = self.__get_projects_from_url()
+            projects, fingerprint, changed = self.fetch_projects_url(config['projects']['projects_url'],
+                                                                     config['projects']['projects_file'])
+            if not changed:
+                # They could have been fetched, but not applied yet (i.e.
+                # when checking the access to the URL); set_projects only
+                # replaces them when they differ from the current ones
+                logger.debug("Projects not modified in %s", config['projects']['projects_url'])
         else:
             projects_file = config['projects']['projects_file']
             logger.info("Reading projects data from  %s ", projects_file)
-            with open(projects_file, 'r') as fprojects:
-                projects = json.load(fprojects)
-
-        TaskProjects.set_projects(projects)
+            projects, fingerprint = self.load_projects_file(projects_file)
 
-    def __get_projects_from_url(self):
-        config = self.conf
-        projects_url = config['projects']['projects_url']
-        projects_file = config['projects']['projects_file']
+        TaskProjects.set_projects(projects, fingerprint)
 
-        logger.info("Getting projects file from URL: %s ", projects_url)
-        res = requests.get(projects_url)
-        res.raise_for_status()
-        projects = res.json()
-        with open(projects_file, "w") as fprojects:
-            json.dump(projects, fprojects, indent=True)
+    @staticmethod
+    def read_projects_file(projects_file):
+        projects, _ = TaskProjects.load_projects_file(projects_file)
 
         return projects
+
+    @staticmethod
+    def load_projects_file(projects_file):
+        """Read the compact projects and their fingerprint from `projects_file`"""
+
+        with open(projects_file, 'rb') as fprojects:
+            return load_projects(fprojects)
+
+    @classmethod
+    def fetch_projects_url(cls, projects_url, projects_file):
+        """Get the projects from a URL using conditional requests.
+
+        The projects are stored in `projects_file` and the `ETag` and
+        `Last-Modified` headers of the response in a `.cache` file
+        next to it. They are sent back in the next requests, so when
+        the server replies with a 304, the projects are neither
+        downloaded nor parsed again.
+
+        :param projects_url: URL of the projects file
+        :param projects_file: local copy of the projects file
+
+        :returns: a tuple with the projects, their fingerprint and
+            whether they changed since the last call
+        """
+        with cls.__url_cache_lock:
+            validators, projects, fingerprint = cls.__url_cache.get(projects_url, (None, None, None))
+
+            if validators is None:
+                validators = cls.__read_validators(projects_url, projects_file)
+
+            headers = {}
+            if validators:
+                if validators.get('etag', None):
+                    headers['If-None-Match'] = validators['etag']
+                if validators.get('last_modified', None):
+                    headers['If-Modified-Since'] = validators['last_modified']
+
+            logger.info("Getting projects file from URL: %s ", projects_url)
+            res = requests.get(projects_url, headers=headers)
+
+            if res.status_code == 304:
+                if projects is not None:
+                    return projects, fingerprint, False
+
+                # The local copy is still valid; it is read only once
+                projects, fingerprint = cls.load_projects_file(projects_file)
+                cls.__url_cache[projects_url] = (validators, projects, fingerprint)
+                return projects, fingerprint, True
+
+            res.raise_for_status()
+            projects = parse_projects(res.content)
+            fingerprint = projects_fingerprint(res.content)
+            # The original bytes are stored, so the fingerprint of the
+            # local copy is the same
+            with open(projects_file, "wb") as fprojects:
+                fprojects.write(res.content)
+
+            validators = {
+                'url': projects_url,
+                'etag': res.headers.get('ETag', None),
+                'last_modified': res.headers.get('Last-Modified', None)
+            }
+            cls.__write_validators(projects_file, validators)
+            cls.__url_cache[projects_url] = (validators, projects, fingerprint)
+
+            return projects, fingerprint, True
+
+    @staticmethod
+    def __read_validators(projects_url, projects_file):
+        cache_file = projects_file + '.cache'
+        if not os.path.exists(projects_file) or not os.path.exists(cache_file):
+            return {}
+
+        try:
+            with open(cache_file, 'r') as f:
+                validators = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        # The validators are only valid for the same URL
+        if validators.get('url', None) != projects_url:
+            return {}
+
+        return validators
+
+    @staticmethod
+    def __write_validators(projects_file, validators):
+        cache_file = projects_file + '.cache'
+        tmp_file = cache_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(validators, f)
+        os.replace(tmp_file, cache_file)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import heapq
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from sirmordred.error import TaskCancelled
+from sirmordred.task_manager import GLOBAL_TASKS, TasksManager, execute_tasks, get_tasks_timer
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledTasks:
+    """Chain of tasks executed for a backend section.
+
+    The tasks are created once and reused in every execution, so
+    the state they keep between executions (i.e. last autorefresh
+    dates) is preserved.
+
+    :param tasks_cls: tasks classes to be executed
+    :param backend_section: backend section name
+    :param config: config object
+    :param sortinghat_client: SortingHat client
+    :param timer: default seconds between executions; if None,
+        `min_update_delay` of the `general` section is used
+    :param repeat: if False, the tasks are executed only once
+    """
+
+    def __init__(self, tasks_cls, backend_section, config, sortinghat_client, timer=0, repeat=True):
+        self.backend_section = backend_section
+        self.config = config
+        self.timer = timer
+        self.repeat = repeat
+        self.tasks = []
+        # False once the tasks are not scheduled anymore
+        self.active = True
+        # Tasks of sections not in the config (i.e. catch-up tasks)
+        # are not dropped when the config changes
+        self.configured = not self.is_section_removed()
+
+        for tc in tasks_cls:
+            task = tc(config, sortinghat_client)
+            task.set_backend_section(backend_section)
+            task.cancel_event = TasksManager.CANCEL_EVENT
+            self.tasks.append(task)
+
+    def add_task(self, task):
+        task.cancel_event = TasksManager.CANCEL_EVENT
+        self.tasks.append(task)
+
+    def is_section_removed(self):
+        """Check whether the backend section was removed from the config"""
+
+        return self.backend_section != GLOBAL_TASKS and self.backend_section not in self.config
+
+    def execute(self):
+        execute_tasks(self.config, self.backend_section, self.tasks)
+
+    def get_timer(self):
+        return get_tasks_timer(self.config, self.backend_section, self.timer)
+
+    def __repr__(self):
+        return self.backend_section
+
+
+class TasksScheduler:
+    """Execute the tasks of several backend sections with a pool of workers.
+
+    Instead of having a thread per backend section sleeping between
+    executions, the scheduler keeps a single queue sorted by the time
+    each chain of tasks is due. Due tasks are run by a bounded pool of
+    workers and, when `repeat` is set, they are queued again once they
+    finish, using the delay (or `update_hour`) of their section.
+
+    Only a chain of tasks of a backend section is run at a time: a
+    chain due while another one of its section is running (i.e. catch-up
+    tasks) stays in the queue until that one finishes, instead of taking
+    a worker to wait for it.
+
+    Exceptions raised by the tasks are put in `TasksManager.COMM_QUEUE`
+    and the failing (or cancelled) chain of tasks is not scheduled again,
+    neither the tasks of the sections removed from the config.
+
+    :param config: config object
+    :param sortinghat_client: SortingHat client
+    :param workers: number of workers; by default, the number of CPUs
+    :param stopper: event to stop the scheduler
+    """
+
+    def __init__(self, config, sortinghat_client, workers=None, stopper=None):
+        self.config = config
+        self.client = sortinghat_client
+        self.workers = workers if workers else max(os.cpu_count() or 1, 2)
+        self.stopper = stopper if stopper else threading.Event()
+
+        self._queue = []
+        self._counter = itertools.count()
+        self._running = 0
+        # backend sections with a chain of tasks running
+        self._running_sections = set()
+        self._cond = threading.Condition()
+
+    def add_tasks(self, tasks_cls, backend_section, timer=0, delay=0):
+        """Schedule the chain of tasks of a backend section.
+
+        :param tasks_cls: tasks classes to be executed
+        :param backend_section: backend section name
+        :param timer: default seconds between executions; if None,
+            `min_update_delay` of the `general` section is used
+        :param delay: seconds before the first execution
+        """
+        scheduled = ScheduledTasks(tasks_cls, backend_section, self.config, self.client, timer)
+        self.__push(scheduled, time.monotonic() + delay)
+
+        return scheduled
+
+    def add_tasks_once(self, tasks, backend_section):
+        """Execute the tasks of a backend section once, as soon as possible.
+
+        :param tasks: tasks to be executed
+        :param backend_section: backend section name
+        """
+        scheduled = ScheduledTasks([], backend_section, self.config, self.client, repeat=False)
+        for task in tasks:
+            scheduled.add_task(task)
+        self.__push(scheduled, time.monotonic())
+
+        return scheduled
+
+    def stop(self):
+        """Stop scheduling new executions; running ones will finish"""
+
+        with self._cond:
+            self.stopper.set()
+            self._cond.notify_all()
+
+    def run(self, repeat=True):
+        """Run the scheduled tasks until there is nothing else to do.
+
+        :param repeat: if True, the tasks are scheduled again after
+            each execution; otherwise, they are executed only once
+        """
+        logger.debug("[scheduler] Starting with %s workers", self.workers)
+
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix='scheduler') as executor:
+            while True:
+                with self._cond:
+                    scheduled = self.__next_due()
+                    if scheduled is None:
+                        break
+                    self._running += 1
+                    self._running_sections.add(scheduled.backend_section)
+
+                executor.submit(self.__execute, scheduled, repeat)
+
+        logger.debug("[scheduler] All tasks are finished")
+
+    def __push(self, scheduled, due):
+        with self._cond:
+            heapq.heappush(self._queue, (due, next(self._counter), scheduled))
+            self._cond.notify_all()
+
+    def __next_due(self):
+        """Wait for the next chain of tasks due with a free worker.
+
+        It must be called holding the condition. Returns `None` when
+        the scheduler is stopped or there are no more tasks to run.
+        """
+        while True:
+            if self.stopper.is_set():
+                return None
+            if not self._queue and self._running == 0:
+                return None
+
+            entry = self.__first_idle() if self._running < self.workers else None
+            if entry:
+                wait = entry[0] - time.monotonic()
+                if wait <= 0:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    return entry[2]
+                self._cond.wait(wait)
+            else:
+                self._cond.wait()
+
+    def __first_idle(self):
+        """Get the first entry of the queue whose section is not running"""
+
+        entries = [entry for entry in self._queue if entry[2].backend_section not in self._running_sections]
+
+        return min(entries, key=lambda entry: entry[:2], default=None)
+
+    def __execute(self, scheduled, repeat):
+        backend_section = scheduled.backend_section
+        reschedule = repeat and scheduled.repeat
+
+        try:
+            if scheduled.configured and scheduled.is_section_removed():
+                logger.info("[%s] Section removed from the config, its tasks are not scheduled anymore",
+                            backend_section)
+                reschedule = False
+            else:
+                scheduled.execute()
+        except TaskCancelled as ex:
+            logger.info("[%s] %s", backend_section, ex.expression)
+            reschedule = False
+        except Exception as ex:
+            logger.error("[%s] Exception in Tasks Scheduler %s", backend_section, ex, exc_info=True)
+            TasksManager.COMM_QUEUE.put(sys.exc_info())
+            reschedule = False
+
+        with self._cond:
+            self._running -= 1
+            self._running_sections.discard(backend_section)
+            if reschedule and not self.stopper.is_set():
+                timer = scheduled.get_timer()
+                logger.info("[%s] next execution in %s seconds", backend_section, timer)
+                heapq.heappush(self._queue, (time.monotonic() + timer, next(self._counter), scheduled))
+            else:
+                scheduled.active = False
+            self._cond.notify_all()
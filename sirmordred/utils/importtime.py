@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import argparse
+import subprocess
+import sys
+
+IMPORTTIME_DESCRIPTION = "Import time of the SirMordred entry points"
+IMPORTTIME_EPILOG = "Uses the output of `python -X importtime`"
+
+ENTRY_POINTS = [
+    'sirmordred.bin.sirmordred',
+    'sirmordred.utils.micro'
+]
+
+
+def main():
+    args = parse_args()
+    slow = False
+
+    for module in args.modules:
+        imports = measure_import(module)
+        total = imports[-1][1] if imports else 0
+        print("{}: {:.1f} ms".format(module, total / 1000))
+
+        for _, cumulative, name in top_imports(imports, args.top):
+            print("    {:>10.1f} ms  {}".format(cumulative / 1000, name.strip()))
+
+        if args.max_time is not None and total / 1000 > args.max_time:
+            slow = True
+
+    if slow:
+        sys.exit(1)
+
+
+def parse_args():
+    """Parse the modules to measure and the report options"""
+
+    parser = argparse.ArgumentParser(
+        description=IMPORTTIME_DESCRIPTION,
+        epilog=IMPORTTIME_EPILOG
+    )
+
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS,
+                        help='Modules to import; by default, the entry points')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of slowest imports to show per module')
+    parser.add_argument('--max-time', type=float, default=None, dest='max_time',
+                        help='Exit with an error when a module takes longer (ms) to import')
+
+    return parser.parse_args()
+
+
+def measure_import(module, python=None):
+    """Import a module in a new interpreter and return its import times.
+
+    :param module: name of the module to import
+    :param python: interpreter used; by default, the current one
+
+    :returns: list of (self, cumulative, name) tuples in microseconds,
+        in the order reported by the interpreter (the module is the last one)
+    """
+    python = python if python else sys.executable
+    result = subprocess.run([python, '-X', 'importtime', '-c', 'import ' + module],
+                            capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError("Can't import {}: {}".format(module, result.stderr.strip().splitlines()[-1:]))
+
+    return parse_importtime(result.stderr)
+
+
+def parse_importtime(output):
+    """Parse the lines written by `python -X importtime`"""
+
+    imports = []
+
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # header line
+            continue
+        # Keep the indentation of the nested imports
+        imports.append((int(fields[0]), int(fields[1]), fields[2][1:].rstrip()))
+
+    return imports
+
+
+def top_imports(imports, top=10):
+    """Slowest imports done directly by the measured module, by cumulative time"""
+
+    # The measured module is the last entry and the modules it
+    # imports are listed before it, indented one level more
+    direct = []
+    for entry in reversed(imports[:-1]):
+        depth = len(entry[2]) - len(entry[2].lstrip())
+        if depth == 0:
+            break
+        if depth == 2:
+            direct.append(entry)
+
+    return sorted(direct, key=lambda entry: entry[1], reverse=True)[:top]
+
+
+if __name__ == '__main__':
+    main()
@@ -28,12 +28,8 @@ import colorlog
 import sys
 
 from sirmordred.config import Config
-from sirmordred.task_collection import TaskRawDataCollection
-from sirmordred.task_identities import TaskIdentitiesMerge
-from sirmordred.task_enrich import TaskEnrich
-from sirmordred.task_panels import TaskPanels, TaskPanelsMenu
+from sirmordred.es_admission import es_admission
 from sirmordred.task_projects import TaskProjects
-from sortinghat.cli.client import SortingHatClient
 
 COLOR_LOG_FORMAT_SUFFIX = "\033[1m %(log_color)s "
 LOG_COLORS = {'DEBUG': 'white', 'INFO': 'cyan', 'WARNING': 'yellow', 'ERROR': 'red', 'CRITICAL': 'red,bg_white'}
@@ -54,6 +50,8 @@ def main():
 def create_sortinghat_client(config):
     """Create a SortingHat client"""
 
+    from sortinghat.cli.client import SortingHatClient
+
     conf = config.get_conf()
 
     sortinghat = conf.get('sortinghat', None)
@@ -91,24 +89,25 @@ def micro_mordred(config, backend_sections, repos_to_check, raw, identities_merg
     :param panels: if true, it activates the upload of all panels declared in the configuration file
     """
 
-    if raw:
-        for backend in backend_sections:
-            get_raw(config, backend, repos_to_check)
+    with es_admission(config['general']):
+        if raw:
+            for backend in backend_sections:
+                get_raw(config, backend, repos_to_check)
 
-    if identities_merge or enrich:
-        sortinghat_client = create_sortinghat_client(config)
-    else:
-        sortinghat_client = None
+        if identities_merge or enrich:
+            sortinghat_client = create_sortinghat_client(config)
+        else:
+            sortinghat_client = None
 
-    if identities_merge:
-        get_identities_merge(config, sortinghat_client)
+        if identities_merge:
+            get_identities_merge(config, sortinghat_client)
 
-    if enrich:
-        for backend in backend_sections:
-            get_enrich(config, sortinghat_client, backend, repos_to_check)
+        if enrich:
+            for backend in backend_sections:
+                get_enrich(config, sortinghat_client, backend, repos_to_check)
 
-    if panels:
-        get_panels(config)
+        if panels:
+            get_panels(config)
 
 
 def get_raw(config, backend_section, repos_to_check=None):
@@ -120,6 +119,7 @@ def get_raw(config, backend_section, repos_to_check=None):
     :param backend_section: the backend section where the raw phase is executed
     :param repos_to_check: A list of repo URLs to check, or None to check all repos
     """
+    from sirmordred.task_collection import TaskRawDataCollection
 
     task = TaskRawDataCollection(config, backend_section=backend_section, allowed_repos=repos_to_check)
     TaskProjects(config).execute()
@@ -137,6 +137,8 @@ def get_identities_merge(config, sortinghat_client):
     :param sortinghat_client: a SortingHat client
     :param config: a Mordred config object
     """
+    from sirmordred.task_identities import TaskIdentitiesMerge
+
     TaskProjects(config).execute()
     task = TaskIdentitiesMerge(config, sortinghat_client)
     task.execute()
@@ -153,6 +155,7 @@ def get_enrich(config, sortinghat_client, backend_section, repos_to_check=None):
     :param backend_section: the backend section where the enrich phase is executed
     :param repos_to_check: A list of repo URLs to check, or None to check all repos
     """
+    from sirmordred.task_enrich import TaskEnrich
 
     TaskProjects(config).execute()
     task = TaskEnrich(config, sortinghat_client, backend_section=backend_section, allowed_repos=repos_to_check)
@@ -169,6 +172,7 @@ def get_panels(config):
 
     :param config: a Mordred config object
     """
+    from sirmordred.task_panels import TaskPanels, TaskPanelsMenu
 
     task = TaskPanels(config)
     task.execute()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import collections
+import logging
+import threading
+
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class WorkStealingPool:
+    """Pool of workers shared by all the backend sections.
+
+    The units of work (i.e. collecting or enriching a repository) are
+    queued in a backlog per backend section. Every time a worker is
+    free, it takes the next unit of the section with the largest
+    backlog, so the sections with many repositories get the workers
+    left idle by the small ones. The units of a section are started
+    in the order they were submitted.
+
+    :param workers: number of workers
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._backlogs = {}
+        self._threads = []
+        self._shutdown = False
+
+    def submit(self, section, fn, *args, **kwargs):
+        """Queue `fn(*args, **kwargs)` in the backlog of `section`.
+
+        :returns: a `concurrent.futures.Future` with the result
+        """
+        future = Future()
+
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Can't submit work after shutdown")
+
+            backlog = self._backlogs.setdefault(section, collections.deque())
+            backlog.append((future, fn, args, kwargs))
+
+            if len(self._threads) < self.workers:
+                self.__start_worker()
+            self._cond.notify()
+
+        return future
+
+    def get_backlogs(self):
+        """Get the number of units waiting for a worker by section"""
+
+        with self._cond:
+            return {section: len(backlog) for section, backlog in self._backlogs.items()}
+
+    def shutdown(self, wait=True):
+        """Stop the workers once the queued units are done"""
+
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+            threads = list(self._threads)
+
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def __start_worker(self):
+        name = 'shared-worker-%s' % len(self._threads)
+        thread = threading.Thread(target=self.__work, name=name, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def __next_unit(self):
+        with self._cond:
+            while not self._backlogs:
+                if self._shutdown:
+                    return None
+                self._cond.wait()
+
+            section = max(self._backlogs, key=lambda s: len(self._backlogs[s]))
+            backlog = self._backlogs[section]
+            unit = backlog.popleft()
+            if not backlog:
+                del self._backlogs[section]
+
+            return unit
+
+    def __work(self):
+        while True:
+            unit = self.__next_unit()
+            if unit is None:
+                return
+
+            future, fn, args, kwargs = unit
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as ex:
+                future.set_exception(ex)
+            else:
+                future.set_result(result)
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool(workers):
+    """Get the pool shared by the backend sections of the process.
+
+    When `workers` is not set, `None` is returned. If the number of
+    workers changes, a new pool is created and the previous one
+    finishes the units already queued.
+
+    :param workers: number of workers of the pool
+    """
+    global _shared_pool
+
+    if not workers:
+        return None
+
+    with _shared_pool_lock:
+        if _shared_pool is None or _shared_pool.workers != workers:
+            if _shared_pool:
+                _shared_pool.shutdown(wait=False)
+            _shared_pool = WorkStealingPool(workers)
+            logger.debug("Shared pool created with %s workers", workers)
+
+        return _shared_pool
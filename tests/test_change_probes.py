@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Hack to make sure that tests import the right packages
+# due to setuptools behaviour
+sys.path.insert(0, '..')
+
+from sirmordred.change_probes import ChangeProbe, GitChangeProbe, HTTPChangeProbe
+
+
+class TestChangeProbe(unittest.TestCase):
+    """ChangeProbe tests"""
+
+    def test_abstract(self):
+        """Test whether the base probe can't be created"""
+
+        with self.assertRaises(TypeError):
+            ChangeProbe()
+
+    def test_supports(self):
+        """Test whether the probes are only valid for the backends whose URL reflects their data"""
+
+        self.assertTrue(GitChangeProbe.supports('git'))
+        self.assertFalse(GitChangeProbe.supports('github'))
+        self.assertTrue(HTTPChangeProbe.supports('rss'))
+        self.assertFalse(HTTPChangeProbe.supports('github'))
+        self.assertFalse(HTTPChangeProbe.supports('gitlab'))
+
+
+class TestGitChangeProbe(unittest.TestCase):
+    """GitChangeProbe tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='sirmordred_')
+        self.repo_path = os.path.join(self.tmp_path, 'repo')
+        self.__git('init', '-q', self.repo_path)
+        self.__commit('first')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def __git(self, *args):
+        cmd = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args)
+        subprocess.run(cmd, check=True, capture_output=True)
+
+    def __commit(self, message):
+        self.__git('-C', self.repo_path, 'commit', '-q', '--allow-empty', '-m', message)
+
+    def test_fingerprint(self):
+        """Test whether the fingerprint changes only when the repository changes"""
+
+        probe = GitChangeProbe()
+
+        fingerprint = probe.fingerprint(self.repo_path)
+        self.assertIsNotNone(fingerprint)
+        self.assertEqual(probe.fingerprint(self.repo_path), fingerprint)
+
+        self.__commit('second')
+        self.assertNotEqual(probe.fingerprint(self.repo_path), fingerprint)
+
+    def test_fingerprint_error(self):
+        """Test whether no fingerprint is returned when the repository can't be read"""
+
+        probe = GitChangeProbe()
+        self.assertIsNone(probe.fingerprint(os.path.join(self.tmp_path, 'not_found')))
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
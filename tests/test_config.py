@@ -20,10 +20,15 @@
 #     Valerio Cosentino <valcos@bitergia.com>
 #     Miguel Ángel Fernández <mafesan@bitergia.com>
 
+import os
+import pickle
+import shutil
 import sys
 import tempfile
 import unittest
 
+from unittest.mock import patch
+
 # Hack to make sure that tests import the right packages
 # due to setuptools behaviour
 sys.path.insert(0, '..')
@@ -187,6 +192,123 @@ class TestConfig(unittest.TestCase):
             config.set_param("twitter", "acme", "true")
             self.assertEqual(cm.output[-1], 'ERROR:sirmordred.config:Config section twitter and param acme not exists')
 
+    def test_compiled_sections(self):
+        """Test whether the sections are compiled once and invalidated when they change"""
+
+        config = Config(CONF_FULL)
+
+        git = config['git']
+        twitter = config['twitter']
+        self.assertIs(config['git'], git)
+        self.assertIs(config.get_backend_section('git'), git)
+
+        # The sections are read-only
+        with self.assertRaises(TypeError):
+            git['collect'] = False
+
+        # Only the sections built from the modified one are invalidated
+        config.set_param('twitter', 'collect', True)
+        self.assertTrue(config['twitter']['collect'])
+        self.assertIsNot(config['twitter'], twitter)
+        self.assertIs(config['git'], git)
+
+        # Changes done directly on the underlying config are found too
+        config.conf['git']['category'] = 'commit'
+        self.assertEqual(config['git']['category'], 'commit')
+
+        config.conf['git:aoc'] = {'category': 'aoc'}
+        self.assertEqual(config['git:aoc']['category'], 'aoc')
+        del config.conf['git:aoc']
+        self.assertEqual(config['git:aoc']['category'], 'commit')
+
+        # The compiled sections are not pickled
+        unpickled = pickle.loads(pickle.dumps(config))
+        self.assertEqual(unpickled['git'], config['git'])
+        unpickled.set_param('git', 'category', 'tag')
+        self.assertEqual(unpickled['git']['category'], 'tag')
+
+    def test_reload(self):
+        """Test whether the changes of the config files are applied"""
+
+        tmp_path = tempfile.mkdtemp(prefix='mordred_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        conf_file = os.path.join(tmp_path, 'setup.cfg')
+        shutil.copyfile(CONF_FULL, conf_file)
+
+        config = Config(conf_file)
+        config.set_param('general', 'update', True)
+        git = config['git']
+
+        self.assertFalse(config.files_changed())
+        self.assertListEqual(config.reload(), [])
+        self.assertIs(config['git'], git)
+
+        with open(conf_file, 'r') as f:
+            content = f.read()
+        with open(conf_file, 'w') as f:
+            f.write(content.replace('min_update_delay = 10', 'min_update_delay = 30'))
+            f.write('\n[git:aoc]\nlatest-items = true\n')
+        os.utime(conf_file, ns=(0, 0))
+
+        self.assertTrue(config.files_changed())
+        self.assertListEqual(config.reload_if_changed(), ['general', 'git:aoc'])
+        self.assertFalse(config.files_changed())
+        self.assertEqual(config['general']['min_update_delay'], 30)
+        self.assertTrue(config['git:aoc']['latest-items'])
+        self.assertIsNot(config['git'], git)
+
+        # The params set with set_param keep their values
+        self.assertTrue(config['general']['update'])
+
+        # A wrong config is not applied
+        with open(conf_file, 'a') as f:
+            f.write('\n[wrong_section]\nparam = 1\n')
+
+        with self.assertRaises(RuntimeError):
+            config.reload()
+        self.assertNotIn('wrong_section', config)
+        self.assertEqual(config['general']['min_update_delay'], 30)
+
+    def test_compile(self):
+        """Test whether the compiled config is loaded instead of parsing the files"""
+
+        tmp_path = tempfile.mkdtemp(prefix='mordred_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        conf_file = os.path.join(tmp_path, 'setup.cfg')
+        shutil.copyfile(CONF_FULL, conf_file)
+
+        config = Config(conf_file)
+        config.set_param('general', 'update', True)
+        compiled_file = config.compile()
+        self.assertEqual(compiled_file, conf_file + '.compiled')
+
+        with patch.object(Config, 'check_config') as mock_check:
+            compiled = Config(conf_file)
+            self.assertFalse(mock_check.called)
+
+        self.assertEqual(compiled.conf, Config(conf_file, compiled_file=os.path.join(tmp_path, 'none')).conf)
+        self.assertDictEqual(dict(compiled['git']), dict(config['git']))
+        # The params set with set_param are not compiled
+        self.assertFalse(compiled['general']['update'])
+
+        # A compiled config of other files is not loaded
+        with open(conf_file, 'a') as f:
+            f.write('\n[git:aoc]\nlatest-items = true\n')
+
+        with patch.object(Config, 'check_config') as mock_check:
+            Config(conf_file)
+            self.assertTrue(mock_check.called)
+
+        self.assertIn('git:aoc', Config(conf_file))
+
+        # A wrong compiled config is ignored
+        with open(compiled_file, 'w') as f:
+            f.write('{"key": ')
+
+        with self.assertLogs(logger, level='WARNING'):
+            config = Config(conf_file)
+        self.assertIn('git:aoc', config)
+
     def test_backend_composition_by_get_backend_section(self):
         """Test the ability to parameterize backends as in the docs for get_backend_section"""
 
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+# Hack to make sure that tests import the right packages
+# due to setuptools behaviour
+sys.path.insert(0, '..')
+
+from sirmordred.config import Config
+from sirmordred.config_watcher import ConfigWatcher, reload_config
+from sirmordred.es_admission import ES_ADMISSION, configure_es_admission
+
+CONF_FILE = 'test.cfg'
+
+
+class TestConfigWatcher(unittest.TestCase):
+    """ConfigWatcher tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='sirmordred_')
+        self.conf_file = os.path.join(self.tmp_path, 'setup.cfg')
+        shutil.copyfile(CONF_FILE, self.conf_file)
+        self.config = Config(self.conf_file)
+
+        self.changes = []
+        self.reloaded = threading.Event()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def __on_reload(self, changed):
+        self.changes.append(changed)
+        self.reloaded.set()
+
+    def __update_conf_file(self, old, new):
+        with open(self.conf_file, 'r') as f:
+            content = f.read()
+        with open(self.conf_file, 'w') as f:
+            f.write(content.replace(old, new))
+        os.utime(self.conf_file, ns=(0, 0))
+
+    def test_request_reload(self):
+        """Test whether the config is reloaded when it is requested"""
+
+        watcher = ConfigWatcher(self.config, self.__on_reload, watch_files=False, interval=0.01)
+        watcher.start()
+        self.addCleanup(watcher.join)
+        self.addCleanup(watcher.stop)
+
+        self.__update_conf_file('bulk_size = 100', 'bulk_size = 500')
+        watcher.request_reload()
+
+        self.assertTrue(self.reloaded.wait(5))
+        self.assertListEqual(self.changes, [['general']])
+        self.assertEqual(self.config['general']['bulk_size'], 500)
+
+    def test_watch_files(self):
+        """Test whether the config is reloaded when its files change"""
+
+        watcher = ConfigWatcher(self.config, self.__on_reload, interval=0.01)
+        watcher.start()
+        self.addCleanup(watcher.join)
+        self.addCleanup(watcher.stop)
+
+        self.__update_conf_file('scroll_size = 100', 'scroll_size = 50')
+
+        self.assertTrue(self.reloaded.wait(5))
+        self.assertListEqual(self.changes, [['general']])
+        self.assertEqual(self.config['general']['scroll_size'], 50)
+
+    def test_reload_es_admission(self):
+        """Test whether the limits of the Elasticsearch clusters are set again when the config is reloaded"""
+
+        self.addCleanup(configure_es_admission, {})
+
+        self.__update_conf_file('bulk_size = 100', 'bulk_size = 100\nes_max_scrolls = 3')
+        self.assertListEqual(reload_config(self.config), ['general'])
+        self.assertEqual(ES_ADMISSION.max_scrolls, 3)
+
+    def test_wrong_config(self):
+        """Test whether a wrong config is not applied"""
+
+        watcher = ConfigWatcher(self.config, self.__on_reload, watch_files=False)
+
+        self.__update_conf_file('bulk_size = 100', 'bulk_size = 500\nwrong_param = 1')
+        with self.assertLogs('sirmordred.config_watcher', level='ERROR'):
+            self.assertListEqual(watcher.reload(), [])
+
+        self.assertListEqual(self.changes, [])
+        self.assertEqual(self.config['general']['bulk_size'], 100)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import os
+import subprocess
+import sys
+import unittest
+
+# Hack to make sure that tests import the right packages
+# due to setuptools behaviour
+sys.path.insert(0, '..')
+
+from sirmordred.utils.importtime import (ENTRY_POINTS,
+                                         measure_import,
+                                         parse_importtime,
+                                         top_imports)
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       400 |        400 | encodings
+import time:        40 |         40 |     pkg.deep
+import time:       100 |        140 |   pkg
+import time:        30 |         30 |   other
+import time:       500 |        670 | mymodule
+"""
+
+# Modules that must be imported only by the phases using them
+HEAVY_MODULES = [
+    'grimoire_elk.elk',
+    'grimoire_elk.utils',
+    'kidash',
+    'opensearchpy',
+    'panels',
+    'sortinghat.cli.client'
+]
+
+
+class TestImportTime(unittest.TestCase):
+    """Import time tests"""
+
+    def test_parse_importtime(self):
+        """Test whether the output of -X importtime is parsed"""
+
+        imports = parse_importtime(IMPORTTIME_OUTPUT)
+
+        self.assertEqual(len(imports), 5)
+        self.assertEqual(imports[0], (400, 400, 'encodings'))
+        self.assertEqual(imports[1], (40, 40, '    pkg.deep'))
+        self.assertEqual(imports[-1], (500, 670, 'mymodule'))
+
+    def test_top_imports(self):
+        """Test whether only the imports done by the module are returned, slowest first"""
+
+        imports = parse_importtime(IMPORTTIME_OUTPUT)
+
+        top = top_imports(imports)
+        self.assertListEqual(top, [(100, 140, '  pkg'), (30, 30, '  other')])
+
+        top = top_imports(imports, top=1)
+        self.assertListEqual(top, [(100, 140, '  pkg')])
+
+    def test_measure_import(self):
+        """Test whether the import times of a module are measured"""
+
+        imports = measure_import('json')
+        self.assertEqual(imports[-1][2], 'json')
+
+        with self.assertRaises(RuntimeError):
+            measure_import('sirmordred_unknown_module')
+
+    def test_entry_points_lazy_imports(self):
+        """Test whether the entry points don't import the modules of the phases"""
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        check = "import sys, {}; print(','.join(m for m in {!r} if m in sys.modules))"
+
+        for module in ENTRY_POINTS + ['sirmordred.config', 'sirmordred.sirmordred']:
+            result = subprocess.run([sys.executable, '-c', check.format(module, HEAVY_MODULES)],
+                                    capture_output=True, text=True, cwd=root, check=True)
+            self.assertEqual(result.stdout.strip(), '', msg=module)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Hack to make sure that tests import the right packages
+# due to setuptools behaviour
+sys.path.insert(0, '..')
+
+from sirmordred.local_store import LocalStore, get_local_store
+
+
+def update_store_process(path, name, n):
+    store = LocalStore(path)
+    for i in range(n):
+        store.append(name + ' repos', i)
+        store.set(name, i)
+    store.delete(name)
+
+
+class TestLocalStore(unittest.TestCase):
+    """LocalStore tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='sirmordred_')
+        self.path = os.path.join(self.tmp_path, 'fingerprints', 'fingerprints.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_set(self):
+        """Test whether the fingerprints are stored in the file"""
+
+        store = LocalStore(self.path)
+        self.assertIsNone(store.get('git https://example.com/repo'))
+
+        store.set('git https://example.com/repo', 'abc')
+        self.assertEqual(store.get('git https://example.com/repo'), 'abc')
+
+        with open(self.path) as f:
+            self.assertDictEqual(json.load(f), {'git https://example.com/repo': 'abc'})
+
+    def test_set_shared_file(self):
+        """Test whether the stores sharing a file keep the fingerprints of the others"""
+
+        store_a = LocalStore(self.path)
+        store_b = LocalStore(self.path)
+
+        store_a.set('git a', '1')
+        store_b.set('git b', '2')
+
+        self.assertDictEqual(LocalStore(self.path)._data,
+                             {'git a': '1', 'git b': '2'})
+
+    def test_update(self):
+        """Test whether the values are updated and removed"""
+
+        store = LocalStore(self.path)
+
+        store.update('git', lambda repos: (repos or []) + ['a'])
+        store.update('git', lambda repos: (repos or []) + ['b'])
+        self.assertListEqual(store.get('git'), ['a', 'b'])
+
+        store.delete('git')
+        self.assertIsNone(store.get('git'))
+        self.assertDictEqual(LocalStore(self.path)._data, {})
+
+    def test_append(self):
+        """Test whether the items appended are merged into the file with the next update"""
+
+        store = LocalStore(self.path)
+        store.append('git repos', 'a')
+        store.append('git repos', 'b')
+        self.assertListEqual(store.get('git repos'), ['a', 'b'])
+        self.assertFalse(os.path.exists(self.path))
+
+        # Other stores read the items not merged yet
+        self.assertListEqual(LocalStore(self.path).get('git repos'), ['a', 'b'])
+
+        store.set('git', 'state')
+        self.assertFalse(os.path.exists(store.journal_path))
+        with open(self.path) as f:
+            self.assertDictEqual(json.load(f), {'git': 'state', 'git repos': ['a', 'b']})
+
+        store.append('git repos', 'c')
+        store.delete('git repos')
+        self.assertIsNone(store.get('git repos'))
+        self.assertDictEqual(LocalStore(self.path)._data, {'git': 'state'})
+
+    def test_invalid_journal(self):
+        """Test whether the entries of the journal not written completely are ignored"""
+
+        store = LocalStore(self.path)
+        store.append('git repos', 'a')
+        with open(store.journal_path, 'a') as f:
+            f.write('["git repos", "b')
+
+        self.assertListEqual(LocalStore(self.path).get('git repos'), ['a'])
+
+    def test_update_processes(self):
+        """Test whether the updates of several processes are not lost"""
+
+        store = LocalStore(self.path)
+        store.set('other', 'value')
+
+        ctx = multiprocessing.get_context()
+        processes = [ctx.Process(target=update_store_process, args=(self.path, 'git%s' % i, 50))
+                     for i in range(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+
+        expected = {'other': 'value'}
+        expected.update({'git%s repos' % i: list(range(50)) for i in range(4)})
+        self.assertDictEqual(LocalStore(self.path)._data, expected)
+        self.assertEqual(store.get('other'), 'value')
+        self.assertListEqual(store.get('git0 repos'), list(range(50)))
+
+    def test_get_local_store(self):
+        """Test whether the stores are shared by file"""
+
+        store = get_local_store(self.path)
+        self.assertIs(get_local_store(self.path), store)
+        self.assertIsNot(get_local_store(self.path + '.other'), store)
+
+    def test_invalid_file(self):
+        """Test whether an invalid file is ignored"""
+
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('not json')
+
+        store = LocalStore(self.path)
+        self.assertIsNone(store.get('git a'))
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
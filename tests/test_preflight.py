@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import sys
+import threading
+import time
+import unittest
+
+# Hack to make sure that tests import the right packages
+# due to setuptools behaviour
+sys.path.insert(0, '..')
+
+from sirmordred.preflight import PreflightCheck, format_preflight, run_preflight
+
+
+def _fail():
+    raise RuntimeError("Cannot connect")
+
+
+class TestPreflight(unittest.TestCase):
+    """Preflight checks tests"""
+
+    def test_run_preflight(self):
+        """Test whether the results of the checks are returned in order"""
+
+        checks = [
+            PreflightCheck('ok', lambda: True),
+            PreflightCheck('false', lambda: False),
+            PreflightCheck('error', _fail)
+        ]
+
+        with self.assertLogs('sirmordred.preflight', level='INFO') as cm:
+            results = run_preflight(checks)
+
+        self.assertListEqual([result.name for result in results], ['ok', 'false', 'error'])
+        self.assertListEqual([result.ok for result in results], [True, False, False])
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[1].error, "check failed")
+        self.assertEqual(results[2].error, "Cannot connect")
+        self.assertEqual(len(cm.output), 3)
+
+    def test_concurrent(self):
+        """Test whether the checks are executed at the same time"""
+
+        barrier = threading.Barrier(3, timeout=5)
+
+        checks = [PreflightCheck(str(i), lambda: barrier.wait() is not None) for i in range(3)]
+        results = run_preflight(checks)
+
+        self.assertTrue(all(result.ok for result in results))
+
+    def test_timeout(self):
+        """Test whether a check is failed when its deadline expires"""
+
+        event = threading.Event()
+        checks = [
+            PreflightCheck('slow', event.wait, timeout=0.2),
+            PreflightCheck('fast', lambda: True, timeout=0.2)
+        ]
+
+        before = time.monotonic()
+        results = run_preflight(checks)
+        event.set()
+
+        self.assertLess(time.monotonic() - before, 5)
+        self.assertFalse(results[0].ok)
+        self.assertEqual(results[0].error, "timed out after 0.2 seconds")
+        self.assertTrue(results[1].ok)
+
+    def test_format_preflight(self):
+        """Test whether the failed checks are reported together"""
+
+        results = run_preflight([PreflightCheck('es', lambda: True)])
+        self.assertEqual(format_preflight(results), "All the preflight checks passed")
+
+        results = run_preflight([
+            PreflightCheck('es_collection', _fail),
+            PreflightCheck('bestiary', lambda: True),
+            PreflightCheck('sortinghat', lambda: False)
+        ])
+        self.assertEqual(format_preflight(results),
+                         "Preflight checks failed: es_collection (Cannot connect), sortinghat (check failed)")
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+# Hack to make sure that tests import the right packages
+# due to setuptools behaviour
+sys.path.insert(0, '..')
+
+from sirmordred.config import Config
+from sirmordred.registry import (ConnectorsRegistry,
+                                 build_registry,
+                                 get_grimoire_elk_version,
+                                 get_registry,
+                                 reset_registry,
+                                 set_registry)
+
+
+class TestRegistry(unittest.TestCase):
+    """Connectors registry tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='sirmordred_')
+        self.cache_file = os.path.join(self.tmp_path, 'registry.json')
+        reset_registry()
+
+    def tearDown(self):
+        reset_registry()
+        shutil.rmtree(self.tmp_path)
+
+    def test_build_registry(self):
+        """Test whether the backends and studies of GrimoireELK are found"""
+
+        registry = build_registry()
+
+        self.assertIn('git', registry.backends)
+        self.assertIn('github', registry.backends)
+        self.assertIn('enrich_onion', registry.studies)
+        self.assertListEqual(list(registry.studies), sorted(set(registry.studies)))
+
+    def test_get_registry(self):
+        """Test whether the registry is only built once"""
+
+        registry = get_registry()
+        self.assertIs(get_registry(), registry)
+        self.assertListEqual(Config.get_backend_sections(), list(registry.backends) + ['apache'])
+        self.assertTupleEqual(Config.get_study_sections(), registry.studies)
+
+    def test_set_registry(self):
+        """Test whether a registry read elsewhere is used unless one is loaded"""
+
+        registry = ConnectorsRegistry(('git',), ('enrich_onion',))
+        set_registry(registry)
+        self.assertIs(get_registry(), registry)
+
+        set_registry(ConnectorsRegistry(('github',), ()))
+        self.assertIs(get_registry(), registry)
+
+    def test_cache_file(self):
+        """Test whether the registry is persisted and read from the cache file"""
+
+        registry = get_registry(self.cache_file)
+
+        with open(self.cache_file, 'r') as f:
+            cache = json.load(f)
+        self.assertEqual(cache['grimoire_elk'], get_grimoire_elk_version())
+        self.assertListEqual(cache['backends'], list(registry.backends))
+
+        # The registry is not built again
+        reset_registry()
+        with unittest.mock.patch('sirmordred.registry.build_registry') as mock_build:
+            cached = get_registry(self.cache_file)
+            mock_build.assert_not_called()
+        self.assertEqual(cached, registry)
+
+    def test_cache_other_version(self):
+        """Test whether a cache written for another version of GrimoireELK is ignored"""
+
+        with open(self.cache_file, 'w') as f:
+            json.dump({'grimoire_elk': '0.0.1', 'backends': ['fake'], 'studies': []}, f)
+
+        fake = ConnectorsRegistry(('git',), ('enrich_onion',))
+        with unittest.mock.patch('sirmordred.registry.build_registry', return_value=fake):
+            registry = get_registry(self.cache_file)
+        self.assertEqual(registry, fake)
+
+        with open(self.cache_file, 'r') as f:
+            cache = json.load(f)
+        self.assertEqual(cache['grimoire_elk'], get_grimoire_elk_version())
+        self.assertListEqual(cache['backends'], ['git'])
+
+    def test_cache_env(self):
+        """Test whether the cache file is read from the environment"""
+
+        with unittest.mock.patch.dict(os.environ, {'SIRMORDRED_REGISTRY_CACHE': self.cache_file}):
+            get_registry()
+        self.assertTrue(os.path.exists(self.cache_file))
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
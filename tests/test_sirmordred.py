@@ -23,11 +23,14 @@
 import sys
 import unittest
 
+from unittest.mock import patch
+
 # Hack to make sure that tests import the right packages
 # due to setuptools behaviour
 sys.path.insert(0, '..')
 
 from sirmordred.config import Config
+from sirmordred.error import ElasticSearchError
 from sirmordred.sirmordred import logger, SirMordred
 
 CONF_FILE = 'test.cfg'
@@ -71,6 +74,37 @@ class TestTaskRawDataCollection(unittest.TestCase):
             self.sirmordred.check_es_access()
             self.assertTrue(cm.output[-1], 'ERROR:sirmordred.sirmordred:Cannot connect to Elasticsearch: ')
 
+    @patch('sirmordred.sirmordred.create_sortinghat_client')
+    @patch('sirmordred.sirmordred.requests.get')
+    def test_preflight(self, mock_get, mock_client):
+        """Test whether Elasticsearch and SortingHat are checked once"""
+
+        with patch.object(SirMordred, 'check_es_url', return_value=True) as mock_es:
+            results = self.sirmordred.preflight()
+
+        self.assertListEqual([result.name for result in results], ['es_collection', 'sortinghat'])
+        self.assertTrue(all(result.ok for result in results))
+        mock_es.assert_called_once_with('http://localhost:9200')
+
+        # The server is reached with the timeout of the check, without creating the client
+        timeout = self.config.get_conf()['general']['preflight_timeout']
+        self.assertEqual(mock_get.call_args[1]['timeout'], timeout)
+        mock_client.assert_not_called()
+        self.assertFalse(hasattr(self.sirmordred, 'client'))
+
+    @patch('sirmordred.sirmordred.requests.get')
+    def test_preflight_error(self, mock_get):
+        """Test whether all the failed checks are reported"""
+
+        mock_get.side_effect = RuntimeError("SortingHat down")
+        self.sirmordred.config.conf['es_enrichment']['url'] = "http://admin:secret@es:9200"
+
+        with patch.object(SirMordred, 'check_es_url', side_effect=ElasticSearchError("ES down")):
+            results = self.sirmordred.preflight()
+
+        self.assertListEqual([result.name for result in results], ['es_collection', 'es_enrichment', 'sortinghat'])
+        self.assertListEqual([result.error for result in results], ["ES down", "ES down", "SortingHat down"])
+
 
 if __name__ == "__main__":
     unittest.main(warnings='ignore')
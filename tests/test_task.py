@@ -22,7 +22,10 @@
 
 import os
 import json
+import shutil
 import sys
+import tempfile
+import threading
 import unittest
 
 
@@ -31,6 +34,7 @@ import unittest
 sys.path.insert(0, '..')
 
 from sirmordred.config import Config
+from sirmordred.error import TaskCancelled
 from sirmordred.task import Task
 
 from sortinghat.cli.client import SortingHatClient
@@ -130,6 +134,19 @@ class TestTask(unittest.TestCase):
 
             self.assertEqual(expected_params.sort(), perceval_params.sort())
 
+    def test_compose_perceval_params_sirmordred_fields(self):
+        """Test whether the params of SirMordred in a backend section are not passed to Perceval"""
+
+        self.config.conf['git']['enrich_batch_size'] = 50
+        self.config.conf['git']['studies_workers'] = 2
+
+        task = Task(self.config, self.sortinghat_client)
+        perceval_params = task._compose_perceval_params('git', 'https://github.com/chaoss/grimoirelab-perceval')
+
+        self.assertEqual(perceval_params[0], 'https://github.com/chaoss/grimoirelab-perceval')
+        self.assertNotIn('--enrich_batch_size', perceval_params)
+        self.assertNotIn('--studies_workers', perceval_params)
+
     def test_get_collection_url(self):
         """Test whether the collection url could be overwritten in a backend"""
 
@@ -138,6 +155,58 @@ class TestTask(unittest.TestCase):
 
         self.assertEqual(task._get_collection_url(), COLLECTION_URL_STACKEXCHANGE)
 
+    def test_check_cancelled(self):
+        """Test whether an exception is raised when the task is cancelled"""
+
+        task = Task(self.config, self.sortinghat_client)
+        task.check_cancelled()
+
+        task.cancel_event = threading.Event()
+        task.check_cancelled()
+
+        task.cancel_event.set()
+        self.assertTrue(task.is_cancelled())
+        with self.assertRaises(TaskCancelled):
+            task.check_cancelled()
+
+    def test_checkpoints(self):
+        """Test whether an interrupted phase is resumed from its checkpoint"""
+
+        tmp_path = tempfile.mkdtemp(prefix='sirmordred_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        self.config.conf['general']['checkpoints_file'] = os.path.join(tmp_path, 'checkpoints.json')
+
+        repos = ['https://a.com/repo', 'https://b.com/repo', 'https://c.com/repo']
+        task = Task(self.config, self.sortinghat_client)
+        task.set_backend_section('git')
+
+        pending, state = task._resume_checkpoint('collection', repos, {'date': '2026-01-01'})
+        self.assertListEqual(pending, repos)
+        self.assertDictEqual(state, {'date': '2026-01-01'})
+        task._add_checkpoint('collection', repos[0])
+
+        # The phase was interrupted; the next execution resumes it
+        pending, state = task._resume_checkpoint('collection', repos, {'date': '2026-02-01'})
+        self.assertListEqual(pending, repos[1:])
+        self.assertDictEqual(state, {'date': '2026-01-01'})
+
+        task._clear_checkpoint('collection')
+        pending, state = task._resume_checkpoint('collection', repos, {'date': '2026-02-01'})
+        self.assertListEqual(pending, repos)
+        self.assertDictEqual(state, {'date': '2026-02-01'})
+
+    def test_checkpoints_disabled(self):
+        """Test whether nothing is resumed when the checkpoints are disabled"""
+
+        repos = ['https://a.com/repo', 'https://b.com/repo']
+        task = Task(self.config, self.sortinghat_client)
+        task.set_backend_section('git')
+
+        task._resume_checkpoint('collection', repos)
+        task._add_checkpoint('collection', repos[0])
+        pending, _ = task._resume_checkpoint('collection', repos)
+        self.assertListEqual(pending, repos)
+
 
 if __name__ == "__main__":
     unittest.main(warnings='ignore')
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import sys
+import unittest
+
+from unittest.mock import MagicMock, patch
+
+# Hack to make sure that tests import the right packages
+# due to setuptools behaviour
+sys.path.insert(0, '..')
+
+from sirmordred.config import Config
+from sirmordred.task_catch_up import TaskReposCleanup, create_catch_up_tasks
+from sirmordred.task_collection import TaskRawDataCollection
+from sirmordred.task_enrich import TaskEnrich
+from sirmordred.task_projects import ProjectsDelta, ProjectsSnapshot, TaskProjects
+
+CONF_FILE = 'test.cfg'
+GIT_BACKEND_SECTION = 'git'
+
+
+class TestCreateCatchUpTasks(unittest.TestCase):
+    """create_catch_up_tasks tests"""
+
+    def setUp(self):
+        old = ProjectsSnapshot({
+            'grimoire': {
+                'git': ['https://github.com/chaoss/grimoirelab-perceval',
+                        'https://github.com/chaoss/grimoirelab-elk']
+            }
+        }, version=1)
+        new = ProjectsSnapshot({
+            'grimoire': {
+                'git': ['https://github.com/chaoss/grimoirelab-perceval',
+                        'https://github.com/chaoss/grimoirelab-sirmordred']
+            }
+        }, version=2)
+        self.delta = ProjectsDelta(old, new)
+        self.config = Config(CONF_FILE)
+
+    def test_added_repos(self):
+        """Test whether only the repositories added are collected and enriched"""
+
+        tasks = create_catch_up_tasks(self.config, None, GIT_BACKEND_SECTION, self.delta)
+
+        self.assertEqual(len(tasks), 2)
+        self.assertIsInstance(tasks[0], TaskRawDataCollection)
+        self.assertIsInstance(tasks[1], TaskEnrich)
+        for task in tasks:
+            self.assertEqual(task.backend_section, GIT_BACKEND_SECTION)
+            self.assertSetEqual(task.allowed_repos, {'https://github.com/chaoss/grimoirelab-sirmordred'})
+
+    def test_cleanup(self):
+        """Test whether the data of the repositories removed is deleted"""
+
+        tasks = create_catch_up_tasks(self.config, None, GIT_BACKEND_SECTION, self.delta, cleanup=True)
+
+        self.assertEqual(len(tasks), 3)
+        self.assertIsInstance(tasks[2], TaskReposCleanup)
+        self.assertListEqual(tasks[2].removed_raw, ['https://github.com/chaoss/grimoirelab-elk'])
+        self.assertListEqual(tasks[2].removed_enrich, ['https://github.com/chaoss/grimoirelab-elk'])
+
+    def test_phases_disabled(self):
+        """Test whether no tasks are created for the disabled phases"""
+
+        self.config.set_param('phases', 'collection', False)
+        self.config.set_param('phases', 'enrichment', False)
+
+        tasks = create_catch_up_tasks(self.config, None, GIT_BACKEND_SECTION, self.delta)
+        self.assertListEqual(tasks, [])
+
+    def test_no_changes(self):
+        """Test whether no tasks are created for a section without changes"""
+
+        tasks = create_catch_up_tasks(self.config, None, 'github', self.delta, cleanup=True)
+        self.assertListEqual(tasks, [])
+
+
+class TestTaskReposCleanup(unittest.TestCase):
+    """TaskReposCleanup tests"""
+
+    @patch('sirmordred.task_catch_up.get_elastic')
+    def test_origin_shared_by_sections(self, mock_get_elastic):
+        """Test whether the origins used by other sections writing to the same index are kept"""
+
+        config = Config(CONF_FILE)
+        config.set_param('github:pull', 'raw_index', config['github']['raw_index'])
+        TaskProjects.set_projects({
+            'grimoire': {
+                'github': ['https://github.com/chaoss/grimoirelab-elk'],
+                'github:pull': ['https://github.com/chaoss/grimoirelab-perceval']
+            }
+        })
+
+        elastic = MagicMock()
+        elastic.requests.post.return_value.json.return_value = {'deleted': 0}
+        mock_get_elastic.return_value = elastic
+
+        task = TaskReposCleanup(config, backend_section='github',
+                                removed_raw=['https://github.com/chaoss/grimoirelab-perceval',
+                                             'https://github.com/chaoss/grimoirelab-sirmordred'])
+        in_use = task._get_origins_in_use('raw_index', True)
+        self.assertSetEqual(in_use, {'https://github.com/chaoss/grimoirelab-elk',
+                                     'https://github.com/chaoss/grimoirelab-perceval'})
+
+        task.execute()
+        self.assertEqual(elastic.requests.post.call_count, 1)
+        query = elastic.requests.post.call_args[1]['data']
+        self.assertIn('grimoirelab-sirmordred', query)
+        self.assertNotIn('grimoirelab-perceval', query)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
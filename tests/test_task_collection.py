@@ -31,7 +31,9 @@ from os.path import expanduser, join
 # due to setuptools behaviour
 sys.path.insert(0, '..')
 
+from sirmordred.change_probes import GitChangeProbe
 from sirmordred.config import Config
+from sirmordred.error import DataCollectionError
 from sirmordred.task_collection import TaskRawDataCollection
 from sirmordred.task_projects import TaskProjects
 
@@ -95,6 +97,50 @@ class TestTaskRawDataCollection(unittest.TestCase):
         for p in params:
             self.assertTrue(p in expected_params)
 
+    def test_collection_workers(self):
+        """Test whether the number of workers is read from the general and backend sections"""
+
+        config = Config(CONF_FILE)
+        cfg = config.get_conf()
+        task = TaskRawDataCollection(config, backend_section=GIT_BACKEND_SECTION)
+        self.assertEqual(task._get_collection_workers(cfg), 1)
+
+        config.set_param('general', 'collection_workers', 4)
+        self.assertEqual(task._get_collection_workers(cfg), 4)
+
+        cfg.conf[GIT_BACKEND_SECTION]['collection_workers'] = 2
+        self.assertEqual(task._get_collection_workers(cfg), 2)
+
+    def test_collection_slots(self):
+        """Test whether the collection slots are shared by all the tasks"""
+
+        self.assertIsNone(TaskRawDataCollection._get_collection_slots(None))
+
+        slots = TaskRawDataCollection._get_collection_slots(3)
+        self.assertIs(TaskRawDataCollection._get_collection_slots(3), slots)
+        self.assertIsNot(TaskRawDataCollection._get_collection_slots(5), slots)
+
+    def test_change_probe(self):
+        """Test whether the change probe is read from the backend section"""
+
+        config = Config(CONF_FILE)
+        cfg = config.get_conf()
+        task = TaskRawDataCollection(config, backend_section=GIT_BACKEND_SECTION)
+        self.assertIsNone(task._get_change_probe(cfg))
+
+        config.conf[GIT_BACKEND_SECTION]['change_probe'] = 'git'
+        self.assertIsInstance(task._get_change_probe(cfg), GitChangeProbe)
+
+        config.conf[GIT_BACKEND_SECTION]['change_probe'] = 'unknown'
+        with self.assertRaises(DataCollectionError):
+            task._get_change_probe(cfg)
+
+        # The web page of API backends doesn't change with their data
+        config.conf['github']['change_probe'] = 'http'
+        task = TaskRawDataCollection(config, backend_section='github')
+        with self.assertLogs('sirmordred.task_collection', level='WARNING'):
+            self.assertIsNone(task._get_change_probe(cfg))
+
     def test_execute(self):
         """Test whether the Task could be run"""
 
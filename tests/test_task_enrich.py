@@ -22,10 +22,15 @@
 #
 
 
+import functools
+import json
 import logging
 import sys
 import unittest
 
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
 import requests
 
 # Hack to make sure that tests import the right packages
@@ -33,12 +38,13 @@ import requests
 sys.path.insert(0, '..')
 
 from grimoire_elk.enriched.sortinghat_gelk import SortingHat
+from grimoire_elk.utils import get_connector_from_name
 
 from sirmordred.config import Config
 from sirmordred.error import DataEnrichmentError
 from sirmordred.task_projects import TaskProjects
 from sirmordred.task_collection import TaskRawDataCollection
-from sirmordred.task_enrich import TaskEnrich
+from sirmordred.task_enrich import BackendsCache, BatchItems, BatchRepo, TaskEnrich, fanout_items
 
 from sortinghat.cli.client import SortingHatClient, SortingHatSchema
 
@@ -134,6 +140,19 @@ class TestTaskEnrich(unittest.TestCase):
         self.assertEqual(task.config, self.config)
         self.assertEqual(task.backend_section, backend_section)
 
+    def test_enrich_workers(self):
+        """Test whether the number of workers is read from the general and backend sections"""
+
+        self._setup(CONF_FILE)
+        task = TaskEnrich(self.config, self.sortinghat_client, backend_section=GIT_BACKEND_SECTION)
+        self.assertEqual(task._get_enrich_workers(self.conf), 1)
+
+        self.config.set_param('general', 'enrich_workers', 4)
+        self.assertEqual(task._get_enrich_workers(self.conf), 4)
+
+        self.conf.conf[GIT_BACKEND_SECTION]['enrich_workers'] = 2
+        self.assertEqual(task._get_enrich_workers(self.conf), 2)
+
     def test_select_aliases(self):
         self._setup(CONF_FILE)
         cfg = self.conf
@@ -351,5 +370,518 @@ class TestTaskEnrich(unittest.TestCase):
             self.assertEqual(task.execute(), None)
 
 
+class TestEnrichWatermarks(unittest.TestCase):
+    """Last enrichment dates by origin tests"""
+
+    @staticmethod
+    def _response(status_code, data=None):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(data).encode('utf-8') if data else b''
+        return response
+
+    def test_watermarks(self):
+        """Test whether the last date of each origin is read page by page"""
+
+        pages = [
+            {
+                'aggregations': {
+                    'origins': {
+                        'after_key': {'origin': 'https://github.com/chaoss/grimoirelab-perceval'},
+                        'buckets': [
+                            {'key': {'origin': 'https://github.com/chaoss/grimoirelab-elk'},
+                             'last_date': {'value': 1577836800000.0}},
+                            {'key': {'origin': 'https://github.com/chaoss/grimoirelab-perceval'},
+                             'last_date': {'value': 1580515200000.0}}
+                        ]
+                    }
+                }
+            },
+            {
+                'aggregations': {
+                    'origins': {
+                        'after_key': {'origin': 'https://github.com/chaoss/grimoirelab-toolkit'},
+                        'buckets': [
+                            {'key': {'origin': 'https://github.com/chaoss/grimoirelab-toolkit'},
+                             'last_date': {'value': None}}
+                        ]
+                    }
+                }
+            },
+            {
+                'aggregations': {
+                    'origins': {
+                        'buckets': []
+                    }
+                }
+            }
+        ]
+
+        elastic = MagicMock()
+        elastic.index_url = 'http://localhost:9200/git_enrich'
+        elastic.requests.post.side_effect = [self._response(200, page) for page in pages]
+
+        watermarks = TaskEnrich._get_enrich_watermarks(elastic)
+
+        expected = {
+            'https://github.com/chaoss/grimoirelab-elk': datetime(2020, 1, 1),
+            'https://github.com/chaoss/grimoirelab-perceval': datetime(2020, 2, 1)
+        }
+        self.assertDictEqual(watermarks, expected)
+        self.assertEqual(elastic.requests.post.call_count, 3)
+
+        # The next pages start after the last origin read
+        query = json.loads(elastic.requests.post.call_args_list[1][1]['data'])
+        self.assertDictEqual(query['aggs']['origins']['composite']['after'],
+                             {'origin': 'https://github.com/chaoss/grimoirelab-perceval'})
+
+    def test_watermarks_errors(self):
+        """Test whether a missing index has no dates and the errors fall back to None"""
+
+        elastic = MagicMock()
+        elastic.index_url = 'http://localhost:9200/git_enrich'
+
+        elastic.requests.post.return_value = self._response(404)
+        self.assertDictEqual(TaskEnrich._get_enrich_watermarks(elastic), {})
+
+        elastic.requests.post.return_value = self._response(400)
+        self.assertIsNone(TaskEnrich._get_enrich_watermarks(elastic))
+
+    @patch('sirmordred.task_enrich.get_elastic')
+    def test_enrich_dates(self, mock_get_elastic):
+        """Test whether the dates by origin are only read when they are needed"""
+
+        elastic = MagicMock()
+        elastic.index_url = 'http://localhost:9200/github_enrich'
+        elastic.get_last_item_field.return_value = datetime(2020, 3, 1)
+        mock_get_elastic.return_value = elastic
+
+        config = Config(CONF_FILE)
+        task = TaskEnrich(config, None, backend_section='github')
+
+        watermarks, last_date = task._TaskEnrich__get_enrich_dates(config.get_conf(), 'github', False)
+        self.assertIsNone(watermarks)
+        self.assertEqual(last_date, datetime(2020, 3, 1))
+        elastic.requests.post.assert_not_called()
+
+        elastic.requests.post.return_value = self._response(200, {
+            'aggregations': {
+                'origins': {
+                    'buckets': [
+                        {'key': {'origin': 'https://github.com/chaoss/grimoirelab-elk'},
+                         'last_date': {'value': 1577836800000.0}}
+                    ]
+                }
+            }
+        })
+        watermarks, last_date = task._TaskEnrich__get_enrich_dates(config.get_conf(), 'github')
+        self.assertDictEqual(watermarks, {'https://github.com/chaoss/grimoirelab-elk': datetime(2020, 1, 1)})
+        self.assertEqual(last_date, datetime(2020, 1, 1))
+
+
+class TestEnrichBatch(unittest.TestCase):
+    """Enrichment of repositories in batches tests"""
+
+    def test_batch_size(self):
+        """Test whether the size of the batches is read from the general and backend sections"""
+
+        config = Config(CONF_FILE)
+        task = TaskEnrich(config, None, backend_section='github')
+        self.assertIsNone(task._get_enrich_batch_size(config.get_conf()))
+
+        config.set_param('general', 'enrich_batch_size', 50)
+        self.assertEqual(task._get_enrich_batch_size(config.get_conf()), 50)
+
+        config.conf['github']['enrich_batch_size'] = 1
+        self.assertIsNone(task._get_enrich_batch_size(config.get_conf()))
+
+    def test_batch_connector(self):
+        """Test whether only the connectors enriched item by item can be batched"""
+
+        self.assertTrue(TaskEnrich._is_batch_connector(get_connector_from_name('github')))
+        self.assertTrue(TaskEnrich._is_batch_connector(get_connector_from_name('gitlab')))
+        # git overrides enrich_items and update_items
+        self.assertFalse(TaskEnrich._is_batch_connector(get_connector_from_name('git')))
+
+    def test_batch_items(self):
+        """Test whether the enrich backend is set with the params of the repository of each item"""
+
+        batch = [
+            BatchRepo('https://github.com/chaoss/grimoirelab-elk --labels=[a]',
+                      'https://github.com/chaoss/grimoirelab-elk',
+                      'https://github.com/chaoss/grimoirelab-elk',
+                      ['a'], ['chaoss', 'grimoirelab-elk'], 'elk', None),
+            BatchRepo('https://github.com/chaoss/grimoirelab-perceval',
+                      'https://github.com/chaoss/grimoirelab-perceval',
+                      'https://github.com/chaoss/grimoirelab-perceval',
+                      [], ['chaoss', 'grimoirelab-perceval'], 'perceval', None)
+        ]
+        raw_items = [
+            {'origin': 'https://github.com/chaoss/grimoirelab-perceval', 'uuid': '1'},
+            {'origin': 'https://github.com/chaoss/grimoirelab-elk', 'uuid': '2'},
+            {'origin': 'https://github.com/chaoss/grimoirelab-toolkit', 'uuid': '3'},
+            {'origin': 'https://github.com/chaoss/grimoirelab-perceval', 'uuid': '4'}
+        ]
+
+        ocean = MagicMock()
+        ocean.fetch.return_value = iter(raw_items)
+        ocean.scroll_size = 100
+
+        enrich = MagicMock()
+        items = BatchItems(ocean, enrich, batch)
+        self.assertEqual(items.scroll_size, 100)
+
+        seen = []
+        for item in items.fetch():
+            seen.append((item['uuid'],
+                         enrich.set_projects_json_repo.call_args[0][0],
+                         enrich.set_repo_labels.call_args[0][0],
+                         enrich.perceval_backend))
+
+        expected = [
+            ('1', 'https://github.com/chaoss/grimoirelab-perceval', [], 'perceval'),
+            ('2', 'https://github.com/chaoss/grimoirelab-elk', ['a'], 'elk'),
+            ('4', 'https://github.com/chaoss/grimoirelab-perceval', [], 'perceval')
+        ]
+        self.assertListEqual(seen, expected)
+        self.assertListEqual(enrich.backend_params, ['chaoss', 'grimoirelab-perceval'])
+
+    def test_batch_repos_dates(self):
+        """Test whether the repositories not found in the enriched index are enriched from the beginning"""
+
+        config = Config(CONF_FILE)
+        task = TaskEnrich(config, None, backend_section='github')
+        repos = ['https://github.com/chaoss/grimoirelab-elk',
+                 'https://github.com/chaoss/grimoirelab-perceval']
+        watermarks = {'https://github.com/chaoss/grimoirelab-elk': datetime(2020, 1, 1)}
+
+        batch_repos, rest = task._TaskEnrich__split_batch_repos('github', repos, watermarks)
+        self.assertListEqual(rest, [])
+        dates = {repo.origin: repo.last_enrich_date for repo in batch_repos}
+        self.assertDictEqual(dates, {'https://github.com/chaoss/grimoirelab-elk': datetime(2020, 1, 1),
+                                     'https://github.com/chaoss/grimoirelab-perceval': None})
+
+        # The repositories never enriched are batched together
+        batches = task._TaskEnrich__make_batches(batch_repos, 1)
+        self.assertListEqual([batch[0].origin for batch in batches],
+                             ['https://github.com/chaoss/grimoirelab-perceval',
+                              'https://github.com/chaoss/grimoirelab-elk'])
+
+        # Without the dates by origin, the repositories are enriched one by one
+        batch_repos, rest = task._TaskEnrich__split_batch_repos('github', repos, None)
+        self.assertListEqual(batch_repos, [])
+        self.assertListEqual(rest, repos)
+
+
+class TestEnrichFanout(unittest.TestCase):
+    """Enrichment of several sections reading the raw index once tests"""
+
+    def test_fanout_items(self):
+        """Test whether the items read once are passed to all the consumers"""
+
+        raw_items = [{'uuid': str(i), 'data': {'number': i}} for i in range(2500)]
+        ocean = MagicMock()
+        ocean.fetch.return_value = iter(raw_items)
+
+        consumed = [[], [], []]
+
+        def _consumer(items, n):
+            for item in items.fetch():
+                item['data']['enriched'] = n
+                consumed[n].append(item)
+
+        fanout_items(ocean, [lambda items, n=n: _consumer(items, n) for n in range(3)])
+
+        ocean.fetch.assert_called_once_with()
+        for n in range(3):
+            self.assertListEqual([item['uuid'] for item in consumed[n]],
+                                 [item['uuid'] for item in raw_items])
+            self.assertTrue(all(item['data']['enriched'] == n for item in consumed[n]))
+
+    def test_fanout_items_error(self):
+        """Test whether a consumer failing doesn't stop the rest"""
+
+        raw_items = [{'uuid': str(i)} for i in range(2500)]
+        ocean = MagicMock()
+        ocean.fetch.return_value = iter(raw_items)
+
+        consumed = []
+
+        def _failing(items):
+            next(items.fetch())
+            raise ValueError('enrich error')
+
+        def _consumer(items):
+            consumed.extend(items.fetch())
+
+        with self.assertRaisesRegex(ValueError, 'enrich error'):
+            fanout_items(ocean, [_failing, _consumer])
+
+        self.assertEqual(len(consumed), len(raw_items))
+
+    def test_fanout_sections(self):
+        """Test whether the sections with the same raw index are found"""
+
+        config = Config(CONF_FILE)
+        projects = {
+            'grimoire': {
+                'git': ['https://github.com/grimoirelab/perceval'],
+                'github': ['https://github.com/grimoirelab/perceval'],
+                'github:pull': ['https://github.com/grimoirelab/perceval']
+            }
+        }
+        TaskProjects.set_projects(projects)
+
+        task = TaskEnrich(config, None, backend_section='github:pull')
+        self.assertListEqual(task._get_fanout_sections(config.get_conf()), [])
+
+        config.set_param('general', 'enrich_fanout', True)
+        self.assertListEqual(task._get_fanout_sections(config.get_conf()), [])
+
+        config.set_param('github:pull', 'raw_index', config['github']['raw_index'])
+        self.assertListEqual(task._get_fanout_sections(config.get_conf()), ['github', 'github:pull'])
+
+        # Executions for a subset of the repositories are done alone
+        task = TaskEnrich(config, None, backend_section='github:pull',
+                          allowed_repos=['https://github.com/grimoirelab/perceval'])
+        self.assertListEqual(task._get_fanout_sections(config.get_conf()), [])
+
+        # git overrides the enrichment of the items
+        task = TaskEnrich(config, None, backend_section='git')
+        self.assertListEqual(task._get_fanout_sections(config.get_conf()), [])
+
+    def test_fanout_after_enrichment(self):
+        """Test whether the leader executes the after-enrichment steps of the followers"""
+
+        config = Config(CONF_FILE)
+        config.set_param('general', 'enrich_fanout', True)
+        config.set_param('es_enrichment', 'autorefresh', False)
+        config.set_param('github:pull', 'raw_index', config['github']['raw_index'])
+        config.set_param('github:pull', 'studies', ['enrich_onion'])
+        TaskProjects.set_projects({
+            'grimoire': {
+                'github': ['https://github.com/grimoirelab/perceval'],
+                'github:pull': ['https://github.com/grimoirelab/perceval']
+            }
+        })
+        cfg = config.get_conf()
+
+        def _mock_steps(task):
+            task.retain_data = MagicMock()
+            task.retain_identities = MagicMock()
+            task._TaskEnrich__studies = MagicMock()
+            task._TaskEnrich__fanout_sections = task._get_fanout_sections(cfg)
+            return task
+
+        # The follower doesn't execute them before its data is enriched
+        follower = _mock_steps(TaskEnrich(config, None, backend_section='github:pull'))
+        follower._TaskEnrich__after_enrichment(cfg)
+        follower.retain_data.assert_not_called()
+        follower._TaskEnrich__studies.assert_not_called()
+
+        leader = _mock_steps(TaskEnrich(config, None, backend_section='github'))
+        follower = _mock_steps(leader._TaskEnrich__get_fanout_task('github:pull'))
+        follower._TaskEnrich__fanout_sections = []
+        leader._TaskEnrich__after_enrichment(cfg)
+
+        leader.retain_data.assert_called_once()
+        leader._TaskEnrich__studies.assert_called_once()
+        follower.retain_data.assert_called_once()
+        self.assertEqual(follower.retain_data.call_args[0][2], cfg['github:pull']['enriched_index'])
+        follower._TaskEnrich__studies.assert_called_once()
+
+        # The task of the follower is kept between executions
+        self.assertIs(leader._TaskEnrich__get_fanout_task('github:pull'), follower)
+
+
+def mock_response(status_code, data=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(data).encode('utf-8') if data else b''
+    return response
+
+
+class TestEnrichStudies(unittest.TestCase):
+    """Execution of the studies tests"""
+
+    def test_index_state(self):
+        """Test whether the number of items and the last date of an index are read"""
+
+        elastic = MagicMock()
+        elastic.index_url = 'http://localhost:9200/git_test'
+        elastic.requests.post.return_value = mock_response(200, {
+            "hits": {"total": {"value": 10, "relation": "eq"}},
+            "aggregations": {"last_date": {"value": 1600000000000.0}}
+        })
+        self.assertEqual(TaskEnrich._get_index_state(elastic, 'metadata__enriched_on'), (10, 1600000000000.0))
+
+        query = json.loads(elastic.requests.post.call_args[1]['data'])
+        self.assertDictEqual(query['aggs'], {"last_date": {"max": {"field": "metadata__enriched_on"}}})
+
+        # Old versions return the total as a number
+        elastic.requests.post.return_value = mock_response(200, {
+            "hits": {"total": 0},
+            "aggregations": {"last_date": {"value": None}}
+        })
+        self.assertEqual(TaskEnrich._get_index_state(elastic, 'metadata__enriched_on'), (0, None))
+
+        elastic.requests.post.return_value = mock_response(400)
+        self.assertIsNone(TaskEnrich._get_index_state(elastic, 'metadata__enriched_on'))
+
+    def test_studies_workers(self):
+        """Test whether the number of studies workers is read from the general and backend sections"""
+
+        config = Config(CONF_FILE)
+        task = TaskEnrich(config, None, backend_section='git')
+        self.assertEqual(task._get_studies_workers(config.get_conf()), 1)
+
+        config.set_param('general', 'studies_workers', 4)
+        self.assertEqual(task._get_studies_workers(config.get_conf()), 4)
+
+    @patch('sirmordred.task_enrich.get_elastic')
+    @patch('sirmordred.task_enrich.do_studies')
+    def test_skip_unchanged_studies(self, mock_do_studies, mock_get_elastic):
+        """Test whether the studies are skipped when the indexes they read didn't change"""
+
+        def enrich_demography():
+            pass
+
+        def enrich_areas_of_code():
+            pass
+
+        def enrich_onion():
+            pass
+
+        executed = []
+
+        def _get_enrich_backend():
+            enrich_backend = MagicMock()
+            enrich_backend.studies = [enrich_demography, enrich_areas_of_code, enrich_onion]
+            return enrich_backend
+
+        mock_do_studies.side_effect = lambda ocean, enrich, studies_args, retention_time: \
+            executed.append(studies_args[0]['name'])
+
+        config = Config(CONF_FILE)
+        config.set_param('git', 'studies', ['enrich_onion', 'enrich_demography:1', 'enrich_areas_of_code'])
+        config.set_param('general', 'studies_skip_unchanged', True)
+        config.set_param('general', 'studies_workers', 2)
+
+        task = TaskEnrich(config, None, backend_section='git')
+        task._get_enrich_backend = _get_enrich_backend
+        task._get_ocean_backend = MagicMock()
+        task._refresh_index = MagicMock()
+        task._get_index_state = MagicMock(return_value=(10, 1600000000000.0))
+
+        # The studies updating the enriched index are executed first
+        task._TaskEnrich__studies(None)
+        self.assertEqual(executed[0], 'enrich_demography:1')
+        self.assertListEqual(sorted(executed[1:]), ['enrich_areas_of_code', 'enrich_onion'])
+
+        # No changes in the indexes
+        executed.clear()
+        task._TaskEnrich__studies(None)
+        self.assertListEqual(executed, [])
+
+        # New items enriched
+        task._get_index_state.return_value = (11, 1600000001000.0)
+        task._TaskEnrich__studies(None)
+        self.assertEqual(len(executed), 3)
+
+        # The state of the indexes is unknown
+        executed.clear()
+        task._get_index_state.return_value = None
+        task._TaskEnrich__studies(None)
+        self.assertEqual(len(executed), 3)
+
+    def test_subset_skips_after_enrichment(self):
+        """Test whether retention and studies are skipped when only some repositories are enriched"""
+
+        config = Config(CONF_FILE)
+        task = TaskEnrich(config, None, backend_section='git',
+                          allowed_repos=['https://github.com/grimoirelab/perceval'])
+        task.retain_data = MagicMock()
+        task._TaskEnrich__studies = MagicMock()
+
+        task._TaskEnrich__after_enrichment(config.get_conf())
+
+        task.retain_data.assert_not_called()
+        task._TaskEnrich__studies.assert_not_called()
+
+
+class TestBackendsCache(unittest.TestCase):
+    """BackendsCache tests"""
+
+    def test_get(self):
+        """Test whether the backends are reused until the config or the projects change"""
+
+        config = Config(CONF_FILE)
+        TaskProjects.set_projects({'grimoire': {'git': ['https://github.com/grimoirelab/perceval']}})
+        task = TaskEnrich(config, None, backend_section='git')
+        cache = BackendsCache(task)
+
+        factory = MagicMock(side_effect=lambda: object())
+
+        backend = cache.get('enrich', factory)
+        self.assertIs(cache.get('enrich', factory), backend)
+        self.assertEqual(factory.call_count, 1)
+
+        # Each name has its own backend
+        other = cache.get('study enrich_onion', factory)
+        self.assertIsNot(other, backend)
+        self.assertEqual(factory.call_count, 2)
+
+        # Changes in other sections don't matter
+        config.set_param('github', 'category', 'pull_request')
+        self.assertIs(cache.get('enrich', factory), backend)
+
+        config.set_param('git', 'studies', ['enrich_onion'])
+        new_backend = cache.get('enrich', factory)
+        self.assertIsNot(new_backend, backend)
+        self.assertIs(cache.get('enrich', factory), new_backend)
+
+        TaskProjects.set_projects({'grimoire': {'git': ['https://github.com/grimoirelab/sirmordred']}})
+        backend = cache.get('enrich', factory)
+        self.assertIsNot(backend, new_backend)
+
+        cache.clear()
+        self.assertIsNot(cache.get('enrich', factory), backend)
+        self.assertEqual(factory.call_count, 5)
+
+    def test_clear_caches(self):
+        """Test whether clearing the backends only discards their own cached lookups"""
+
+        class LookupBackend:
+            lookups = []
+
+            @functools.lru_cache(16)
+            def lookup(self, uuid):
+                self.lookups.append(uuid)
+                return uuid
+
+        config = Config(CONF_FILE)
+        task = TaskEnrich(config, None, backend_section='git')
+        cache = BackendsCache(task)
+
+        backend = cache.get('enrich', LookupBackend)
+        other = LookupBackend()
+
+        backend.lookup('uuid1')
+        backend.lookup('uuid1')
+        other.lookup('uuid2')
+        self.assertListEqual(LookupBackend.lookups, ['uuid1', 'uuid2'])
+        self.assertEqual(LookupBackend.lookup.cache_info().currsize, 1)
+
+        # The lookups of other backends are kept
+        cache.clear()
+        backend.lookup('uuid1')
+        other.lookup('uuid2')
+        self.assertListEqual(LookupBackend.lookups, ['uuid1', 'uuid2', 'uuid1'])
+
+        BackendsCache.clear_caches(backend)
+        backend.lookup('uuid1')
+        self.assertListEqual(LookupBackend.lookups, ['uuid1', 'uuid2', 'uuid1', 'uuid1'])
+
+
 if __name__ == "__main__":
     unittest.main(warnings='ignore')
@@ -19,8 +19,11 @@
 # Authors:
 #     Valerio Cosentino <valcos@bitergia.com>
 
+import multiprocessing
+import queue
 import sys
 import threading
+import time
 import unittest
 
 # Hack to make sure that tests import the right packages
@@ -29,7 +32,12 @@ sys.path.insert(0, '..')
 
 from sirmordred.sirmordred import SirMordred
 from sirmordred.config import Config
-from sirmordred.task_manager import TasksManager
+from sirmordred.task import Task
+from sirmordred.task_manager import (ReadersWriterLock,
+                                     TasksManager,
+                                     execute_pipeline,
+                                     execute_tasks,
+                                     run_tasks_process)
 from sirmordred.task_collection import TaskRawDataCollection
 from sirmordred.task_enrich import TaskEnrich
 from sirmordred.task_projects import TaskProjects
@@ -39,6 +47,78 @@ from sortinghat.cli.client import SortingHatClient
 CONF_FILE = 'test.cfg'
 
 
+class FailTask(Task):
+    """Task that always fails"""
+
+    def execute(self):
+        raise RuntimeError("Task failed")
+
+
+class CancelTask(Task):
+    """Task that cancels the tasks"""
+
+    executions = 0
+
+    def execute(self):
+        CancelTask.executions += 1
+        self.cancel_event.set()
+
+
+class RemoveSectionTask(Task):
+    """Task that removes its backend section from the config"""
+
+    executions = 0
+
+    def execute(self):
+        RemoveSectionTask.executions += 1
+        del self.config.conf[self.backend_section]
+
+
+class FakeCollectionTask:
+    """Collection task that notifies the repositories collected"""
+
+    def __init__(self, repos, fail=False):
+        self.repos = repos
+        self.fail = fail
+        self.on_repo_collected = None
+        self.collected = []
+
+    def execute(self):
+        for repo in self.repos:
+            self.collected.append(repo)
+            self.on_repo_collected(repo)
+        if self.fail:
+            raise RuntimeError("Collection failed")
+
+
+class FakeEnrichTask:
+    """Enrichment task that records the repositories enriched"""
+
+    def __init__(self, fail_repo=None, delay=0):
+        self.fail_repo = fail_repo
+        self.delay = delay
+        self.events = []
+
+    def start_pipeline(self):
+        self.events.append('start')
+        return True
+
+    def enrich_collected_repo(self, repo):
+        time.sleep(self.delay)
+        if repo == self.fail_repo:
+            raise RuntimeError("Enrichment failed")
+        self.events.append(repo)
+
+    def finish_pipeline(self):
+        self.events.append('finish')
+
+
+def read_lock_process(lock, acquired):
+    lock.acquire_read()
+    acquired.set()
+    lock.release_read()
+
+
 class TestTasksManager(unittest.TestCase):
     """TasksManager tests"""
 
@@ -269,6 +349,292 @@ class TestTasksManager(unittest.TestCase):
             manager.run()
 
 
+class TestReadersWriterLock(unittest.TestCase):
+    """ReadersWriterLock tests"""
+
+    def test_several_readers(self):
+        """Test whether several readers can hold the lock at the same time"""
+
+        lock = ReadersWriterLock()
+        lock.acquire_read()
+        lock.acquire_read()
+        self.assertEqual(lock.readers, 2)
+        self.assertFalse(lock.writer)
+
+        lock.release_read()
+        lock.release_read()
+        self.assertEqual(lock.readers, 0)
+
+    def test_writer_waits_for_readers(self):
+        """Test whether the writer is woken up when the last reader releases the lock"""
+
+        lock = ReadersWriterLock()
+        acquired = threading.Event()
+
+        def writer():
+            lock.acquire_write()
+            acquired.set()
+            lock.release_write()
+
+        lock.acquire_read()
+        t = threading.Thread(target=writer)
+        t.start()
+
+        self.assertFalse(acquired.wait(0.2))
+        lock.release_read()
+        self.assertTrue(acquired.wait(5))
+        t.join()
+
+        stats = lock.get_stats()
+        self.assertEqual(stats['read_acquired'], 1)
+        self.assertEqual(stats['write_acquired'], 1)
+        self.assertGreater(stats['write_wait'], 0)
+
+    def test_writer_preference(self):
+        """Test whether new readers wait when a writer is waiting"""
+
+        lock = ReadersWriterLock()
+        events = []
+
+        def writer():
+            with lock.write_locked():
+                events.append('writer')
+
+        def reader():
+            with lock.read_locked():
+                events.append('reader')
+
+        lock.acquire_read()
+        tw = threading.Thread(target=writer)
+        tw.start()
+        while lock.get_stats()['writers_waiting'] == 0:
+            time.sleep(0.01)
+
+        tr = threading.Thread(target=reader)
+        tr.start()
+        time.sleep(0.2)
+        self.assertListEqual(events, [])
+
+        lock.release_read()
+        tw.join()
+        tr.join()
+        self.assertListEqual(events, ['writer', 'reader'])
+
+    def test_shared_by_processes(self):
+        """Test whether the lock can be shared by several processes"""
+
+        ctx = multiprocessing.get_context()
+        lock = ReadersWriterLock(ctx)
+        acquired = ctx.Event()
+
+        lock.acquire_write()
+        p = ctx.Process(target=read_lock_process, args=(lock, acquired))
+        p.start()
+
+        self.assertFalse(acquired.wait(0.3))
+        lock.release_write()
+        self.assertTrue(acquired.wait(5))
+        p.join()
+
+        stats = lock.get_stats()
+        self.assertEqual(stats['read_acquired'], 1)
+        self.assertEqual(stats['write_acquired'], 1)
+        self.assertEqual(stats['readers'], 0)
+
+    def test_release_not_acquired(self):
+        """Test whether an error is raised when releasing a lock not acquired"""
+
+        lock = ReadersWriterLock()
+        with self.assertRaises(RuntimeError):
+            lock.release_read()
+        with self.assertRaises(RuntimeError):
+            lock.release_write()
+
+
+class TestRunTasksProcess(unittest.TestCase):
+    """run_tasks_process tests"""
+
+    def test_run_on_error(self):
+        """Test whether the exceptions are sent to the parent process"""
+
+        config = Config(CONF_FILE)
+        ctx = multiprocessing.get_context()
+        comm_queue = ctx.Queue()
+        lock = ReadersWriterLock(ctx)
+        stopper = ctx.Event()
+        stopper.set()
+
+        p = ctx.Process(target=run_tasks_process,
+                        args=([FailTask], 'git', stopper, config, 0, comm_queue, lock))
+        p.start()
+        p.join()
+
+        self.assertEqual(p.exitcode, 1)
+        exc_type, exc_obj, exc_trace = comm_queue.get(timeout=5)
+        self.assertEqual(exc_type, RuntimeError)
+        self.assertEqual(str(exc_obj), "Task failed")
+        self.assertIsNone(exc_trace)
+        with self.assertRaises(queue.Empty):
+            comm_queue.get(block=False)
+
+
+class TestCancelTasks(unittest.TestCase):
+    """Cancellation of the tasks tests"""
+
+    def setUp(self):
+        self.cancel_event = TasksManager.CANCEL_EVENT
+        TasksManager.CANCEL_EVENT = threading.Event()
+        CancelTask.executions = 0
+
+    def tearDown(self):
+        TasksManager.CANCEL_EVENT = self.cancel_event
+
+    def test_cancel(self):
+        """Test whether the tasks stop when they are cancelled"""
+
+        config = Config(CONF_FILE)
+        config.set_param('general', 'update', True)
+        stopper = threading.Event()
+
+        tm = TasksManager([CancelTask, FailTask], 'git', stopper, config, None, timer=3600)
+        tm.run()
+
+        # The second task isn't executed, neither the next iterations
+        self.assertEqual(CancelTask.executions, 1)
+        self.assertFalse(stopper.is_set())
+        with self.assertRaises(queue.Empty):
+            TasksManager.COMM_QUEUE.get(block=False)
+
+
+class TestConfigChanges(unittest.TestCase):
+    """Changes of the config while the tasks are running tests"""
+
+    def setUp(self):
+        RemoveSectionTask.executions = 0
+
+    def test_section_removed(self):
+        """Test whether the tasks stop when their section is removed from the config"""
+
+        config = Config(CONF_FILE)
+        config.set_param('general', 'update', True)
+        stopper = threading.Event()
+
+        tm = TasksManager([RemoveSectionTask], 'git', stopper, config, None, timer=3600)
+        tm.start()
+        tm.join(10)
+
+        self.assertFalse(tm.is_alive())
+        self.assertEqual(RemoveSectionTask.executions, 1)
+
+    def test_reload_config(self):
+        """Test whether the config is reloaded when it is requested"""
+
+        config = Config(CONF_FILE)
+        stopper = threading.Event()
+        stopper.set()
+
+        tm = TasksManager([FailTask], 'git', stopper, config, None)
+        tm.config_reload = threading.Event()
+        tm.config_reload.set()
+
+        # The config is reloaded before executing the tasks
+        config.conf['general']['bulk_size'] = 1
+        with self.assertRaises(RuntimeError):
+            tm.run()
+
+        self.assertFalse(tm.config_reload.is_set())
+        self.assertEqual(config['general']['bulk_size'], 100)
+
+
+class SlowTask(Task):
+    """Task recording the start and the end of its executions"""
+
+    events = []
+
+    def execute(self):
+        self.events.append('start')
+        time.sleep(0.2)
+        self.events.append('end')
+
+
+class QuickTask(Task):
+    """Task recording its execution in the events of SlowTask"""
+
+    def execute(self):
+        SlowTask.events.append('quick')
+
+
+class TestExecuteTasks(unittest.TestCase):
+    """execute_tasks tests"""
+
+    def test_section_serialized(self):
+        """Test whether the chains of tasks of a backend section don't overlap"""
+
+        config = Config(CONF_FILE)
+        SlowTask.events = []
+
+        threads = [threading.Thread(target=execute_tasks, args=(config, 'git', [SlowTask(config)]))
+                   for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertListEqual(SlowTask.events, ['start', 'end', 'start', 'end'])
+
+    def test_between_tasks(self):
+        """Test whether other tasks of the section are executed between the tasks of a chain"""
+
+        config = Config(CONF_FILE)
+        SlowTask.events = []
+
+        chain = threading.Thread(target=execute_tasks, args=(config, 'git', [SlowTask(config), SlowTask(config)]))
+        chain.start()
+        time.sleep(0.1)
+        execute_tasks(config, 'git', [QuickTask(config)])
+        chain.join()
+
+        self.assertListEqual(SlowTask.events, ['start', 'end', 'quick', 'start', 'end'])
+
+
+class TestExecutePipeline(unittest.TestCase):
+    """execute_pipeline tests"""
+
+    def test_execute(self):
+        """Test whether the repositories are enriched in order while collected"""
+
+        collection = FakeCollectionTask(['r1', 'r2', 'r3'])
+        enrich = FakeEnrichTask()
+
+        execute_pipeline(collection, enrich, depth=1)
+
+        self.assertListEqual(enrich.events, ['start', 'r1', 'r2', 'r3', 'finish'])
+        self.assertIsNone(collection.on_repo_collected)
+
+    def test_collection_error(self):
+        """Test whether the enrichment is not finished when the collection fails"""
+
+        collection = FakeCollectionTask(['r1', 'r2'], fail=True)
+        enrich = FakeEnrichTask()
+
+        with self.assertRaisesRegex(RuntimeError, "Collection failed"):
+            execute_pipeline(collection, enrich)
+
+        self.assertNotIn('finish', enrich.events)
+
+    def test_enrichment_error(self):
+        """Test whether the enrichment errors are raised after collecting all the repositories"""
+
+        collection = FakeCollectionTask(['r1', 'r2', 'r3', 'r4'])
+        enrich = FakeEnrichTask(fail_repo='r2')
+
+        with self.assertRaisesRegex(RuntimeError, "Enrichment failed"):
+            execute_pipeline(collection, enrich, depth=1)
+
+        self.assertListEqual(collection.collected, ['r1', 'r2', 'r3', 'r4'])
+        self.assertListEqual(enrich.events, ['start', 'r1'])
+
+
 if __name__ == "__main__":
     # logging.basicConfig(level=logging.DEBUG, format='%(asctime)s %(message)s')
     unittest.main(warnings='ignore')
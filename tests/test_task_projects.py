@@ -19,7 +19,12 @@
 # Authors:
 #     Alvaro del Castillo <acs@bitergia.com>
 
+import io
+import json
+import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 import httpretty
@@ -29,7 +34,10 @@ import httpretty
 sys.path.insert(0, '..')
 
 from sirmordred.config import Config
-from sirmordred.task_projects import TaskProjects
+from sirmordred.task_projects import (ProjectsDelta,
+                                      ProjectsSnapshot,
+                                      TaskProjects,
+                                      load_projects)
 
 
 CONF_FILE = 'test.cfg'
@@ -334,6 +342,146 @@ class TestTaskProjects(unittest.TestCase):
         self.assertEqual(backend, 'twitter')
         self.assertEqual(repos, ['bitergia'])
 
+    def test_projects_snapshot(self):
+        """Test whether a new read-only snapshot is created when the projects change"""
+
+        projects = {
+            'grimoire': {
+                'git': ['https://github.com/chaoss/grimoirelab-perceval'],
+                'meta': {'title': 'GrimoireLab'}
+            }
+        }
+
+        TaskProjects.set_projects(projects)
+        snapshot = TaskProjects.get_projects_snapshot()
+        self.assertListEqual(snapshot.get_repos('git'), ['https://github.com/chaoss/grimoirelab-perceval'])
+        self.assertListEqual(snapshot.get_repos('github'), [])
+
+        # The snapshot can't be modified
+        with self.assertRaises(TypeError):
+            snapshot.projects['grimoire']['git'] = []
+        with self.assertRaises(AttributeError):
+            snapshot.projects['grimoire']['git'].append('https://github.com/chaoss/grimoirelab-elk')
+
+        # Changes in the original data don't modify the projects
+        projects['grimoire']['git'].append('https://github.com/chaoss/grimoirelab-elk')
+        self.assertListEqual(TaskProjects.get_repos_by_backend_section('git'),
+                             ['https://github.com/chaoss/grimoirelab-perceval'])
+
+        # The snapshot is only replaced when the projects change
+        TaskProjects.set_projects(TaskProjects.get_projects())
+        self.assertIs(TaskProjects.get_projects_snapshot(), snapshot)
+
+        TaskProjects.set_projects(projects)
+        new_snapshot = TaskProjects.get_projects_snapshot()
+        self.assertEqual(new_snapshot.version, snapshot.version + 1)
+        self.assertListEqual(new_snapshot.get_repos('git'),
+                             ['https://github.com/chaoss/grimoirelab-elk',
+                              'https://github.com/chaoss/grimoirelab-perceval'])
+
+    def test_load_projects(self):
+        """Test whether the projects are read in a compact way and fingerprinted from their bytes"""
+
+        data = json.dumps({
+            'grimoire': {
+                'git': ['https://github.com/chaoss/grimoirelab-perceval'],
+                'github': ['https://github.com/chaoss/grimoirelab-perceval'],
+                'meta': {'title': 'GrimoireLab'}
+            }
+        }).encode('utf-8')
+
+        projects, fingerprint = load_projects(io.BytesIO(data))
+        self.assertTupleEqual(projects['grimoire']['git'], ('https://github.com/chaoss/grimoirelab-perceval',))
+        self.assertDictEqual(projects['grimoire']['meta'], {'title': 'GrimoireLab'})
+
+        # The URLs are shared
+        self.assertIs(projects['grimoire']['git'][0], projects['grimoire']['github'][0])
+
+        # The fingerprint only depends on the bytes of the file
+        _, same_fingerprint = load_projects(io.BytesIO(data))
+        self.assertEqual(fingerprint, same_fingerprint)
+        _, new_fingerprint = load_projects(io.BytesIO(data.replace(b'GrimoireLab', b'Grimoire')))
+        self.assertNotEqual(fingerprint, new_fingerprint)
+
+        # The snapshot is only replaced when the fingerprint changes
+        TaskProjects.set_projects(projects, fingerprint)
+        snapshot = TaskProjects.get_projects_snapshot()
+        TaskProjects.set_projects(projects, fingerprint)
+        self.assertIs(TaskProjects.get_projects_snapshot(), snapshot)
+
+        # The copy of the projects uses the original types
+        self.assertListEqual(TaskProjects.get_projects()['grimoire']['git'],
+                             ['https://github.com/chaoss/grimoirelab-perceval'])
+
+    def test_split_labels(self):
+        """Test whether the labels of the repositories are split"""
+
+        snapshot = ProjectsSnapshot({
+            'grimoire': {
+                'git': ['https://github.com/chaoss/grimoirelab-elk --labels=[a, b]']
+            }
+        })
+
+        split = snapshot.split_labels('https://github.com/chaoss/grimoirelab-elk --labels=[a, b]')
+        self.assertTupleEqual(split, ('https://github.com/chaoss/grimoirelab-elk', ('a', 'b')))
+        self.assertIs(snapshot.split_labels('https://github.com/chaoss/grimoirelab-elk --labels=[a, b]'), split)
+
+        split = snapshot.split_labels('https://github.com/chaoss/grimoirelab-perceval')
+        self.assertTupleEqual(split, ('https://github.com/chaoss/grimoirelab-perceval', ()))
+
+    def test_projects_delta(self):
+        """Test whether the repositories added, removed and relabelled are found"""
+
+        old = ProjectsSnapshot({
+            'grimoire': {
+                'git': ['https://github.com/chaoss/grimoirelab-perceval',
+                        'https://github.com/chaoss/grimoirelab-elk --labels=[a]'],
+                'github': ['https://github.com/chaoss/grimoirelab-perceval']
+            }
+        }, version=1)
+        new = ProjectsSnapshot({
+            'grimoire': {
+                'git': ['https://github.com/chaoss/grimoirelab-elk --labels=[b]',
+                        'https://github.com/chaoss/grimoirelab-sirmordred']
+            }
+        }, version=2)
+
+        delta = ProjectsDelta(old, new)
+
+        self.assertTrue(delta)
+        self.assertEqual(delta.old_version, 1)
+        self.assertEqual(delta.new_version, 2)
+        self.assertListEqual(delta.backend_sections, ['git', 'github'])
+
+        git_delta = delta.get('git')
+        self.assertListEqual(git_delta.added, ['https://github.com/chaoss/grimoirelab-sirmordred'])
+        self.assertListEqual(git_delta.removed, ['https://github.com/chaoss/grimoirelab-perceval'])
+        self.assertListEqual(git_delta.relabelled, ['https://github.com/chaoss/grimoirelab-elk --labels=[b]'])
+        self.assertEqual(delta.get('git', raw=False), git_delta)
+
+        github_delta = delta.get('github')
+        self.assertListEqual(github_delta.added, [])
+        self.assertListEqual(github_delta.removed, ['https://github.com/chaoss/grimoirelab-perceval'])
+
+        self.assertFalse(ProjectsDelta(new, new))
+        self.assertEqual(delta.get('gitlab'), ProjectsDelta.EMPTY)
+
+    def test_delta_listener(self):
+        """Test whether the listeners are called when the projects change"""
+
+        deltas = []
+        TaskProjects.set_projects({'grimoire': {'git': ['https://github.com/chaoss/grimoirelab-perceval']}})
+        TaskProjects.add_delta_listener(deltas.append)
+        self.addCleanup(TaskProjects.remove_delta_listener, deltas.append)
+
+        TaskProjects.set_projects({'grimoire': {'git': ['https://github.com/chaoss/grimoirelab-perceval']}})
+        self.assertListEqual(deltas, [])
+
+        TaskProjects.set_projects({'grimoire': {'git': ['https://github.com/chaoss/grimoirelab-perceval',
+                                                        'https://github.com/chaoss/grimoirelab-elk']}})
+        self.assertEqual(len(deltas), 1)
+        self.assertListEqual(deltas[0].get('git').added, ['https://github.com/chaoss/grimoirelab-elk'])
+
     def test_run(self):
         """Test whether the Task could be run"""
         config = Config(CONF_FILE)
@@ -349,6 +497,7 @@ class TestTaskProjects(unittest.TestCase):
         config = Config(CONF_FILE)
         config.set_param('projects', 'projects_url', projects_url)
         task = TaskProjects(config)
+        self.addCleanup(self.__remove_file, config.get_conf()['projects']['projects_file'] + '.cache')
 
         httpretty.enable(allow_net_connect=True)
         self.assertEqual(task.execute(), None)
@@ -357,6 +506,86 @@ class TestTaskProjects(unittest.TestCase):
         self.assertTrue(URL_PROJECTS_MAIN in projects)
         httpretty.disable()
 
+    @staticmethod
+    def __remove_file(path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    @httpretty.activate
+    def test_fetch_projects_url(self):
+        """Test whether the projects are only downloaded when they change"""
+
+        projects_url = 'http://localhost/cached-projects.json'
+        url_projects = read_file(URL_PROJECTS_FILE)
+        etag = '"v1"'
+
+        def request_callback(request, uri, headers):
+            headers['ETag'] = etag
+            if request.headers.get('If-None-Match', None) == etag:
+                return 304, headers, ''
+            return 200, headers, url_projects
+
+        httpretty.register_uri(httpretty.GET, projects_url, body=request_callback)
+
+        tmp_path = tempfile.mkdtemp(prefix='sirmordred_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        projects_file = os.path.join(tmp_path, 'projects.json')
+
+        projects, fingerprint, changed = TaskProjects.fetch_projects_url(projects_url, projects_file)
+        self.assertTrue(changed)
+        self.assertIn(URL_PROJECTS_MAIN, projects)
+        self.assertTupleEqual(TaskProjects.load_projects_file(projects_file), (projects, fingerprint))
+        self.assertIsNone(httpretty.last_request().headers.get('If-None-Match', None))
+
+        # The server replies with a 304
+        cached, cached_fingerprint, changed = TaskProjects.fetch_projects_url(projects_url, projects_file)
+        self.assertFalse(changed)
+        self.assertIs(cached, projects)
+        self.assertEqual(cached_fingerprint, fingerprint)
+        self.assertEqual(httpretty.last_request().headers['If-None-Match'], etag)
+
+        # The projects changed in the server
+        etag = '"v2"'
+        _, _, changed = TaskProjects.fetch_projects_url(projects_url, projects_file)
+        self.assertTrue(changed)
+
+        with open(projects_file + '.cache') as f:
+            validators = json.load(f)
+        self.assertEqual(validators['url'], projects_url)
+        self.assertEqual(validators['etag'], etag)
+
+    @httpretty.activate
+    def test_execute_fetched_projects(self):
+        """Test whether the projects fetched before the first execution are applied"""
+
+        projects_url = 'http://localhost/fetched-projects.json'
+        url_projects = read_file(URL_PROJECTS_FILE)
+
+        def request_callback(request, uri, headers):
+            headers['ETag'] = '"v1"'
+            if request.headers.get('If-None-Match', None) == '"v1"':
+                return 304, headers, ''
+            return 200, headers, url_projects
+
+        httpretty.register_uri(httpretty.GET, projects_url, body=request_callback)
+
+        tmp_path = tempfile.mkdtemp(prefix='sirmordred_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+
+        config = Config(CONF_FILE)
+        config.set_param('projects', 'projects_url', projects_url)
+        config.set_param('projects', 'projects_file', os.path.join(tmp_path, 'projects.json'))
+        TaskProjects.set_projects({})
+
+        # The access to the URL is checked when starting
+        TaskProjects.fetch_projects_url(projects_url, config['projects']['projects_file'])
+
+        task = TaskProjects(config)
+        task.execute()
+
+        self.assertEqual(httpretty.last_request().headers['If-None-Match'], '"v1"')
+        self.assertIn(URL_PROJECTS_MAIN, task.get_projects())
+
 
 if __name__ == "__main__":
     # logging.basicConfig(level=logging.DEBUG, format='%(asctime)s %(message)s')
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import queue
+import sys
+import threading
+import time
+import unittest
+
+# Hack to make sure that tests import the right packages
+# due to setuptools behaviour
+sys.path.insert(0, '..')
+
+from sirmordred.config import Config
+from sirmordred.task import Task
+from sirmordred.task_manager import GLOBAL_TASKS, TasksManager
+from sirmordred.task_scheduler import TasksScheduler
+
+CONF_FILE = 'test.cfg'
+
+
+class CountTask(Task):
+    """Task that records its executions"""
+
+    executions = []
+    lock = threading.Lock()
+
+    def execute(self):
+        with CountTask.lock:
+            CountTask.executions.append(self.backend_section)
+
+
+class SlowTask(Task):
+    """Task that records when it starts and ends"""
+
+    def execute(self):
+        with CountTask.lock:
+            CountTask.executions.append('start')
+        time.sleep(0.3)
+        with CountTask.lock:
+            CountTask.executions.append('end')
+
+
+class FailTask(Task):
+    """Task that always fails"""
+
+    def execute(self):
+        raise RuntimeError("Task failed")
+
+
+class TestTasksScheduler(unittest.TestCase):
+    """TasksScheduler tests"""
+
+    def setUp(self):
+        self.config = Config(CONF_FILE)
+        # update_hour would delay the executions until that hour
+        self.config.set_param('general', 'update_hour', None)
+        CountTask.executions = []
+
+        # Empty the queue of exceptions
+        while True:
+            try:
+                TasksManager.COMM_QUEUE.get(block=False)
+            except queue.Empty:
+                break
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        scheduler = TasksScheduler(self.config, None, workers=3)
+
+        self.assertEqual(scheduler.config, self.config)
+        self.assertIsNone(scheduler.client)
+        self.assertEqual(scheduler.workers, 3)
+        self.assertFalse(scheduler.stopper.is_set())
+
+        scheduler = TasksScheduler(self.config, None)
+        self.assertGreaterEqual(scheduler.workers, 2)
+
+    def test_run_once(self):
+        """Test whether each chain of tasks is executed once"""
+
+        scheduler = TasksScheduler(self.config, None, workers=2)
+        scheduler.add_tasks([CountTask, CountTask], 'git')
+        scheduler.add_tasks([CountTask], 'github')
+        scheduler.add_tasks([CountTask], GLOBAL_TASKS)
+
+        scheduler.run(repeat=False)
+
+        self.assertListEqual(sorted(CountTask.executions),
+                             [GLOBAL_TASKS, 'git', 'git', 'github'])
+
+    def test_add_tasks_once(self):
+        """Test whether the tasks added once are not scheduled again"""
+
+        scheduler = TasksScheduler(self.config, None, workers=2)
+        task = CountTask(self.config)
+        task.set_backend_section('git')
+        scheduled = scheduler.add_tasks_once([task], 'git')
+
+        self.assertFalse(scheduled.repeat)
+
+        # The scheduler finishes because there is nothing else to run
+        scheduler.run(repeat=True)
+
+        self.assertListEqual(CountTask.executions, ['git'])
+
+    def test_due_order(self):
+        """Test whether the tasks are executed by due time"""
+
+        scheduler = TasksScheduler(self.config, None, workers=1)
+        scheduler.add_tasks([CountTask], 'github', delay=0.2)
+        scheduler.add_tasks([CountTask], 'git', delay=0.1)
+        scheduler.add_tasks([CountTask], GLOBAL_TASKS)
+
+        scheduler.run(repeat=False)
+
+        self.assertListEqual(CountTask.executions, [GLOBAL_TASKS, 'git', 'github'])
+
+    def test_section_running(self):
+        """Test whether the tasks of a running section wait in the queue without taking a worker"""
+
+        scheduler = TasksScheduler(self.config, None, workers=2)
+        scheduler.add_tasks([SlowTask], 'git')
+        task = CountTask(self.config)
+        task.set_backend_section('git')
+        scheduler.add_tasks_once([task], 'git')
+        scheduler.add_tasks([CountTask], 'github', delay=0.1)
+
+        scheduler.run(repeat=False)
+
+        self.assertListEqual(CountTask.executions, ['start', 'github', 'end', 'git'])
+
+    def test_repeat(self):
+        """Test whether the tasks are scheduled again until the scheduler is stopped"""
+
+        scheduler = TasksScheduler(self.config, None, workers=2)
+        scheduler.add_tasks([CountTask], GLOBAL_TASKS, timer=0.05)
+
+        stopper = threading.Timer(0.5, scheduler.stop)
+        stopper.start()
+        scheduler.run(repeat=True)
+        stopper.join()
+
+        self.assertGreater(len(CountTask.executions), 1)
+
+    def test_section_removed(self):
+        """Test whether the tasks of a section removed from the config are not scheduled again"""
+
+        scheduler = TasksScheduler(self.config, None, workers=2)
+        scheduled = scheduler.add_tasks([CountTask], 'git', timer=0)
+        del self.config.conf['git']
+
+        # The scheduler finishes because there is nothing else to run
+        scheduler.run(repeat=True)
+
+        self.assertListEqual(CountTask.executions, [])
+        self.assertFalse(scheduled.active)
+
+    def test_run_on_error(self):
+        """Test whether the failing tasks are reported and not scheduled again"""
+
+        scheduler = TasksScheduler(self.config, None, workers=2)
+        scheduler.add_tasks([FailTask], 'git', timer=0)
+        scheduler.add_tasks([CountTask], 'github', timer=0)
+
+        stopper = threading.Timer(0.5, scheduler.stop)
+        stopper.start()
+        scheduler.run(repeat=True)
+        stopper.join()
+
+        exc_type, exc_obj, _ = TasksManager.COMM_QUEUE.get(block=False)
+        self.assertEqual(exc_type, RuntimeError)
+        with self.assertRaises(queue.Empty):
+            TasksManager.COMM_QUEUE.get(block=False)
+        self.assertGreater(len(CountTask.executions), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import sys
+import threading
+import unittest
+
+from concurrent.futures import CancelledError
+
+# Hack to make sure that tests import the right packages
+# due to setuptools behaviour
+sys.path.insert(0, '..')
+
+from sirmordred.work_pool import WorkStealingPool, get_shared_pool
+
+
+class TestWorkStealingPool(unittest.TestCase):
+    """WorkStealingPool tests"""
+
+    def setUp(self):
+        self.pool = WorkStealingPool(1)
+        self.blocker = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            self.blocker.wait()
+
+        # Keep the only worker busy while the units are submitted
+        self.pool.submit('blocker', block)
+        started.wait()
+
+    def tearDown(self):
+        self.blocker.set()
+        self.pool.shutdown()
+
+    def test_largest_backlog_first(self):
+        """Test whether the workers take the units of the largest backlog"""
+
+        executed = []
+
+        futures = [self.pool.submit('small', executed.append, 'small-1')]
+        futures += [self.pool.submit('big', executed.append, 'big-%s' % i) for i in range(1, 4)]
+        self.assertDictEqual(self.pool.get_backlogs(), {'small': 1, 'big': 3})
+
+        self.blocker.set()
+        for future in futures:
+            future.result(timeout=5)
+
+        self.assertListEqual(executed, ['big-1', 'big-2', 'small-1', 'big-3'])
+        self.assertDictEqual(self.pool.get_backlogs(), {})
+
+    def test_exception(self):
+        """Test whether the exceptions are set in the futures"""
+
+        def fail():
+            raise RuntimeError("Unit failed")
+
+        future = self.pool.submit('git', fail)
+        self.blocker.set()
+
+        with self.assertRaisesRegex(RuntimeError, "Unit failed"):
+            future.result(timeout=5)
+
+    def test_cancel(self):
+        """Test whether the units cancelled are not executed"""
+
+        executed = []
+
+        future_a = self.pool.submit('git', executed.append, 'a')
+        future_b = self.pool.submit('git', executed.append, 'b')
+        self.assertTrue(future_a.cancel())
+        self.blocker.set()
+
+        future_b.result(timeout=5)
+        self.assertListEqual(executed, ['b'])
+        with self.assertRaises(CancelledError):
+            future_a.result()
+
+    def test_submit_after_shutdown(self):
+        """Test whether an error is raised when submitting after shutdown"""
+
+        self.blocker.set()
+        self.pool.shutdown()
+
+        with self.assertRaises(RuntimeError):
+            self.pool.submit('git', print)
+
+
+class TestGetSharedPool(unittest.TestCase):
+    """get_shared_pool tests"""
+
+    def test_get_shared_pool(self):
+        """Test whether the pool is shared until the number of workers changes"""
+
+        self.assertIsNone(get_shared_pool(None))
+
+        pool = get_shared_pool(2)
+        self.assertIs(get_shared_pool(2), pool)
+
+        other = get_shared_pool(3)
+        self.assertIsNot(other, pool)
+        self.assertEqual(other.workers, 3)
+        other.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')